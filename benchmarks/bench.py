@@ -0,0 +1,227 @@
+"""Time and memory benchmarks of loading and decoding schematics.
+
+Run from the root of the repository:
+
+    python -m benchmarks.bench                 # default cases, compared to the baseline
+    python -m benchmarks.bench --full          # also the 256³ and 512³ cases
+    python -m benchmarks.bench --save          # store the results as the new baseline
+
+Every phase runs on a freshly loaded schematic, after the phases it depends on, so the
+numbers are the cost of that phase alone. Times are the best of several runs; memory is the
+peak traced by tracemalloc during a separate run, as tracing slows numpy down.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, NamedTuple, Sequence, Tuple
+from minecraftschematics import Schematic, nbt_to_numpy
+from .synthetic import synthetic_schematic
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+class Case(NamedTuple):
+    """A synthetic schematic to benchmark."""
+
+    size: Tuple[int, int, int]
+    palette_size: int
+    block_entity_density: float
+
+
+CASES = {
+    "small": Case((16, 16, 16), 8, 0.01),
+    "wide_palette": Case((64, 64, 64), 300, 0.001),
+    "block_entities": Case((64, 32, 64), 32, 0.05),
+    "medium": Case((128, 128, 128), 200, 0.001),
+}
+
+LARGE_CASES = {
+    "large": Case((256, 256, 256), 1000, 0.0001),
+    "huge": Case((512, 512, 512), 4000, 0.00001),
+}
+
+
+class Phase(NamedTuple):
+    """A step of loading a schematic, run after the phases it depends on."""
+
+    setup: Callable[[str], object]
+    run: Callable[[object], object]
+
+
+def _loaded(path: str, *properties: str):
+    """Load a schematic and decode some of its properties."""
+    schematic = Schematic.load(path)
+    for name in properties:
+        getattr(schematic, name)
+    return schematic
+
+
+PHASES = {
+    "load": Phase(lambda path: path, Schematic.load),
+    "load_lazy": Phase(lambda path: path, lambda path: Schematic.load(path, lazy=True)),
+    "palette": Phase(_loaded, lambda s: s.palette),
+    "block_data": Phase(_loaded, lambda s: s.block_data),
+    "block_indices": Phase(
+        lambda path: _loaded(path, "block_data"), lambda s: s.block_indices
+    ),
+    "block_counts": Phase(
+        lambda path: _loaded(path, "block_data"), lambda s: s.block_counts
+    ),
+    "block_entities": Phase(_loaded, lambda s: s.block_entities),
+    "nbt_to_numpy": Phase(
+        lambda path: _loaded(path).raw["BlockEntities"],
+        lambda tag: [nbt_to_numpy(block_entity) for block_entity in tag],
+    ),
+    "blocks": Phase(
+        lambda path: _loaded(path, "block_data", "palette", "block_entities"),
+        lambda s: s.blocks,
+    ),
+    "save": Phase(
+        lambda path: (_loaded(path), path + ".out"),
+        lambda args: args[0].save(args[1], compresslevel=6),
+    ),
+}
+
+
+def measure(phase: Phase, path: str, repeat: int) -> Dict[str, float]:
+    """Measure the best time and the peak traced memory of a phase.
+
+    Args:
+        phase (Phase): The phase to measure.
+        path (str): The schematic file.
+        repeat (int): The number of timed runs.
+
+    Returns:
+        Dict[str, float]: The time in seconds and the peak memory in bytes.
+    """
+    times = []
+    for _ in range(repeat):
+        argument = phase.setup(path)
+        start = time.perf_counter()
+        phase.run(argument)
+        times.append(time.perf_counter() - start)
+        del argument
+
+    argument = phase.setup(path)
+    tracemalloc.start()
+    try:
+        phase.run(argument)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"time": min(times), "peak_memory": peak}
+
+
+def run(
+    cases: Dict[str, Case], phases: Sequence[str], repeat: int
+) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Benchmark every phase of every case.
+
+    Args:
+        cases (Dict[str, Case]): The cases to run, by name.
+        phases (Sequence[str]): The names of the phases to run.
+        repeat (int): The number of timed runs of each phase.
+
+    Returns:
+        Dict[str, Dict[str, Dict[str, float]]]: The measurements, by case and phase.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, case in cases.items():
+            path = os.path.join(directory, f"{name}.schem")
+            synthetic_schematic(*case).save(path, compresslevel=6)
+            results[name] = {
+                "file_size": os.path.getsize(path),
+                **{phase: measure(PHASES[phase], path, repeat) for phase in phases},
+            }
+            _print_case(name, results[name])
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Find the measurements that regressed compared to the baseline.
+
+    Args:
+        results (dict): The new measurements, as returned by ``run``.
+        baseline (dict): The stored measurements.
+        tolerance (float): The ratio to the baseline above which a measurement regressed.
+
+    Returns:
+        list: A message for each regression.
+    """
+    regressions = []
+    for case, phases in results.items():
+        for phase, measurements in phases.items():
+            if not isinstance(measurements, dict):
+                continue
+            stored = baseline.get(case, {}).get(phase)
+            if stored is None:
+                continue
+            for metric, value in measurements.items():
+                # Ignore tiny values, which are mostly noise
+                floor = 1e-3 if metric == "time" else 1 << 16
+                reference = max(stored[metric], floor)
+                if value > reference * tolerance:
+                    regressions.append(
+                        f"{case}/{phase} {metric}: {value:.4g} (baseline {stored[metric]:.4g}, x{value / reference:.2f})"
+                    )
+    return regressions
+
+
+def _print_case(name: str, results: dict):
+    """Print the measurements of a case as a table."""
+    print(f"{name} ({results['file_size'] / 1e6:.2f} MB)")
+    for phase, measurements in results.items():
+        if isinstance(measurements, dict):
+            print(
+                f"  {phase:<16}{measurements['time'] * 1e3:>10.2f} ms{measurements['peak_memory'] / 1e6:>10.2f} MB"
+            )
+
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", nargs="+", help="the cases to run")
+    parser.add_argument("--phases", nargs="+", choices=list(PHASES), default=PHASES)
+    parser.add_argument("--full", action="store_true", help="include the large cases")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", action="store_true", help="store a new baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    cases = dict(CASES, **LARGE_CASES) if args.full else dict(CASES)
+    if args.cases:
+        all_cases = dict(CASES, **LARGE_CASES)
+        unknown = set(args.cases) - set(all_cases)
+        if unknown:
+            parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+        cases = {name: all_cases[name] for name in args.cases}
+
+    results = run(cases, list(args.phases), args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+from typing import Tuple
+import numpy as np
+from minecraftschematics import SchematicV2
+
+# Block entity types placed in the synthetic schematics, with their block state
+BLOCK_ENTITY_STATES = {
+    "minecraft:chest": "minecraft:chest[facing=north,type=single,waterlogged=false]",
+    "minecraft:sign": "minecraft:oak_sign[rotation=0,waterlogged=false]",
+    "minecraft:furnace": "minecraft:furnace[facing=north,lit=false]",
+}
+
+
+def synthetic_schematic(
+    size: Tuple[int, int, int],
+    palette_size: int = 16,
+    block_entity_density: float = 0.0,
+    seed: int = 0,
+) -> SchematicV2:
+    """Generate a deterministic schematic with random blocks.
+
+    Palette indices follow a Zipf-like distribution, with air as the most common block, so
+    the block counts look like the ones of a real build. With more than 127 palette entries
+    part of the indices take two varint bytes in BlockData.
+
+    Args:
+        size (Tuple[int, int, int]): The (width, height, length) of the schematic.
+        palette_size (int, optional): The number of palette entries, including air and the block entity states. Defaults to 16.
+        block_entity_density (float, optional): The fraction of blocks carrying a block entity. Defaults to 0.0.
+        seed (int, optional): The seed of the random generator, the same arguments always give the same schematic. Defaults to 0.
+
+    Returns:
+        SchematicV2: The generated schematic.
+    """
+    rng = np.random.default_rng(seed)
+    width, height, length = size
+    cells = width * height * length
+
+    palette = ["minecraft:air"] + list(BLOCK_ENTITY_STATES.values())
+    palette += [
+        f"minecraft:synthetic_{i}[variant={i % 7},powered={'true' if i % 2 else 'false'}]"
+        for i in range(max(palette_size - len(palette), 0))
+    ]
+    palette = palette[: max(palette_size, 1)]
+
+    weights = 1.0 / np.arange(1, len(palette) + 1)
+    weights[1 : len(BLOCK_ENTITY_STATES) + 1] = 0
+    if weights.sum() == 0:
+        weights[0] = 1
+    indices = rng.choice(len(palette), size=cells, p=weights / weights.sum())
+
+    block_entities = []
+    count = min(int(cells * block_entity_density), cells)
+    if count and len(palette) > 1:
+        cell_indices = rng.choice(cells, size=count, replace=False)
+        kinds = rng.integers(0, min(len(BLOCK_ENTITY_STATES), len(palette) - 1), count)
+        ids = list(BLOCK_ENTITY_STATES)
+        indices[cell_indices] = kinds + 1
+        y, rest = np.divmod(cell_indices, width * length)
+        z, x = np.divmod(rest, width)
+        for i in range(count):
+            block_entity = {
+                "Id": ids[kinds[i]],
+                "Pos": np.array((x[i], y[i], z[i]), dtype=np.int32),
+            }
+            if kinds[i] == 0:
+                block_entity["Items"] = [
+                    {
+                        "Slot": np.int8(slot),
+                        "id": "minecraft:stone",
+                        "Count": np.int8(64),
+                    }
+                    for slot in range(3)
+                ]
+            elif kinds[i] == 1:
+                block_entity["Text1"] = f'{{"text":"sign {i}"}}'
+            block_entities.append(block_entity)
+
+    return SchematicV2.from_arrays(
+        indices.reshape(height, length, width),
+        palette,
+        block_entities,
+        metadata={"Name": f"synthetic {width}x{height}x{length}"},
+    )
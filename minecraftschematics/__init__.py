@@ -1,5 +1,17 @@
 from .block import Block
-from .utils import nbt_to_numpy
+from .utils import (
+    LazyNumpyDict,
+    ListDict,
+    nbt_to_numpy,
+    nbt_to_numpy_many,
+    numpy_to_nbt,
+)
+from .varint import decode_varints, encode_varints
+from .materials import BillOfMaterials
+from .entities import EntityTable
+from .sections import SectionedIndices
+from .fingerprint import sketch_similarity
+from .stats import LoadStats, PhaseEvent
 from .schematic_schema import SchematicSchema
 from .schematic_v2 import SchematicV2
 from .schematic import Schematic
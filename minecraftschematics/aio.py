@@ -0,0 +1,95 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import os
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Sequence
+from .lazy import read_source
+from .stats import phase
+
+# Executor and concurrency limit of the async API, see configure
+_executor = None
+_max_concurrency = None
+
+# One semaphore per event loop, as asyncio primitives cannot be shared between loops
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def configure(executor: Executor = None, max_concurrency: int = None):
+    """Set the executor and the concurrency limit of the async API.
+
+    CPU-bound work such as inflating, parsing and decoding schematics runs in the executor,
+    with at most max_concurrency jobs submitted at once per event loop. Other jobs wait
+    without blocking the loop, so a burst of large uploads cannot take all the workers.
+
+    Args:
+        executor (Executor, optional): The executor to run CPU-bound work in. With a ProcessPoolExecutor, schematics are pickled back to the event loop process. Defaults to None (the default executor of the event loop).
+        max_concurrency (int, optional): The maximum number of jobs running in the executor at once. Defaults to None (the number of CPUs).
+    """
+    global _executor, _max_concurrency
+    _executor = executor
+    _max_concurrency = max_concurrency
+    _semaphores.clear()
+
+
+def is_process_executor(executor: Executor = None) -> bool:
+    """Check whether jobs run in another process, so their results are copies."""
+    return isinstance(executor or _executor, ProcessPoolExecutor)
+
+
+async def run_in_executor(func, *args, executor: Executor = None):
+    """Run a function in the configured executor, within the concurrency limit.
+
+    In threads, the function runs in a copy of the current context, so a LoadStats recording
+    around the call also records the phases of the function.
+
+    Args:
+        func (Callable): The function to run.
+        *args: Its arguments.
+        executor (Executor, optional): The executor to use instead of the configured one. Defaults to None.
+
+    Returns:
+        The result of the function.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(_max_concurrency or os.cpu_count() or 1)
+        _semaphores[loop] = semaphore
+
+    executor = executor or _executor
+    call = functools.partial(func, *args)
+    if not is_process_executor(executor):
+        call = functools.partial(contextvars.copy_context().run, call)
+    async with semaphore:
+        return await loop.run_in_executor(executor, call)
+
+
+async def read_source_async(source) -> bytes:
+    """Read the whole content of a path, bytes-like object or file-like object without blocking.
+
+    Files and synchronous file-like objects are read in a thread. File-like objects with a
+    coroutine ``read`` method, like the uploads of most async web frameworks, are awaited.
+
+    Args:
+        source (Union[str, os.PathLike, bytes, BinaryIO]): What to read.
+
+    Returns:
+        bytes: The content.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    read = getattr(source, "read", None)
+    if read is not None and inspect.iscoroutinefunction(read):
+        with phase("read") as event:
+            data = await read()
+            event.bytes = len(data)
+        return data
+    return await asyncio.to_thread(read_source, source)
+
+
+def get_fields(obj, names: Sequence[str]) -> tuple:
+    """Get attributes of an object, used to compute properties in an executor."""
+    return tuple(getattr(obj, name) for name in names)
@@ -1,25 +1,54 @@
+# Block types considered empty when cropping or pasting
+AIR_TYPES = ("minecraft:air", "minecraft:cave_air", "minecraft:void_air")
+
+
 class Block:
-    def __init__(self, blockdata: str, block_entity: dict = None):
+    __slots__ = ("raw", "block_entity", "_type", "_properties", "_hash")
+
+    # Every block state without a block entity is only created once and shared
+    _registry = {}
+
+    def __new__(cls, blockdata: str, block_entity: dict = None):
         """Representation of a block in the Minecraft schematic.
 
+        Blocks are immutable. Blocks without a block entity are interned: creating a Block for a
+        block state that was already seen returns the same instance, so blocks can be compared,
+        hashed and stored in palettes cheaply. A Block with a block entity is always a new
+        instance, so the block entity of one position never leaks into the shared block state.
+
         Args:
             blockdata (str): The raw block data in the format 'block_type[properties]'.
+            block_entity (dict, optional): The block entity of the block. Defaults to None.
         """
-        self.raw = blockdata
-        self.block_entity: dict = block_entity
+        interned = cls._registry.get(blockdata)
+        if interned is None:
+            interned = object.__new__(cls)
+            block_type, properties = _parse_block_state(blockdata)
+            object.__setattr__(interned, "raw", blockdata)
+            object.__setattr__(interned, "block_entity", None)
+            object.__setattr__(interned, "_type", block_type)
+            object.__setattr__(interned, "_properties", properties)
+            object.__setattr__(interned, "_hash", hash(blockdata))
+            interned = cls._registry.setdefault(blockdata, interned)
+
+        if block_entity is None:
+            return interned
+
+        block = object.__new__(cls)
+        for attribute in ("raw", "_type", "_properties", "_hash"):
+            object.__setattr__(block, attribute, getattr(interned, attribute))
+        object.__setattr__(block, "block_entity", block_entity)
+        return block
 
     @property
     def type(self) -> str:
         """str: The type of the block without properties."""
-        return self.raw.split("[")[0]
+        return self._type
 
     @property
     def properties(self) -> dict:
         """dict: A dictionary containing the properties of the block."""
-        properties = {}
-        for prop in self.raw.split("[")[1].split("]")[0].split(","):
-            key, value = prop.split("=")
-            properties[key] = value
+        properties = dict(self._properties)
 
         if self.block_entity:
             properties["block_entity"] = self.block_entity
@@ -29,10 +58,27 @@ class Block:
     @property
     def raw_properties(self) -> str:
         """str: The raw properties of the block without the block type."""
-        return self.raw.split("[")[1].split("]")[0]
+        return self.raw[len(self._type) + 1 : -1] if self._properties else ""
 
-    def add_block_entity(self, block_entity: dict):
-        self.block_entity = block_entity
+    def with_block_entity(self, block_entity: dict) -> "Block":
+        """Get a copy of the block carrying a block entity.
+
+        Args:
+            block_entity (dict): The block entity.
+
+        Returns:
+            Block: A new Block with the same block state and the given block entity.
+        """
+        return Block(self.raw, block_entity)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Block is immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("Block is immutable.")
+
+    def __reduce__(self):
+        return Block, (self.raw, self.block_entity)
 
     def __repr__(self) -> str:
         return f"Block({self.raw}, {self.block_entity})"
@@ -41,7 +87,23 @@ class Block:
         return f"Block({self.raw}, {self.block_entity})"
 
     def __eq__(self, __value: object) -> bool:
+        if self is __value:
+            return True
         if isinstance(__value, Block):
             return self.raw == __value.raw
         else:
             return False
+
+    def __hash__(self) -> int:
+        return self._hash
+
+
+def _parse_block_state(blockdata: str):
+    """Split a raw block state into its type and a dictionary of its properties."""
+    block_type, _, properties = blockdata.partition("[")
+    result = {}
+    for prop in properties.rstrip("]").split(","):
+        if prop:
+            key, _, value = prop.partition("=")
+            result[key] = value
+    return block_type, result
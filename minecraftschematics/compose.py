@@ -0,0 +1,142 @@
+from typing import Sequence, Tuple
+import nbtlib as nbt
+import numpy as np
+from .block import AIR_TYPES, Block
+
+# How blocks of a schematic are written over the blocks placed before it
+POLICIES = ("overwrite", "skip_air", "keep")
+
+
+def compose_blocks(
+    schematics: Sequence,
+    positions: Sequence[Tuple[int, int, int]],
+    policy: str = "skip_air",
+    origin: Tuple[int, int, int] = None,
+    size: Tuple[int, int, int] = None,
+):
+    """Place schematics into one grid under a unified palette.
+
+    The palettes are merged first, once per palette entry, into a unified palette and one
+    remap table per schematic. The output grid is then allocated once and
+    each schematic is written into it with a single ``np.take`` and a masked copy, so the
+    peak memory stays close to the size of the output grid.
+
+    Args:
+        schematics (Sequence[SchematicV2]): The schematics to place, in order.
+        positions (Sequence[Tuple[int, int, int]]): The (x, y, z) position of the first corner of each schematic.
+        policy (str, optional): How a schematic is written over the ones placed before it. "overwrite" writes every block, "skip_air" every block that is not air, and "keep" only fills cells which are still air. The first schematic is always written as is. Defaults to "skip_air".
+        origin (Tuple[int, int, int], optional): The position of the first corner of the output. Defaults to None (the minimum corner of all schematics).
+        size (Tuple[int, int, int], optional): The (width, height, length) of the output, blocks outside of it are cut off. Defaults to None (large enough for all schematics).
+
+    Returns:
+        Tuple[np.ndarray, list, list, list]: The palette indices of the output indexed as ``[y, z, x]``, its palette, and its block entities and entities as nbtlib Compounds relative to the origin.
+
+    Raises:
+        ValueError: If the policy is unknown or the number of positions does not match the number of schematics.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy {policy!r}, expected one of {POLICIES}.")
+    if len(positions) != len(schematics):
+        raise ValueError("Expected one position per schematic.")
+
+    positions = np.array(positions, dtype=np.int64).reshape(-1, 3)
+    sizes = np.array([schematic.size for schematic in schematics], dtype=np.int64)
+    sizes = sizes.reshape(-1, 3)
+    if origin is None:
+        origin = positions.min(axis=0) if len(schematics) else np.zeros(3, np.int64)
+    origin = np.array(origin, dtype=np.int64)
+    if size is None:
+        size = (positions + sizes).max(axis=0) - origin if len(schematics) else (1,) * 3
+    size = np.array(size, dtype=np.int64)
+
+    palette = []
+    indices = {}
+    tables = []
+    for schematic in schematics:
+        table = np.empty(len(schematic.palette), dtype=np.int64)
+        for i, block in enumerate(schematic.palette):
+            table[i] = indices.setdefault(block.raw, len(palette))
+            if table[i] == len(palette):
+                palette.append(block.raw)
+        tables.append(table)
+
+    # The first schematic is written as is, cells it does not cover are filled with air
+    covered = len(schematics) and np.all(positions[0] <= origin)
+    covered = covered and np.all(positions[0] + sizes[0] >= origin + size)
+    fill = 0 if covered else indices.setdefault("minecraft:air", len(palette))
+    if fill == len(palette):
+        palette.append("minecraft:air")
+    is_air = np.array([Block(block).type in AIR_TYPES for block in palette])
+
+    dtype = np.uint16 if len(palette) <= np.iinfo(np.uint16).max + 1 else np.int32
+    width, height, length = size
+    result = np.full((height, length, width), fill, dtype=dtype)
+    block_entities = {}
+    entities = []
+
+    for i, (schematic, position, table) in enumerate(
+        zip(schematics, positions, tables)
+    ):
+        start = position - origin
+        low = np.maximum(start, 0)
+        high = np.minimum(start + np.array(schematic.size, dtype=np.int64), size)
+        if np.any(low >= high):
+            continue
+
+        (x0, y0, z0), (x1, y1, z1) = low, high
+        sx, sy, sz = low - start
+        source = schematic.block_indices[
+            sy : sy + y1 - y0, sz : sz + z1 - z0, sx : sx + x1 - x0
+        ]
+        blocks = np.take(table.astype(dtype), source)
+        target = result[y0:y1, z0:z1, x0:x1]
+        if policy == "overwrite" or i == 0:
+            written = None
+            target[...] = blocks
+        else:
+            written = ~is_air[blocks]
+            if policy == "keep":
+                written &= is_air[target]
+            np.copyto(target, blocks, where=written)
+
+        # Block entities follow the blocks: the ones of overwritten cells are dropped
+        if written is None:
+            block_entities = {
+                key: value
+                for key, value in block_entities.items()
+                if not _inside(key, low, high)
+            }
+        else:
+            block_entities = {
+                key: value
+                for key, value in block_entities.items()
+                if not (_inside(key, low, high) and written[_cell(key, low)])
+            }
+        for block_entity in schematic.raw.get("BlockEntities", ()):
+            key = tuple(int(i) for i in np.array(block_entity["Pos"]) + start)
+            if _inside(key, low, high) and (
+                written is None or written[_cell(key, low)]
+            ):
+                block_entity = nbt.Compound(block_entity)
+                block_entity["Pos"] = nbt.IntArray(key)
+                block_entities[key] = block_entity
+
+        for entity in schematic.raw.get("Entities", ()):
+            entity_position = np.array(entity["Pos"], dtype=np.float64) + start
+            if np.all(entity_position >= 0) and np.all(entity_position < size):
+                entity = nbt.Compound(entity)
+                entity["Pos"] = nbt.List[nbt.Double](entity_position)
+                entities.append(entity)
+
+    return result, palette, list(block_entities.values()), entities
+
+
+def _inside(position: Tuple[int, int, int], low: np.ndarray, high: np.ndarray) -> bool:
+    """Check whether a position is inside the box from low (inclusive) to high (exclusive)."""
+    return all(low[i] <= position[i] < high[i] for i in range(3))
+
+
+def _cell(position: Tuple[int, int, int], low: np.ndarray) -> Tuple[int, int, int]:
+    """Get the [y, z, x] index of a position in a grid starting at low."""
+    x, y, z = (int(position[i] - low[i]) for i in range(3))
+    return y, z, x
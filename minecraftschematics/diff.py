@@ -0,0 +1,122 @@
+from typing import List, NamedTuple
+import nbtlib as nbt
+import numpy as np
+from .utils import layer_chunks
+
+
+class SchematicDiff(NamedTuple):
+    """The changes between two schematics of the same size."""
+
+    positions: np.ndarray
+    """An (N, 3) array with the (x, y, z) position of each changed block, in BlockData order."""
+    old: np.ndarray
+    """The palette index of each changed block before the change."""
+    new: np.ndarray
+    """The palette index of each changed block after the change."""
+    palette: List[str]
+    """The block states the indices refer to: the palette of the old schematic, followed by the block states only found in the new one."""
+    added_block_entities: list
+    """The block entities at positions which had none, as nbtlib Compounds."""
+    removed_block_entities: list
+    """The block entities which are gone, as they were before the change."""
+    modified_block_entities: list
+    """The block entities whose content changed, as they are after the change."""
+
+    @property
+    def count(self) -> int:
+        """int: The number of changed blocks."""
+        return len(self.positions)
+
+    @property
+    def is_empty(self) -> bool:
+        """bool: True if nothing changed."""
+        return not (
+            len(self.positions)
+            or self.added_block_entities
+            or self.removed_block_entities
+            or self.modified_block_entities
+        )
+
+
+def diff_indices(old: np.ndarray, new: np.ndarray, table: np.ndarray):
+    """Find the cells where two index grids differ, once the new one is remapped.
+
+    The grids are compared in chunks of layers, so besides the result only one chunk of the
+    remapped grid is held in memory.
+
+    Args:
+        old (np.ndarray): The old palette indices, indexed as ``[y, z, x]``.
+        new (np.ndarray): The new palette indices, with the same shape.
+        table (np.ndarray): The index in the palette of old of each palette index of new.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The (x, y, z) positions of the changed cells, and their old and new indices in the palette of old.
+    """
+    identity = np.array_equal(table, np.arange(len(table)))
+
+    positions, old_values, new_values = [], [], []
+    for y0, old_chunk in layer_chunks(old):
+        new_chunk = new[y0 : y0 + len(old_chunk)]
+        if not identity:
+            new_chunk = table[new_chunk]
+        y, z, x = np.nonzero(old_chunk != new_chunk)
+        positions.append(np.stack((x, y + y0, z), axis=1).astype(np.int32))
+        old_values.append(old_chunk[y, z, x])
+        new_values.append(new_chunk[y, z, x])
+
+    return (
+        np.concatenate(positions),
+        np.concatenate(old_values).astype(np.int32),
+        np.concatenate(new_values).astype(np.int32),
+    )
+
+
+def diff_block_entities(old, new):
+    """Compare two lists of block entities by position.
+
+    Args:
+        old (Iterable[nbt.Compound]): The block entities before the change.
+        new (Iterable[nbt.Compound]): The block entities after the change.
+
+    Returns:
+        Tuple[list, list, list]: The added, removed and modified block entities.
+    """
+    old_by_position = {_position(block_entity): block_entity for block_entity in old}
+    new_by_position = {_position(block_entity): block_entity for block_entity in new}
+
+    added, removed, modified = [], [], []
+    for position, block_entity in new_by_position.items():
+        previous = old_by_position.get(position)
+        if previous is None:
+            added.append(block_entity)
+        elif previous != block_entity:
+            modified.append(block_entity)
+    for position, block_entity in old_by_position.items():
+        if position not in new_by_position:
+            removed.append(block_entity)
+    return added, removed, modified
+
+
+def patch_block_entities(block_entities, diff: SchematicDiff) -> list:
+    """Apply the block entity changes of a diff.
+
+    Args:
+        block_entities (Iterable[nbt.Compound]): The block entities to patch.
+        diff (SchematicDiff): The changes.
+
+    Returns:
+        list: The patched block entities.
+    """
+    by_position = {
+        _position(block_entity): block_entity for block_entity in block_entities
+    }
+    for block_entity in diff.removed_block_entities:
+        by_position.pop(_position(block_entity), None)
+    for block_entity in diff.added_block_entities + diff.modified_block_entities:
+        by_position[_position(block_entity)] = nbt.Compound(block_entity)
+    return list(by_position.values())
+
+
+def _position(block_entity) -> tuple:
+    """Get the position of a block entity as a hashable tuple."""
+    return tuple(int(i) for i in block_entity["Pos"])
@@ -0,0 +1,191 @@
+import io
+import itertools
+from typing import Iterable, Sequence, Tuple, Union
+import nbtlib as nbt
+import numpy as np
+from .utils import nbt_to_numpy
+
+# Tables with at least this many entities answer queries through a uniform grid
+GRID_THRESHOLD = 4096
+
+# Edge length of the cells of the grid, in blocks
+GRID_CELL_SIZE = 16
+
+
+class EntityTable:
+    def __init__(self, entities: Sequence[nbt.Compound]):
+        """The entities of a schematic as columns, for vectorized queries.
+
+        Positions are decoded into an (N, 3) ``float64`` array and ids into categorical codes
+        into the sorted ``types``. The rest of each entity is only converted with
+        ``nbt_to_numpy`` when it is accessed with ``table[i]``. Box and radius queries compare
+        whole arrays, and on large tables only the entities in the cells of a uniform grid
+        overlapping the query are compared.
+
+        Args:
+            entities (Sequence[nbt.Compound]): The Entities tag of a schematic, or a list of entity compounds.
+        """
+        self.raw = entities
+        self.positions = np.fromiter(
+            itertools.chain.from_iterable(entity["Pos"] for entity in entities),
+            dtype=np.float64,
+            count=3 * len(entities),
+        ).reshape(-1, 3)
+        self.positions.flags.writeable = False
+
+        types, codes = np.unique(
+            np.array([str(entity.get("Id", "")) for entity in entities], dtype=str),
+            return_inverse=True,
+        )
+        self.types = types.astype(object)
+        self.type_codes = codes.astype(np.int32).ravel()
+
+        self._payloads = {}
+        self._grid = None
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __getstate__(self):
+        # nbtlib List tags cannot be pickled, so the entities are pickled as their nbt payload
+        state = dict(self.__dict__, _payloads={})
+        buffer = io.BytesIO()
+        nbt.List[nbt.Compound](self.raw).write(buffer)
+        state["raw"] = buffer.getvalue()
+        return state
+
+    def __setstate__(self, state):
+        state["raw"] = nbt.List[nbt.Compound].parse(io.BytesIO(state["raw"]))
+        self.__dict__.update(state)
+
+    def __getitem__(self, i: int) -> dict:
+        """Get an entity as a dictionary, converted on first access like ``block_entities``."""
+        i = int(i)
+        payload = self._payloads.get(i)
+        if payload is None:
+            payload = nbt_to_numpy(self.raw[i])
+            self._payloads[i] = payload
+        return payload
+
+    @property
+    def ids(self) -> np.ndarray:
+        """np.ndarray: The id of each entity, e.g. ``minecraft:armor_stand``."""
+        return self.types[self.type_codes]
+
+    def counts(self) -> dict:
+        """Count the entities of each type.
+
+        Returns:
+            dict: The number of entities of each id, for the ids present.
+        """
+        counts = np.bincount(self.type_codes, minlength=len(self.types))
+        return dict(zip(self.types.tolist(), counts.tolist()))
+
+    def of_type(self, types: Union[str, Iterable[str]]) -> np.ndarray:
+        """Find the entities of some types.
+
+        Args:
+            types (Union[str, Iterable[str]]): An entity id, or several ids.
+
+        Returns:
+            np.ndarray: The indices of the matching entities, in order.
+        """
+        types = [types] if isinstance(types, str) else list(types)
+        codes = np.flatnonzero(np.isin(self.types, types))
+        return np.flatnonzero(np.isin(self.type_codes, codes))
+
+    def in_box(
+        self, start: Tuple[float, float, float], end: Tuple[float, float, float]
+    ) -> np.ndarray:
+        """Find the entities inside a box of blocks.
+
+        Like ``SchematicV2.region``, the corners are the positions of the first and last blocks
+        of the box, so an entity is inside when each coordinate is at least the smallest corner
+        and less than the largest corner plus one.
+
+        Args:
+            start (Tuple[float, float, float]): The (x, y, z) position of a corner of the box, inclusive.
+            end (Tuple[float, float, float]): The (x, y, z) position of the opposite corner, inclusive.
+
+        Returns:
+            np.ndarray: The indices of the entities inside the box, in order.
+        """
+        low = np.minimum(start, end).astype(np.float64)
+        high = np.maximum(start, end).astype(np.float64) + 1
+        candidates = self._candidates(low, high)
+        positions = self.positions[candidates]
+        inside = np.all((positions >= low) & (positions < high), axis=1)
+        return candidates[inside]
+
+    def in_radius(
+        self, center: Tuple[float, float, float], radius: float
+    ) -> np.ndarray:
+        """Find the entities within a distance of a point.
+
+        Args:
+            center (Tuple[float, float, float]): The (x, y, z) position of the center.
+            radius (float): The maximum distance, inclusive.
+
+        Returns:
+            np.ndarray: The indices of the entities within the radius, in order.
+        """
+        center = np.asarray(center, dtype=np.float64)
+        candidates = self._candidates(center - radius, center + radius)
+        distances = np.sum((self.positions[candidates] - center) ** 2, axis=1)
+        return candidates[distances <= radius * radius]
+
+    def take(self, indices: np.ndarray) -> "EntityTable":
+        """Get a table of some of the entities, e.g. the result of a query.
+
+        Args:
+            indices (np.ndarray): The indices of the entities.
+
+        Returns:
+            EntityTable: A table with these entities, in the order of indices.
+        """
+        return EntityTable([self.raw[i] for i in np.asarray(indices).tolist()])
+
+    def _candidates(self, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+        """Get the indices of the entities which may be inside a box, in order."""
+        if len(self) < GRID_THRESHOLD:
+            return np.arange(len(self))
+        if self._grid is None:
+            self._grid = _Grid(self.positions)
+        return self._grid.candidates(low, high)
+
+
+class _Grid:
+    def __init__(self, positions: np.ndarray):
+        """A uniform grid of cells of GRID_CELL_SIZE blocks, with the entities sorted by cell."""
+        cells = np.floor(positions / GRID_CELL_SIZE).astype(np.int64)
+        self.origin = cells.min(axis=0)
+        self.shape = cells.max(axis=0) - self.origin + 1
+        keys = self._keys(cells - self.origin)
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    def candidates(self, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+        """Get the indices of the entities in the cells overlapping a box, in order."""
+        first = np.floor(low / GRID_CELL_SIZE).astype(np.int64) - self.origin
+        last = np.floor(high / GRID_CELL_SIZE).astype(np.int64) - self.origin
+        first, last = np.maximum(first, 0), np.minimum(last, self.shape - 1)
+        if np.any(first > last):
+            return np.zeros(0, dtype=np.int64)
+        if np.prod(last - first + 1) > len(self.order):
+            # Comparing every entity is cheaper than looking up that many cells
+            return np.arange(len(self.order))
+
+        x, y, z = np.ix_(*(np.arange(a, b + 1) for a, b in zip(first, last)))
+        keys = np.broadcast_arrays(x, y, z)
+        keys = self._keys(np.stack([key.ravel() for key in keys], axis=1))
+
+        # The runs of the sorted entities of each cell, concatenated
+        starts = np.searchsorted(self.sorted_keys, keys, side="left")
+        lengths = np.searchsorted(self.sorted_keys, keys, side="right") - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return np.sort(self.order[offsets + np.arange(lengths.sum())])
+
+    def _keys(self, cells: np.ndarray) -> np.ndarray:
+        """Get the flat key of (x, y, z) cells, ordered like BlockData."""
+        width, _, length = self.shape
+        return cells[:, 0] + cells[:, 2] * width + cells[:, 1] * width * length
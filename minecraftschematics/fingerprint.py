@@ -0,0 +1,167 @@
+import hashlib
+import struct
+from typing import Iterable, Sequence
+import nbtlib as nbt
+import numpy as np
+from .utils import layer_chunks
+
+# Edge length of the cells whose block states make up the features of a sketch
+SKETCH_CELL = 4
+
+
+def palette_states(palette: dict) -> list:
+    """Get the block state of every palette index from the raw Palette tag, without creating Blocks.
+
+    Args:
+        palette (dict): The Palette compound, mapping block states to indices.
+
+    Returns:
+        list: The block state at each palette index.
+    """
+    states = [None] * len(palette)
+    for blockdata, index in palette.items():
+        states[int(index)] = str(blockdata)
+    return states
+
+
+def fingerprint(
+    indices: np.ndarray,
+    states: Sequence[str],
+    counts: np.ndarray,
+    block_entities: Iterable[nbt.Compound],
+) -> str:
+    """Hash the content of a schematic independently of its palette order.
+
+    The used palette entries are sorted and the index grid is remapped to the sorted order while
+    it is hashed, a chunk of layers at a time. The size, the sorted palette, the grid and the
+    block entities, with their keys sorted, are hashed. The offset, metadata, entities and
+    unused palette entries are not.
+
+    Args:
+        indices (np.ndarray): The palette indices, indexed as ``[y, z, x]``.
+        states (Sequence[str]): The block state of each palette index.
+        counts (np.ndarray): The number of blocks of each palette index.
+        block_entities (Iterable[nbt.Compound]): The block entities.
+
+    Returns:
+        str: A hexadecimal blake2b digest.
+    """
+    used = np.flatnonzero(counts[: len(states)] > 0)
+    order = sorted(used.tolist(), key=lambda index: states[index])
+    rank = np.zeros(len(states), dtype="<u4")
+    rank[order] = np.arange(len(order), dtype="<u4")
+
+    digest = hashlib.blake2b(digest_size=20)
+    height, length, width = indices.shape
+    digest.update(struct.pack("<3I", width, height, length))
+    digest.update("\n".join(states[index] for index in order).encode("utf-8"))
+    digest.update(b"\0")
+
+    for _, chunk in layer_chunks(indices):
+        digest.update(rank[chunk].tobytes())
+
+    for block_entity in sorted(
+        block_entities,
+        key=lambda block_entity: tuple(int(i) for i in block_entity["Pos"]),
+    ):
+        _canonical(block_entity).write(_Hasher(digest), "little")
+    return digest.hexdigest()
+
+
+def sketch(indices: np.ndarray, states: Sequence[str], size: int = 64) -> np.ndarray:
+    """Compute a bottom-k MinHash sketch of a schematic for near-duplicate detection.
+
+    The features are the (cell, block state) pairs of the schematic, with cells of
+    ``SKETCH_CELL`` blocks along each axis. Each feature is hashed once and the sketch keeps
+    the smallest distinct hashes, so two schematics which share most of their features share
+    most of their sketch, see ``sketch_similarity``. Only the smallest distinct hashes of each
+    chunk of layers are kept while scanning.
+
+    Args:
+        indices (np.ndarray): The palette indices, indexed as ``[y, z, x]``.
+        states (Sequence[str]): The block state of each palette index.
+        size (int, optional): The maximum number of hashes in the sketch. Defaults to 64.
+
+    Returns:
+        np.ndarray: The sorted ``uint64`` sketch, shorter than size if the schematic has fewer features.
+    """
+    # A hash of each block state, so features do not depend on the palette order
+    state_hashes = np.array(
+        [
+            int.from_bytes(
+                hashlib.blake2b(state.encode(), digest_size=8).digest(), "little"
+            )
+            for state in states
+        ],
+        dtype=np.uint64,
+    )
+
+    _, length, width = indices.shape
+    _, z, x = np.indices((1, length, width), sparse=True)
+    columns = (z // SKETCH_CELL).astype(np.uint64) * np.uint64(1 << 21) + (
+        x // SKETCH_CELL
+    ).astype(np.uint64)
+
+    result = np.zeros(0, dtype=np.uint64)
+    for y0, chunk in layer_chunks(indices):
+        y = np.arange(y0, y0 + len(chunk), dtype=np.uint64)[:, None, None]
+        cells = (y // np.uint64(SKETCH_CELL)) * np.uint64(1 << 42) + columns
+        hashes = _mix(cells ^ state_hashes[chunk]).ravel()
+        # A feature is shared by at most the blocks of its cell, so the smallest hashes counted
+        # with duplicates hold at least size distinct ones
+        candidates = size * SKETCH_CELL**3
+        if len(hashes) > candidates:
+            threshold = np.partition(hashes, candidates - 1)[candidates - 1]
+            hashes = hashes[hashes <= threshold]
+        result = np.unique(np.concatenate((result, hashes)))[:size]
+    return result
+
+
+def sketch_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimate the similarity of two schematics from their sketches.
+
+    Args:
+        a (np.ndarray): The sketch of the first schematic.
+        b (np.ndarray): The sketch of the second schematic, of the same size.
+
+    Returns:
+        float: An estimate of the Jaccard similarity of their features, from 0 to 1.
+    """
+    size = max(len(a), len(b))
+    union = np.union1d(a, b)[:size]
+    if not len(union):
+        return 1.0
+    shared = np.intersect1d(a, b)
+    return float(np.isin(union, shared).sum() / len(union))
+
+
+def _mix(values):
+    """Scramble 64-bit integers with the splitmix64 finalizer."""
+    with np.errstate(over="ignore"):
+        values = np.asarray(values, dtype=np.uint64)
+        values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return values ^ (values >> np.uint64(31))
+
+
+def _canonical(tag: nbt.Base) -> nbt.Base:
+    """Get a copy of a tag with the keys of every compound sorted."""
+    if isinstance(tag, nbt.Compound):
+        return nbt.Compound({key: _canonical(tag[key]) for key in sorted(tag)})
+    if (
+        isinstance(tag, nbt.List)
+        and tag
+        and isinstance(tag[0], (nbt.Compound, nbt.List))
+    ):
+        return nbt.List([_canonical(item) for item in tag])
+    return tag
+
+
+class _Hasher:
+    """A write-only file object feeding a hash, so nbtlib can serialize tags into it."""
+
+    def __init__(self, digest):
+        self.digest = digest
+
+    def write(self, data):
+        self.digest.update(data)
@@ -0,0 +1,388 @@
+import gzip
+import io
+import os
+import struct
+import time
+import nbtlib as nbt
+import numpy as np
+from .stats import current_stats, phase
+
+# Payload size in bytes of the tags with a fixed size, by tag id
+_FIXED_SIZES = {1: 1, 2: 2, 3: 4, 4: 8, 5: 4, 6: 8}
+
+# Item size in bytes of the array tags, by tag id
+_ARRAY_ITEM_SIZES = {7: 1, 11: 4, 12: 8}
+
+# Tags which are only decoded on first access
+_LAZY_TAG_IDS = {7, 9, 10, 11, 12}
+
+_BYTE = struct.Struct(">b")
+_USHORT = struct.Struct(">H")
+_INT = struct.Struct(">i")
+
+
+class LazyTag:
+    __slots__ = ("tag_id", "payload")
+
+    def __init__(self, tag_id: int, payload):
+        """A top-level tag of a lazily loaded file which has not been decoded yet.
+
+        Args:
+            tag_id (int): The nbt id of the tag.
+            payload (bytes or memoryview): The binary payload of the tag, without its id and name.
+        """
+        self.tag_id = tag_id
+        self.payload = payload
+
+    def decode(self) -> nbt.Base:
+        """Decode the payload into an nbtlib tag.
+
+        Array tags are copied out of the payload, so like the tags of an eagerly loaded file
+        they can be edited in place.
+
+        Returns:
+            nbt.Base: The decoded tag.
+        """
+        tag_type = nbt.Base.get_tag(self.tag_id)
+        if issubclass(tag_type, nbt.Array):
+            data = np.frombuffer(self.payload, tag_type.item_type["big"], offset=4)
+            return tag_type(data.copy(), byteorder="big")
+        return tag_type.parse(io.BytesIO(self.payload), "big")
+
+    def __reduce__(self):
+        return LazyTag, (self.tag_id, bytes(self.payload))
+
+    def __repr__(self) -> str:
+        return f"LazyTag({nbt.Base.get_tag(self.tag_id).__name__}, {len(self.payload)} bytes)"
+
+
+class LazyFile(nbt.File):
+    """An nbt file whose large top-level tags are only decoded when they are first accessed.
+
+    Scalar and string tags are decoded when the file is loaded. Arrays, lists and compounds are
+    kept as byte ranges of the decompressed file and decoded on first access, after which they
+    behave exactly like the tags of a file loaded with ``nbtlib.load``.
+    """
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if isinstance(value, LazyTag):
+            with phase(key, "decode") as event:
+                event.bytes = len(value.payload)
+                value = value.decode()
+            dict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key, default=None):
+        if isinstance(key, str):
+            return self[key] if key in self else default
+        return super().get(key, default)
+
+    def values(self):
+        self.decode_all()
+        return super().values()
+
+    def items(self):
+        self.decode_all()
+        return super().items()
+
+    def decode_all(self):
+        """Decode every tag which has not been accessed yet."""
+        for key, value in dict.items(self):
+            if isinstance(value, LazyTag):
+                dict.__setitem__(self, key, value.decode())
+
+    def is_decoded(self, key: str) -> bool:
+        """Check whether a top-level tag has already been decoded.
+
+        Args:
+            key (str): The name of the tag.
+
+        Returns:
+            bool: True if the tag has been decoded or does not exist.
+        """
+        return not isinstance(dict.get(self, key), LazyTag)
+
+    def __eq__(self, other) -> bool:
+        self.decode_all()
+        return super().__eq__(other)
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # Tags which were not decoded yet are pickled as their raw payload. nbtlib List tags
+        # cannot be pickled, so decoded lists and compounds are encoded again and decoded when
+        # the file is restored.
+        tags = {}
+        decoded = []
+        for key, value in dict.items(self):
+            if isinstance(value, (nbt.List, nbt.Compound)):
+                payload = io.BytesIO()
+                value.write(payload, "big")
+                value = LazyTag(value.tag_id, payload.getvalue())
+                decoded.append(key)
+            tags[key] = value
+        return _restore_lazy_file, (tags, decoded, self.__dict__)
+
+
+def _restore_lazy_file(tags: dict, decoded: list, attributes: dict) -> LazyFile:
+    """Rebuild a pickled LazyFile."""
+    result = LazyFile()
+    dict.update(result, tags)
+    for key in decoded:
+        dict.__setitem__(result, key, tags[key].decode())
+    result.__dict__.update(attributes)
+    return result
+
+
+def load_nbt(source) -> nbt.File:
+    """Load an nbt file, decoding all of its tags.
+
+    Files given by path are parsed straight from a gzip stream, so neither the compressed nor
+    the decompressed file is held in memory next to the parsed tags. When a LoadStats is
+    recording, the time spent reading and decompressing the stream is still recorded apart
+    from the parsing, as "read" and "inflate" events.
+
+    Args:
+        source (Union[str, os.PathLike, bytes, BinaryIO]): The path to the nbt file, its content or a binary file-like object, gzipped or not.
+
+    Returns:
+        nbt.File: The loaded file.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        ValueError: If the data is not valid nbt.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return _parse_stream(f, os.fspath(source), read=True)
+    return parse_nbt(read_source(source), lazy=False, filename=source_name(source))
+
+
+def load_lazy(source) -> LazyFile:
+    """Load an nbt file, only decoding its scalar top-level tags.
+
+    The file is decompressed at once and scanned to record where each top-level tag starts and
+    ends. Large tags such as BlockData, BlockEntities and Entities are skipped over without
+    being materialized, which makes reading header fields like the size or the offset of a
+    schematic much cheaper than a full ``nbtlib.load``.
+
+    Args:
+        source (Union[str, os.PathLike, bytes, BinaryIO]): The path to the nbt file, its content or a binary file-like object, gzipped or not.
+
+    Returns:
+        LazyFile: The loaded file.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        ValueError: If the file is not a valid nbt file with a compound root tag.
+    """
+    return parse_nbt(read_source(source), lazy=True, filename=source_name(source))
+
+
+def read_source(source) -> bytes:
+    """Read the whole content of a path, bytes-like object or binary file-like object.
+
+    Args:
+        source (Union[str, os.PathLike, bytes, BinaryIO]): What to read.
+
+    Returns:
+        bytes: The content, still compressed if it is gzipped. Bytes-like sources are returned without copying.
+    """
+    with phase("read") as event:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            data = source
+        elif hasattr(source, "read"):
+            data = source.read()
+        else:
+            with open(source, "rb") as f:
+                data = f.read()
+        event.bytes = len(data)
+    return data
+
+
+def parse_nbt(data, lazy: bool = False, filename: str = None) -> nbt.File:
+    """Decompress and parse the content of an nbt file.
+
+    Lazy loads decompress the whole file before scanning it, as the undecoded tags are views
+    of the decompressed data. Eager loads parse the file straight from a gzip stream, so the
+    decompressed file is never held in memory next to the parsed tags, and the parse phase
+    includes the decompression.
+
+    Args:
+        data (bytes): The content of the file, gzipped or not.
+        lazy (bool, optional): Return a LazyFile which only decodes large tags on access. Defaults to False.
+        filename (str, optional): The path stored as the filename of the result. Defaults to None.
+
+    Returns:
+        nbt.File: The parsed file, a LazyFile if lazy is True.
+
+    Raises:
+        ValueError: If the data is not valid nbt.
+    """
+    if not lazy:
+        return _parse_stream(io.BytesIO(data), filename)
+
+    gzipped = bytes(data[:2]) == b"\x1f\x8b"
+    if gzipped:
+        with phase("inflate") as event:
+            try:
+                data = gzip.decompress(data)
+            except (OSError, EOFError) as e:
+                raise ValueError(f"Invalid gzip data: {e}") from e
+            event.bytes = len(data)
+
+    with phase("scan") as event:
+        event.bytes = len(data)
+        result = _parse_root(memoryview(data))
+    result.filename = filename
+    result.gzipped = gzipped
+    return result
+
+
+def _parse_stream(stream, filename: str = None, read: bool = False) -> nbt.File:
+    """Parse an nbt file from a seekable binary stream, through a gzip stream if it is gzipped.
+
+    When a LoadStats is recording, the reads of the stream and of the gzip stream are timed.
+    Their totals are recorded as "inflate" and, if read is True, "read" events, followed by a
+    "parse" event with the rest of the time. The reads are interleaved with the parsing, so
+    the events add up to the whole load but do not match when each read happened.
+    """
+    with phase("parse") as event:
+        gzipped = stream.read(2) == b"\x1f\x8b"
+        stream.seek(0)
+        stats = current_stats()
+        raw = source = stream if stats is None else _TimedReader(stream)
+        if gzipped:
+            inflated = gzip.GzipFile(fileobj=raw, mode="rb")
+            if stats is not None:
+                inflated = _TimedReader(inflated)
+            source = inflated
+        if gzipped or stats is not None:
+            # nbtlib reads a few bytes at a time, which is much cheaper from a C buffer
+            source = io.BufferedReader(source)
+        try:
+            result = nbt.File.parse(source, "big")
+        except OSError as e:
+            raise ValueError(f"Invalid gzip data: {e}") from e
+        except (KeyError, TypeError, EOFError, struct.error) as e:
+            raise ValueError(f"Invalid nbt data: {e}") from e
+        event.bytes = source.tell()
+
+        if stats is not None:
+            if read:
+                stats.add("read", event.start, raw.time, bytes=raw.bytes)
+                event.skipped += raw.time
+            if gzipped:
+                duration = inflated.time - raw.time
+                stats.add(
+                    "inflate",
+                    event.start + event.skipped,
+                    duration,
+                    bytes=inflated.bytes,
+                )
+                event.skipped += duration
+
+    result.filename = filename
+    result.gzipped = gzipped
+    return result
+
+
+class _TimedReader(io.RawIOBase):
+    def __init__(self, stream):
+        """A reader which adds up the time spent reading another binary stream."""
+        self.stream = stream
+        self.time = 0.0
+        self.bytes = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.bytes
+
+    def readinto(self, buffer) -> int:
+        start = time.perf_counter()
+        count = self.stream.readinto(buffer)
+        self.time += time.perf_counter() - start
+        self.bytes += count
+        return count
+
+
+def source_name(source) -> str:
+    """Get the path of a source, if it is a path or a file object with a name, else None."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    name = getattr(source, "name", None)
+    return name if isinstance(name, str) else None
+
+
+def _parse_root(data: memoryview) -> LazyFile:
+    """Scan the top-level tags of a decompressed nbt file."""
+    try:
+        if data[0] != nbt.Compound.tag_id:
+            raise ValueError("Non-Compound root tags are not supported.")
+        root_name, position = _read_string(data, 1)
+
+        result = LazyFile(root_name=root_name)
+        while True:
+            tag_id = data[position]
+            position += 1
+            if tag_id == 0:
+                break
+            name, position = _read_string(data, position)
+            end = _skip_payload(data, tag_id, position)
+            if end > len(data):
+                raise ValueError(f"Tag {name!r} is truncated.")
+
+            if tag_id in _LAZY_TAG_IDS:
+                dict.__setitem__(result, name, LazyTag(tag_id, data[position:end]))
+            else:
+                tag_type = nbt.Base.get_tag(tag_id)
+                tag = tag_type.parse(io.BytesIO(data[position:end]), "big")
+                dict.__setitem__(result, name, tag)
+            position = end
+    except (IndexError, KeyError, struct.error) as e:
+        raise ValueError("Malformed nbt data.") from e
+
+    return result
+
+
+def _read_string(data: memoryview, position: int):
+    """Read a string and return it with the position right after it."""
+    (length,) = _USHORT.unpack_from(data, position)
+    position += _USHORT.size
+    return (
+        bytes(data[position : position + length]).decode("utf-8", "replace"),
+        position + length,
+    )
+
+
+def _skip_payload(data: memoryview, tag_id: int, position: int) -> int:
+    """Get the position right after the payload of a tag without decoding it."""
+    if tag_id in _FIXED_SIZES:
+        return position + _FIXED_SIZES[tag_id]
+    if tag_id in _ARRAY_ITEM_SIZES:
+        (length,) = _INT.unpack_from(data, position)
+        return position + _INT.size + length * _ARRAY_ITEM_SIZES[tag_id]
+    if tag_id == nbt.String.tag_id:
+        (length,) = _USHORT.unpack_from(data, position)
+        return position + _USHORT.size + length
+    if tag_id == nbt.List.tag_id:
+        (item_id,) = _BYTE.unpack_from(data, position)
+        (length,) = _INT.unpack_from(data, position + _BYTE.size)
+        position += _BYTE.size + _INT.size
+        if item_id in _FIXED_SIZES:
+            return position + max(length, 0) * _FIXED_SIZES[item_id]
+        for _ in range(length):
+            position = _skip_payload(data, item_id, position)
+        return position
+    if tag_id == nbt.Compound.tag_id:
+        while True:
+            item_id = data[position]
+            position += 1
+            if item_id == 0:
+                return position
+            (length,) = _USHORT.unpack_from(data, position)
+            position = _skip_payload(data, item_id, position + _USHORT.size + length)
+    raise KeyError(tag_id)
@@ -0,0 +1,117 @@
+from typing import NamedTuple
+import numpy as np
+
+# Number of layers scanned at once from the top when looking for the highest blocks
+_TOP_LAYERS = 16
+
+
+class TopView(NamedTuple):
+    """The highest non-air block of every column of a schematic, seen from above."""
+
+    heights: np.ndarray
+    """A (length, width) array with the y of the highest non-air block of each column, or -1 for empty columns."""
+    blocks: np.ndarray
+    """A (length, width) array with the palette index of the highest non-air block of each column, or of air for empty columns."""
+
+
+def downsample(indices: np.ndarray, factor: int, air: np.ndarray) -> np.ndarray:
+    """Reduce blocks of factor x factor x factor cells to their most frequent non-air index.
+
+    The grid is processed one layer of coarse cells at a time. The indices of each coarse cell
+    are sorted, runs of equal indices are counted with ``np.bincount`` and the longest run of a
+    non-air index wins, the smallest index on ties. Cells that only contain air get the first
+    air index of the palette. Cells on the border of the grid only count the blocks inside it.
+
+    Args:
+        indices (np.ndarray): The palette indices, indexed as ``[y, z, x]``.
+        factor (int): The edge length of the coarse cells, in cells of indices.
+        air (np.ndarray): A boolean array, True for the palette indices of air.
+
+    Returns:
+        np.ndarray: The coarse indices, with the shape of indices divided by factor and rounded up.
+    """
+    height, length, width = indices.shape
+    coarse_length, coarse_width = -(-length // factor), -(-width // factor)
+    volume = factor**3
+    result = np.empty(
+        (-(-height // factor), coarse_length, coarse_width), dtype=indices.dtype
+    )
+    if not result.size:
+        return result
+
+    # Air and the padding outside of the grid sort after every other index
+    sentinel = len(air)
+    lookup = np.arange(len(air) + 1, dtype=np.int64)
+    lookup[:-1][air] = sentinel
+    fill = np.flatnonzero(air)[0] if air.any() else 0
+
+    for coarse_y in range(len(result)):
+        slab = lookup[indices[coarse_y * factor : (coarse_y + 1) * factor]]
+        slab = np.pad(
+            slab,
+            (
+                (0, factor - len(slab)),
+                (0, coarse_length * factor - length),
+                (0, coarse_width * factor - width),
+            ),
+            constant_values=sentinel,
+        )
+        cells = slab.reshape(factor, coarse_length, factor, coarse_width, factor)
+        cells = cells.transpose(1, 3, 0, 2, 4).reshape(-1, volume)
+        cells.sort(axis=1)
+
+        values = cells.ravel()
+        new_run = np.ones(len(values), dtype=bool)
+        new_run[1:] = values[1:] != values[:-1]
+        new_run[::volume] = True
+        run_ids = np.cumsum(new_run) - 1
+        counts = np.bincount(run_ids)
+        starts = np.flatnonzero(new_run)
+        counts[values[starts] == sentinel] = 0
+
+        # The first of the longest runs of each cell
+        rows = starts // volume
+        best = np.maximum.reduceat(counts, run_ids[::volume])
+        candidates = np.flatnonzero(counts == best[rows])
+        _, first = np.unique(rows[candidates], return_index=True)
+        modes = values[starts[candidates[first]]]
+        result[coarse_y] = np.where(best > 0, modes, fill).reshape(
+            coarse_length, coarse_width
+        )
+    return result
+
+
+def top_view(indices: np.ndarray, air: np.ndarray) -> TopView:
+    """Find the highest non-air block of every column.
+
+    Layers are scanned from the top a few at a time, and the scan stops as soon as every column
+    has a block, so tall builds with a roof are cheap.
+
+    Args:
+        indices (np.ndarray): The palette indices, indexed as ``[y, z, x]``.
+        air (np.ndarray): A boolean array, True for the palette indices of air.
+
+    Returns:
+        TopView: The heights and palette indices of the highest blocks.
+    """
+    height, length, width = indices.shape
+    heights = np.full((length, width), -1, dtype=np.int32)
+    blocks = np.full(
+        (length, width),
+        np.flatnonzero(air)[0] if air.any() else 0,
+        dtype=indices.dtype,
+    )
+
+    missing = np.ones((length, width), dtype=bool)
+    for top in range(height, 0, -_TOP_LAYERS):
+        layers = indices[max(top - _TOP_LAYERS, 0) : top][::-1]
+        solid = ~air[layers] & missing
+        found = solid.any(axis=0)
+        depth = np.argmax(solid, axis=0)
+        z, x = np.nonzero(found)
+        heights[z, x] = top - 1 - depth[z, x]
+        blocks[z, x] = layers[depth[z, x], z, x]
+        missing &= ~found
+        if not missing.any():
+            break
+    return TopView(heights, blocks)
@@ -0,0 +1,152 @@
+from typing import Iterable, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from .utils import layer_chunks
+
+
+class BillOfMaterials(NamedTuple):
+    """The blocks a schematic is made of, overall and layer by layer."""
+
+    counts: dict
+    """The number of blocks of each block state present, air included, from the most to the least used."""
+    type_counts: dict
+    """The number of blocks of each block type, with the properties of the states collapsed, from the most to the least used."""
+    types: list
+    """The block types, in the order of the columns of layers."""
+    layers: np.ndarray
+    """A (height, len(types)) array with the number of blocks of each type in each layer, from the bottom."""
+    bounding_box: Optional[Tuple[Tuple[int, int, int], Tuple[int, int, int]]]
+    """The (x, y, z) positions of the corners of the smallest box containing every non-air block, inclusive, or None if there is none."""
+
+    @classmethod
+    def combine(cls, bills: Iterable["BillOfMaterials"]) -> "BillOfMaterials":
+        """Add up the bills of materials of several schematics.
+
+        Layers are aligned at the bottom of each schematic, and the bounding box contains the
+        bounding boxes of every schematic, in the coordinates of each schematic.
+
+        Args:
+            bills (Iterable[BillOfMaterials]): The bills of materials.
+
+        Returns:
+            BillOfMaterials: The totals.
+        """
+        bills = list(bills)
+        counts, type_counts = {}, {}
+        for bill in bills:
+            for state, count in bill.counts.items():
+                counts[state] = counts.get(state, 0) + count
+            for block_type, count in bill.type_counts.items():
+                type_counts[block_type] = type_counts.get(block_type, 0) + count
+
+        types = sorted(type_counts)
+        columns = {block_type: i for i, block_type in enumerate(types)}
+        layers = np.zeros(
+            (max((len(bill.layers) for bill in bills), default=0), len(types)),
+            dtype=np.int64,
+        )
+        for bill in bills:
+            indices = [columns[block_type] for block_type in bill.types]
+            layers[: len(bill.layers), indices] += bill.layers
+
+        boxes = np.array(
+            [bill.bounding_box for bill in bills if bill.bounding_box is not None]
+        )
+        bounding_box = (
+            (
+                tuple(boxes[:, 0].min(axis=0).tolist()),
+                tuple(boxes[:, 1].max(axis=0).tolist()),
+            )
+            if len(boxes)
+            else None
+        )
+        return cls(
+            _sorted_counts(counts),
+            _sorted_counts(type_counts),
+            types,
+            layers,
+            bounding_box,
+        )
+
+
+def bill_of_materials(
+    indices: np.ndarray, states: Sequence[str], types: Sequence[str], air: np.ndarray
+) -> BillOfMaterials:
+    """Count the blocks of a schematic with one pass of ``np.bincount`` over its indices.
+
+    The indices are counted per layer and per palette index, a chunk of layers at a time. The
+    overall counts, the counts per type and the layers of each type are sums of this table,
+    and the palette is only used to name its rows and columns.
+
+    Args:
+        indices (np.ndarray): The palette indices, indexed as ``[y, z, x]``.
+        states (Sequence[str]): The block state of each palette index.
+        types (Sequence[str]): The block type of each palette index.
+        air (np.ndarray): A boolean array, True for the palette indices of air.
+
+    Returns:
+        BillOfMaterials: The counts and the bounding box of the non-air blocks.
+    """
+    height = len(indices)
+    palette_size = len(states)
+
+    by_layer = np.zeros((height, palette_size), dtype=np.int64)
+    for y, chunk in layer_chunks(indices):
+        offsets = np.arange(len(chunk), dtype=np.intp)[:, None, None] * palette_size
+        by_layer[y : y + len(chunk)] = np.bincount(
+            (chunk + offsets).ravel(), minlength=len(chunk) * palette_size
+        ).reshape(len(chunk), palette_size)
+
+    # Layers of each block type: the columns of the palette indices of a type added up
+    type_names, type_of = np.unique(np.array(types, dtype=object), return_inverse=True)
+    type_layers = np.zeros((height, len(type_names)), dtype=np.int64)
+    np.add.at(type_layers.T, type_of.ravel(), by_layer.T)
+
+    counts = by_layer.sum(axis=0)
+    type_totals = type_layers.sum(axis=0)
+    present = type_totals > 0
+    type_names, type_layers = type_names[present], type_layers[:, present]
+    type_totals = type_totals[present]
+
+    bounding_box = None
+    solid_y = np.flatnonzero(by_layer[:, ~air].sum(axis=1))
+    if len(solid_y):
+        y0, y1 = int(solid_y[0]), int(solid_y[-1])
+        (x0, z0), (x1, z1) = _solid_extent(
+            indices[y0 : y1 + 1], np.flatnonzero(air & (counts > 0))
+        )
+        bounding_box = ((x0, y0, z0), (x1, y1, z1))
+
+    return BillOfMaterials(
+        _sorted_counts(
+            {states[i]: int(counts[i]) for i in np.flatnonzero(counts).tolist()}
+        ),
+        _sorted_counts(dict(zip(type_names.tolist(), type_totals.tolist()))),
+        type_names.tolist(),
+        type_layers,
+        bounding_box,
+    )
+
+
+def _solid_extent(indices: np.ndarray, air: np.ndarray):
+    """Find the first and last x and z of the non-air blocks, given the air indices present."""
+    _, length, width = indices.shape
+    solid_z = np.zeros(length, dtype=bool)
+    solid_x = np.zeros(width, dtype=bool)
+    if not len(air):
+        solid_z[:], solid_x[:] = True, True
+    else:
+        for _, chunk in layer_chunks(indices):
+            # Comparing with the few air indices is much faster than a lookup in the palette
+            solid = chunk != air[0]
+            for index in air[1:]:
+                solid &= chunk != index
+            solid_z |= solid.any(axis=(0, 2))
+            solid_x |= solid.any(axis=(0, 1))
+
+    x, z = np.flatnonzero(solid_x), np.flatnonzero(solid_z)
+    return (int(x[0]), int(z[0])), (int(x[-1]), int(z[-1]))
+
+
+def _sorted_counts(counts: dict) -> dict:
+    """Sort counts from the largest to the smallest, then by name."""
+    return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
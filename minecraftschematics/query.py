@@ -0,0 +1,122 @@
+import re
+from typing import Callable, Iterable, Optional, Pattern, Sequence, Tuple, Union
+import numpy as np
+from .block import Block
+
+
+def palette_mask(
+    palette: Sequence[Block],
+    type: str = None,
+    tag: Iterable[str] = None,
+    properties: dict = None,
+    pattern: Union[str, Pattern] = None,
+    predicate: Callable[[Block], bool] = None,
+) -> np.ndarray:
+    """Evaluate block criteria once per palette entry.
+
+    All given criteria must match. Block types without a namespace are assumed to be in the
+    ``minecraft`` namespace.
+
+    Args:
+        palette (Sequence[Block]): The palette to evaluate, e.g. ``SchematicV2.palette``.
+        type (str, optional): The block type, e.g. ``minecraft:chest``. Defaults to None.
+        tag (Iterable[str], optional): A set of block types, e.g. the content of a block tag such as ``#minecraft:logs``. Defaults to None.
+        properties (dict, optional): Properties the block must have, e.g. ``{"facing": "north"}``. Defaults to None.
+        pattern (Union[str, Pattern], optional): A regular expression searched in the raw block state. Defaults to None.
+        predicate (Callable[[Block], bool], optional): A function returning True for matching blocks. Defaults to None.
+
+    Returns:
+        np.ndarray: A boolean array with one entry per palette index.
+    """
+    if type is not None:
+        type = _with_namespace(type)
+    if tag is not None:
+        tag = {_with_namespace(block_type) for block_type in tag}
+    if properties is not None:
+        properties = {key: str(value) for key, value in properties.items()}
+    if isinstance(pattern, str):
+        pattern = re.compile(pattern)
+
+    result = np.zeros(len(palette), dtype=bool)
+    for index, block in enumerate(palette):
+        if block is None:
+            continue
+        if type is not None and block.type != type:
+            continue
+        if tag is not None and block.type not in tag:
+            continue
+        if properties is not None:
+            block_properties = block.properties
+            if any(
+                block_properties.get(key) != value for key, value in properties.items()
+            ):
+                continue
+        if pattern is not None and not pattern.search(block.raw):
+            continue
+        if predicate is not None and not predicate(block):
+            continue
+        result[index] = True
+
+    return result
+
+
+class BlockSelection:
+    def __init__(self, schematic, palette_mask: np.ndarray):
+        """The blocks of a schematic matching some criteria.
+
+        The criteria have already been evaluated once per palette entry, every result is then
+        computed with vectorized operations over the palette indices of the schematic.
+
+        Args:
+            schematic (SchematicV2): The schematic the blocks are selected from.
+            palette_mask (np.ndarray): A boolean array telling which palette entries are selected.
+        """
+        self.schematic = schematic
+        self.palette_mask = palette_mask
+
+    @property
+    def count(self) -> int:
+        """int: The number of selected blocks."""
+        return int(self.schematic.block_counts[self.palette_mask].sum())
+
+    @property
+    def counts(self) -> dict:
+        """dict: The number of blocks of each selected palette entry that occurs, keyed by raw block state."""
+        palette = self.schematic.palette
+        block_counts = self.schematic.block_counts
+        return {
+            palette[index].raw: int(block_counts[index])
+            for index in np.flatnonzero(self.palette_mask & (block_counts > 0))
+        }
+
+    @property
+    def mask(self) -> np.ndarray:
+        """np.ndarray: A boolean array of shape (height, length, width), indexed as ``[y, z, x]``, True for selected blocks."""
+        return self.palette_mask[self.schematic.block_indices]
+
+    @property
+    def positions(self) -> np.ndarray:
+        """np.ndarray: An (N, 3) array with the (x, y, z) position of every selected block."""
+        y, z, x = np.nonzero(self.mask)
+        return np.stack((x, y, z), axis=1)
+
+    @property
+    def bounding_box(
+        self,
+    ) -> Optional[Tuple[Tuple[int, int, int], Tuple[int, int, int]]]:
+        """The smallest box containing every selected block, as its (x, y, z) minimum and maximum corners (inclusive), or None if no block is selected."""
+        mask = self.mask
+        y = np.flatnonzero(mask.any(axis=(1, 2)))
+        if y.size == 0:
+            return None
+        z = np.flatnonzero(mask.any(axis=(0, 2)))
+        x = np.flatnonzero(mask.any(axis=(0, 1)))
+        return (int(x[0]), int(y[0]), int(z[0])), (int(x[-1]), int(y[-1]), int(z[-1]))
+
+    def __len__(self) -> int:
+        return self.count
+
+
+def _with_namespace(block_type: str) -> str:
+    """Add the implicit minecraft namespace to a block type."""
+    return block_type if ":" in block_type else f"minecraft:{block_type}"
@@ -1,6 +1,30 @@
 from .schematic_v2 import SchematicV2
-import nbtlib as nbt
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, wait
+from typing import Iterable, Iterator, NamedTuple, Sequence
+import numpy as np
+from .aio import read_source_async, run_in_executor
+from .lazy import parse_nbt, source_name
 from .schematic_schema import SchematicSchema
+from .stats import phase
+
+
+class LoadResult(NamedTuple):
+    """The outcome of loading one file with ``Schematic.load_many``."""
+
+    path: str
+    schematic: SchematicSchema
+    error: Exception
+
+
+class FingerprintResult(NamedTuple):
+    """The outcome of fingerprinting one file with ``Schematic.fingerprint_many``."""
+
+    path: str
+    fingerprint: str
+    sketch: np.ndarray
+    error: Exception
 
 
 class Schematic(SchematicSchema):
@@ -9,44 +33,193 @@ class Schematic(SchematicSchema):
         super().__init__()
 
     @staticmethod
-    def load(path: str, force=False):
+    def load(path: str, force=False, lazy=False):
         """Load the schematic from a file.
 
         Args:
-            path (str): The path to the schematic file.
+            path (Union[str, os.PathLike, bytes, BinaryIO]): The path to the schematic file, its content or a binary file-like object.
             force (bool, optional): Force loading the schematic even if it is an incompatible version. Defaults to False. (Not recommended as it may cause unintended errors.)
+            lazy (bool, optional): Only decode header fields such as the size, offset or metadata when loading, and decode large tags like BlockData and BlockEntities on first access. Defaults to False.
 
         Returns:
             Schematic: An instance of the Schematic class.
 
         Raises:
             FileNotFoundError: If the file does not exist.
-            nbt.lib.MalformedFileError: If the file cannot be loaded due to a parsing error.
+            ValueError: If the file cannot be loaded due to a parsing error.
             Exception: If the schematic is an incompatible version and force is False.
         """
-        try:
-            raw = nbt.load(path)
-            if not force:
-                match raw.get("Version"):
-                    case None:
-                        raise Exception(
-                            "Version not found. This is likely due to an old version of the schematic format which this library does not support. Check out https://github.com/cbs228/nbtschematic for a library that supports version 1."
-                        )
-                    case 1:
-                        raise Exception(
-                            "Version 1 is not supported as it is an old version of the schematic format. Check out https://github.com/cbs228/nbtschematic for a library that supports version 1."
-                        )
-                    case 2:
-                        s = SchematicV2()
-                        s.raw = raw
-
-                    case _:
-                        raise Exception(
-                            f"This library does not fully support the version {raw.get('Version')} of the schematic format. Use force=True to force loading the schematic. This may cause unintended errors."
-                        )
+        # Version 2 is the only version supported, SchematicV2 checks the version of the file
+        return SchematicV2.load(path, force=force, lazy=lazy)
 
+    @staticmethod
+    async def aload(path, force=False, lazy=False, executor: Executor = None):
+        """Load the schematic without blocking the event loop.
+
+        The file is read in a thread, or awaited if ``path`` is a file-like object with a
+        coroutine ``read`` method. Inflating and parsing run in the executor set with
+        ``minecraftschematics.aio.configure``, within its concurrency limit.
+
+        Args:
+            path (Union[str, os.PathLike, bytes, BinaryIO]): The path to the schematic file, its content or a file-like object, e.g. an upload.
+            force (bool, optional): Force loading the schematic even if it is an incompatible version. Defaults to False.
+            lazy (bool, optional): Only decode header fields when loading. Defaults to False.
+            executor (Executor, optional): The executor to parse the file in instead of the configured one. Defaults to None.
+
+        Returns:
+            Schematic: An instance of the Schematic class.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            ValueError: If the file cannot be loaded due to a parsing error.
+            Exception: If the schematic is an incompatible version and force is False.
+        """
+        name = source_name(path) or "<data>"
+        try:
+            data = await read_source_async(path)
         except FileNotFoundError as e:
-            raise FileNotFoundError(f"File not found: {path}") from e
-        except nbt.lib.MalformedFileError as e:
-            raise nbt.lib.MalformedFileError(f"Error loading schematic: {path}") from e
-        return s
+            raise FileNotFoundError(f"File not found: {name}") from e
+        return await run_in_executor(
+            _parse_worker, data, name, force, lazy, executor=executor
+        )
+
+    @staticmethod
+    def load_many(
+        paths: Iterable[str],
+        workers: int = None,
+        fields: Sequence[str] = None,
+        ordered: bool = True,
+        force: bool = False,
+    ) -> Iterator[LoadResult]:
+        """Load many schematics in parallel over a process pool.
+
+        Each file is loaded, and the requested fields are computed, in a worker process. The
+        schematics are sent back with their cache filled, so accessing these fields in the parent
+        process is free. When fields are given, files are loaded lazily and tags that none of the
+        fields needed are sent back undecoded. Only the values of the fields are sent back, not
+        the array and list tags they were computed from, such as BlockData: other properties
+        derived from these tags are not available on the returned schematics, and they cannot
+        be saved.
+
+        Prefer fields backed by numpy arrays such as ``block_data``, ``block_indices`` or
+        ``biome_data``: they are pickled as flat buffers, while object arrays like ``blocks``
+        have to pickle every Block.
+
+        Args:
+            paths (Iterable[str]): The paths to the schematic files.
+            workers (int, optional): The number of worker processes. Defaults to the number of CPUs. With 1, files are loaded in the current process.
+            fields (Sequence[str], optional): The names of the properties to compute in the workers. Defaults to None (the whole file is decoded).
+            ordered (bool, optional): Yield results in the order of paths instead of completion order. Defaults to True.
+            force (bool, optional): Force loading schematics even if they are an incompatible version. Defaults to False.
+
+        Yields:
+            LoadResult: The path with either the loaded schematic or the error raised while loading it. Errors do not stop the batch.
+
+        Raises:
+            ValueError: If one of the fields is not a property of the schematic.
+        """
+        fields = tuple(fields or ())
+        for field in fields:
+            if not isinstance(getattr(SchematicV2, field, None), property):
+                raise ValueError(f"Unknown schematic field: {field}")
+
+        return _map_paths(_load_worker, paths, workers, ordered, force, fields)
+
+    @staticmethod
+    def fingerprint_many(
+        paths: Iterable[str],
+        workers: int = None,
+        sketch_size: int = None,
+        ordered: bool = True,
+        force: bool = False,
+    ) -> Iterator["FingerprintResult"]:
+        """Fingerprint many schematics in parallel over a process pool, e.g. to find duplicates.
+
+        Files are loaded lazily in the worker processes, so the metadata and entities are never
+        decoded, and only the digests are sent back. No Block objects are created.
+
+        Args:
+            paths (Iterable[str]): The paths to the schematic files.
+            workers (int, optional): The number of worker processes. Defaults to the number of CPUs. With 1, files are processed in the current process.
+            sketch_size (int, optional): Also compute a sketch of this size, see ``SchematicV2.sketch``. Defaults to None (no sketch).
+            ordered (bool, optional): Yield results in the order of paths instead of completion order. Defaults to True.
+            force (bool, optional): Force loading schematics even if they are an incompatible version. Defaults to False.
+
+        Yields:
+            FingerprintResult: The path with either its fingerprint and sketch or the error raised while loading it. Errors do not stop the batch.
+        """
+        return _map_paths(
+            _fingerprint_worker, paths, workers, ordered, force, sketch_size
+        )
+
+
+def _map_paths(worker, paths: Iterable[str], workers: int, ordered: bool, *args):
+    """Run a worker on every path over a process pool, yielding the results as they come.
+
+    Only a few paths per worker are submitted at once, so results can be streamed and the
+    paths may be a lazy iterable.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for path in paths:
+            yield worker(path, *args)
+        return
+
+    paths = iter(paths)
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = deque()
+        for path in paths:
+            pending.append(executor.submit(worker, path, *args))
+            if len(pending) >= 2 * workers:
+                break
+
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                done = [future for future in pending if future in finished]
+                for future in done:
+                    pending.remove(future)
+
+            for future in done:
+                yield future.result()
+                path = next(paths, None)
+                if path is not None:
+                    pending.append(executor.submit(worker, path, *args))
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def _parse_worker(data: bytes, name: str, force: bool, lazy: bool) -> SchematicV2:
+    """Parse the content of a schematic file. Runs in the executor of aload."""
+    try:
+        with phase("load", path=name):
+            raw = parse_nbt(data, lazy, None if name == "<data>" else name)
+    except ValueError as e:
+        raise ValueError(f"Error loading schematic: {name}") from e
+    return SchematicV2.from_raw(raw, force)
+
+
+def _load_worker(path: str, force: bool, fields: Sequence[str]) -> LoadResult:
+    """Load a schematic and compute the given fields. Runs in the worker processes of load_many."""
+    try:
+        schematic = Schematic.load(path, force=force, lazy=bool(fields))
+        for field in fields:
+            getattr(schematic, field)
+        if fields:
+            schematic._keep_fields(fields)
+        return LoadResult(path, schematic, None)
+    except Exception as e:
+        return LoadResult(path, None, e)
+
+
+def _fingerprint_worker(path: str, force: bool, sketch_size: int) -> FingerprintResult:
+    """Fingerprint a schematic. Runs in the worker processes of fingerprint_many."""
+    try:
+        schematic = Schematic.load(path, force=force, lazy=True)
+        sketch = schematic.sketch(sketch_size) if sketch_size else None
+        return FingerprintResult(path, schematic.fingerprint, sketch, None)
+    except Exception as e:
+        return FingerprintResult(path, None, None, e)
@@ -1,13 +1,134 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import Executor
 from typing import Tuple
+import nbtlib as nbt
 import numpy as np
+from .aio import get_fields, is_process_executor, run_in_executor
+from .lazy import LazyFile, LazyTag
+from .utils import is_fresh
 
 
 class SchematicSchema(ABC):
     def __init__(self):
         """Representation of a Minecraft schematic."""
+        self._cache = {}
         self.raw = None
 
+    @property
+    def raw(self):
+        """The raw nbt data of the schematic. Assigning a new value clears the cache."""
+        return self._raw
+
+    @raw.setter
+    def raw(self, value):
+        self._raw = value
+        self.clear_cache()
+
+    def clear_cache(self):
+        """Clear all values cached from the raw nbt data.
+
+        Derived properties are computed once and reused until the raw tags they depend on are
+        replaced. Call this method after editing tags of ``raw`` in place.
+        """
+        self._cache.clear()
+
+    def _get_cached(self, name: str):
+        """Get the value of a cached property if it is already cached, else None."""
+        entry = self._cache.get((name,))
+        if entry is not None and is_fresh(self.raw, *entry[1:]):
+            return entry[0]
+        return None
+
+    def _set_cached(self, name: str, value):
+        """Store an already known value in the cache of a cached property."""
+        keys = getattr(type(self), name).fget.cache_keys
+        self._cache[(name,)] = (
+            value,
+            keys,
+            tuple(dict.get(self.raw, key) for key in keys),
+        )
+
+    async def aget(self, *names: str, executor: Executor = None):
+        """Compute properties without blocking the event loop.
+
+        The properties are computed in the executor set with ``minecraftschematics.aio.configure``,
+        within its concurrency limit, and cached as if they had been accessed directly.
+
+        Args:
+            *names (str): The names of the properties, e.g. "blocks" or "block_entities".
+            executor (Executor, optional): The executor to use instead of the configured one. Defaults to None.
+
+        Returns:
+            The value of the property, or a tuple of values if several names are given.
+
+        Raises:
+            ValueError: If one of the names is not a property of the schematic.
+        """
+        for name in names:
+            if not isinstance(getattr(type(self), name, None), property):
+                raise ValueError(f"Unknown schematic field: {name}")
+
+        values = await run_in_executor(get_fields, self, names, executor=executor)
+        if is_process_executor(executor):
+            # The values were computed on a copy of the schematic
+            for name, value in zip(names, values):
+                if hasattr(getattr(type(self), name).fget, "cache_keys"):
+                    self._set_cached(name, value)
+        return values[0] if len(names) == 1 else values
+
+    def _keep_fields(self, names: Tuple[str, ...]):
+        """Only keep what is needed to send back the given, already computed, properties.
+
+        The cached values of other properties are dropped, unless one of the names is not
+        cached itself, e.g. ``block_data`` which is a view of ``block_indices``. The array and
+        list tags of raw that the kept values were derived from, such as BlockData, are
+        dropped too, so the decoded values are not sent along with their encoded tags.
+        """
+        kept = {(name,) for name in names}
+        keep_all = not kept <= self._cache.keys()
+        cache = {
+            cache_key: (value, keys)
+            for cache_key, (value, keys, tags) in self._cache.items()
+            if (keep_all or cache_key in kept) and is_fresh(self._raw, keys, tags)
+        }
+        for _, keys in cache.values():
+            for key in keys:
+                if isinstance(dict.get(self._raw, key), (nbt.Array, nbt.List, LazyTag)):
+                    dict.__delitem__(self._raw, key)
+
+        # The dropped tags are missing from raw and from the entries, so the entries stay fresh
+        self._cache = {
+            cache_key: (value, keys, tuple(dict.get(self._raw, key) for key in keys))
+            for cache_key, (value, keys) in cache.items()
+        }
+
+    def __getstate__(self):
+        raw = self._raw
+        # nbtlib List tags cannot be pickled, LazyFile knows how to pickle them
+        if isinstance(raw, nbt.Compound) and not isinstance(raw, LazyFile):
+            raw = LazyFile(raw, root_name=getattr(raw, "root_name", ""))
+
+        # Cached values are kept with the names of the tags they depend on, the tags
+        # themselves are matched again against the unpickled raw data
+        cache = {
+            cache_key: (value, keys)
+            for cache_key, (value, keys, tags) in self._cache.items()
+            if is_fresh(self._raw, keys, tags)
+        }
+        return {**self.__dict__, "_raw": raw, "_cache": cache}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache = {
+            cache_key: (value, keys, tuple(dict.get(self._raw, key) for key in keys))
+            for cache_key, (value, keys) in state["_cache"].items()
+        }
+
+    @abstractmethod
+    def save(self, path: str, compresslevel: int = 9):
+        """Save the schematic to a gzipped nbt file."""
+        pass
+
     @property
     @abstractmethod
     def size(self) -> Tuple[np.short, np.short, np.short]:
@@ -38,6 +159,12 @@ class SchematicSchema(ABC):
         """A 3D numpy array representing the blocks in the schematic."""
         pass
 
+    @property
+    @abstractmethod
+    def block_indices(self):
+        """A 3D numpy array with the palette index of every block in the schematic."""
+        pass
+
     @property
     @abstractmethod
     def block_entities(self):
@@ -1,55 +1,215 @@
+import copy
 from .schematic_schema import SchematicSchema
-from .utils import nbt_to_numpy
+from .utils import cached, index_dtype, nbt_to_numpy_many, numpy_to_nbt
+from .varint import decode_varints, encode_varints, varint_offsets
+from .writer import save_nbt
 import nbtlib as nbt
+from .lazy import load_lazy, load_nbt, source_name
+from .stats import phase
 import numpy as np
-from .block import Block
-from typing import Tuple
+from .block import AIR_TYPES, Block
+from .spatial import BlockEntityIndex
+from .surface import Faces, Quads, merge_faces, opaque_mask, visible_faces
+from .compose import compose_blocks
+from .entities import EntityTable
+from .materials import BillOfMaterials, bill_of_materials
+from .lod import TopView, downsample, top_view
+from .sections import SECTION_SIZE, SectionedIndices
+from .fingerprint import fingerprint, palette_states, sketch
+from .diff import (
+    SchematicDiff,
+    diff_block_entities,
+    diff_indices,
+    patch_block_entities,
+)
+from .query import BlockSelection, palette_mask
+from .transform import (
+    mirror_block_state,
+    mirror_positions,
+    remap_palette,
+    rotate_block_state,
+    rotate_positions,
+)
+from typing import Callable, Iterable, Optional, Pattern, Sequence, Tuple, Union
+
+# Data version of Minecraft 1.20.1
+DEFAULT_DATA_VERSION = 3465
 
 
 class SchematicV2(SchematicSchema):
     @staticmethod
-    def load(path: str, force=False):
+    def load(path: str, force=False, lazy=False):
         """Load the schematic from a file.
 
         Args:
-            path (str): The path to the schematic file.
+            path (Union[str, os.PathLike, bytes, BinaryIO]): The path to the schematic file, its content or a binary file-like object.
             force (bool, optional): Force loading the schematic even if it is an incompatible version. Defaults to False. (Not recommended as it may cause unintended errors.)
+            lazy (bool, optional): Only decode header fields such as the size, offset or metadata when loading, and decode large tags like BlockData and BlockEntities on first access. Defaults to False.
 
         Returns:
             Schematic: An instance of the Schematic class.
 
         Raises:
             FileNotFoundError: If the file does not exist.
-            nbt.lib.MalformedFileError: If the file cannot be loaded due to a parsing error.
+            ValueError: If the file cannot be loaded due to a parsing error.
             Exception: If the schematic is an incompatible version and force is False.
         """
+        name = source_name(path) or "<data>"
         try:
-            s = SchematicV2()
-            s.raw = nbt.load(path)
-            if not force:
-                match s.raw.get("Version"):
-                    case None:
-                        raise Exception(
-                            "Version not found. This is likely due to an old version of the schematic format which this library does not support. Check out https://github.com/cbs228/nbtschematic for a library that supports version 1."
-                        )
-                    case 1:
-                        raise Exception(
-                            "Version 1 is not supported as it is an old version of the schematic format. Check out https://github.com/cbs228/nbtschematic for a library that supports version 1."
-                        )
-                    case 2:
-                        pass
-                    case _:
-                        raise Exception(
-                            f"This library does not fully support the version {s.raw.get('Version')} of the schematic format. Use force=True to force loading the schematic. This may cause unintended errors."
-                        )
-
+            with phase("load", path=name):
+                raw = load_lazy(path) if lazy else load_nbt(path)
         except FileNotFoundError as e:
-            raise FileNotFoundError(f"File not found: {path}") from e
-        except nbt.lib.MalformedFileError as e:
-            raise nbt.lib.MalformedFileError(f"Error loading schematic: {path}") from e
+            raise FileNotFoundError(f"File not found: {name}") from e
+        except ValueError as e:
+            raise ValueError(f"Error loading schematic: {name}") from e
+        return SchematicV2.from_raw(raw, force)
+
+    @staticmethod
+    def from_raw(raw: nbt.File, force=False):
+        """Create a schematic from already loaded nbt data, checking its version.
+
+        Args:
+            raw (nbt.File): The root compound of the schematic file.
+            force (bool, optional): Accept the data even if it is an incompatible version. Defaults to False.
+
+        Returns:
+            SchematicV2: The schematic.
+
+        Raises:
+            Exception: If the schematic is an incompatible version and force is False.
+        """
+        if not force:
+            match raw.get("Version"):
+                case None:
+                    raise Exception(
+                        "Version not found. This is likely due to an old version of the schematic format which this library does not support. Check out https://github.com/cbs228/nbtschematic for a library that supports version 1."
+                    )
+                case 1:
+                    raise Exception(
+                        "Version 1 is not supported as it is an old version of the schematic format. Check out https://github.com/cbs228/nbtschematic for a library that supports version 1."
+                    )
+                case 2:
+                    pass
+                case _:
+                    raise Exception(
+                        f"This library does not fully support the version {raw.get('Version')} of the schematic format. Use force=True to force loading the schematic. This may cause unintended errors."
+                    )
+
+        s = SchematicV2()
+        s.raw = raw
         return s
 
+    @staticmethod
+    def from_arrays(
+        indices: np.ndarray,
+        palette: Sequence[Union[Block, str]],
+        block_entities: Sequence[dict] = None,
+        entities: Sequence[dict] = None,
+        offset: Tuple[int, int, int] = (0, 0, 0),
+        metadata: dict = None,
+        data_version: int = DEFAULT_DATA_VERSION,
+    ):
+        """Create a schematic from an array of palette indices.
+
+        The indices are encoded to BlockData with vectorized varint packing. The decoded indices
+        are kept in the cache, so reading ``block_data`` or ``block_indices`` afterwards is free.
+
+        Args:
+            indices (Union[np.ndarray, SectionedIndices]): A 3D array of palette indices of shape (height, length, width), indexed as ``[y, z, x]`` like ``block_indices``, or sectioned indices like ``sections``.
+            palette (Sequence[Union[Block, str]]): The block at each palette index, as Blocks or block state strings.
+            block_entities (Sequence[dict], optional): The block entities, as nbtlib Compounds or dictionaries like the ones returned by ``block_entities``. Defaults to None.
+            entities (Sequence[dict], optional): The entities, in the same formats as block_entities. Defaults to None.
+            offset (Tuple[int, int, int], optional): The offset of the schematic in (x, y, z). Defaults to (0, 0, 0).
+            metadata (dict, optional): The metadata of the schematic. Defaults to None.
+            data_version (int, optional): The data version of the Minecraft version the blocks are from. Defaults to 3465 (Minecraft 1.20.1).
+
+        Returns:
+            SchematicV2: The new schematic.
+
+        Raises:
+            ValueError: If indices is not a 3D array, the palette has duplicates or an index is outside of the palette.
+        """
+        sections = indices if isinstance(indices, SectionedIndices) else None
+        if sections is None:
+            indices = np.asarray(indices)
+            if indices.ndim != 3:
+                raise ValueError(
+                    f"Expected a 3D array of indices, got {indices.ndim} dimensions."
+                )
+
+        palette = [
+            block.raw if isinstance(block, Block) else str(block) for block in palette
+        ]
+        if len(set(palette)) != len(palette):
+            raise ValueError("The palette contains duplicate block states.")
+
+        if sections is not None:
+            # Encoded 16 layers at a time, so the dense array is never built
+            block_indices = None
+            encoded = np.concatenate(
+                [encode_varints(slab) for slab in sections.slabs()]
+                or [np.empty(0, dtype=np.int8)]
+            )
+            if all(sections.size) and (
+                sections.min() < 0 or sections.max() >= len(palette)
+            ):
+                raise ValueError("Indices must refer to an entry of the palette.")
+        else:
+            if indices.size and (indices.min() < 0 or indices.max() >= len(palette)):
+                raise ValueError("Indices must refer to an entry of the palette.")
+            block_indices = np.array(indices, dtype=index_dtype(len(palette)))
+            encoded = encode_varints(block_indices)
+
+        height, length, width = indices.shape
+        raw = nbt.File(
+            {
+                "Version": nbt.Int(2),
+                "DataVersion": nbt.Int(data_version),
+                "Metadata": numpy_to_nbt(metadata or {}),
+                "Width": nbt.Short(width),
+                "Height": nbt.Short(height),
+                "Length": nbt.Short(length),
+                "Offset": nbt.IntArray(offset),
+                "PaletteMax": nbt.Int(len(palette)),
+                "Palette": nbt.Compound(
+                    {block: nbt.Int(index) for index, block in enumerate(palette)}
+                ),
+                "BlockData": nbt.ByteArray(encoded),
+                "BlockEntities": nbt.List[nbt.Compound](
+                    [numpy_to_nbt(block_entity) for block_entity in block_entities]
+                    if block_entities is not None
+                    else []
+                ),
+            },
+            root_name="Schematic",
+        )
+        if entities is not None and len(entities):
+            raw["Entities"] = nbt.List[nbt.Compound](
+                [numpy_to_nbt(entity) for entity in entities]
+            )
+
+        s = SchematicV2()
+        s.raw = raw
+        if block_indices is not None:
+            block_indices.flags.writeable = False
+            s._set_cached("block_indices", block_indices)
+        return s
+
+    def save(self, path: str, compresslevel: int = 9):
+        """Save the schematic to a gzipped nbt file.
+
+        The file is written as a stream, one top-level tag at a time. Tags of a lazily loaded
+        schematic that were never accessed are written back without being decoded.
+
+        Args:
+            path (str): The path of the file to write.
+            compresslevel (int, optional): The gzip compression level, from 0 (fastest) to 9 (smallest). Defaults to 9.
+        """
+        root_name = getattr(self.raw, "root_name", "") or "Schematic"
+        save_nbt(path, self.raw, root_name, compresslevel)
+
     @property
+    @cached("Width", "Height", "Length")
     def size(self) -> Tuple[np.short, np.short, np.short]:
         """Tuple: The size of the schematic in (width, height, length)."""
         return self.width, self.height, self.length
@@ -70,26 +230,769 @@ class SchematicV2(SchematicSchema):
         return np.short(self.raw["Length"])
 
     @property
+    @cached("BlockData", "Palette", "BlockEntities", "Width", "Height", "Length")
     def blocks(self) -> np.ndarray:
-        """np.ndarray: A 3D numpy array representing the blocks in the schematic."""
-        # create list with length of last index
-        block_data = np.array(self.raw["BlockData"])
-        blocks = np.array([None] * len(block_data))
+        """np.ndarray: A 3D numpy array representing the blocks in the schematic.
+
+        This is a view over ``block_indices`` that creates an object array with one Block per cell,
+        which is slow and memory hungry for large schematics. Prefer ``block_indices`` together
+        with ``palette`` or ``block_at`` when possible. The array is cached and read-only.
+        """
+        palette = self.palette
+        blocks = palette[self.block_data]
 
-        for position, id_in_schematic in enumerate(block_data):
-            blocks[position] = self.palette[id_in_schematic]
+        # Cells holding a block entity get their own Block so the shared palette entry is not modified
+        # In reverse, so the first of several block entities at one position wins like in block_at
+        width, height, length = (int(i) for i in self.size)
+        for block_entity in self.block_entities[::-1]:
+            x, y, z = (int(i) for i in block_entity["Pos"])
+            if 0 <= x < width and 0 <= y < height and 0 <= z < length:
+                position = self._flat_index(x, y, z)
+                blocks[position] = Block(blocks[position].raw, block_entity)
 
         # reshape blocks to 3D array
         blocks = blocks.reshape(self.width, self.height, self.length)
+        blocks.flags.writeable = False
+        return blocks
+
+    @property
+    @cached("BlockData", "Palette", "Width", "Height", "Length")
+    def block_indices(self) -> np.ndarray:
+        """A 3D numpy array with the palette index of every block in the schematic.
 
-        for block_entity in self.block_entities:
-            blocks[
-                block_entity["Pos"][2], block_entity["Pos"][1], block_entity["Pos"][0]
-            ].add_block_entity(block_entity)
+        The array is indexed as ``[y, z, x]``, i.e. its shape is (height, length, width), which
+        matches the order of BlockData without copying. Indices are stored as ``uint16`` when the
+        palette allows it and as ``int32`` otherwise, and BlockData is decoded straight into that
+        type. Use ``palette`` to turn an index into a Block.
 
-        return blocks
+        Returns:
+            np.ndarray: An array of shape (height, length, width) containing palette indices.
+        """
+        block_indices = decode_varints(
+            self.raw["BlockData"],
+            int(self.width) * int(self.height) * int(self.length),
+            index_dtype(len(self.raw["Palette"])),
+        )
+        block_indices.flags.writeable = False
+        return block_indices.reshape(self.height, self.length, self.width)
+
+    @property
+    def sections(self) -> SectionedIndices:
+        """The palette indices stored in sections of 16x16x16 blocks, for huge, mostly-air schematics.
+
+        Uniform sections, such as sections of air, are stored as a single index and the others
+        are bit-packed with a local palette, see ``SectionedIndices``. Unless the indices have
+        already been decoded, BlockData is decoded 16 layers at a time, so the dense array is
+        never built. Each access builds new sections, which can be edited with ``set`` and
+        turned back into a schematic with ``from_arrays``; the schematic itself does not change.
+
+        Returns:
+            SectionedIndices: The sectioned indices.
+        """
+        dtype = index_dtype(len(self.raw["Palette"]))
+        if self._get_cached("block_indices") is not None:
+            return SectionedIndices.from_dense(self.block_indices)
+
+        height, length, width = int(self.height), int(self.length), int(self.width)
+        offsets = self.block_data_offsets
+        data = np.asarray(self.raw["BlockData"])
+        slabs = (
+            decode_varints(
+                data[
+                    offsets[y * length] : offsets[
+                        min(y + SECTION_SIZE, height) * length
+                    ]
+                ]
+            )
+            .astype(dtype)
+            .reshape(-1, length, width)
+            for y in range(0, height, SECTION_SIZE)
+        )
+        return SectionedIndices.from_slabs(slabs, self.size, dtype)
+
+    def block_at(self, x: int, y: int, z: int) -> Block:
+        """Get the block at a position in the schematic.
+
+        The Block is only created on demand. If a block entity is stored at that position, the
+        returned Block carries it.
+
+        Args:
+            x (int): The x coordinate, relative to the schematic.
+            y (int): The y coordinate, relative to the schematic.
+            z (int): The z coordinate, relative to the schematic.
+
+        Returns:
+            Block: The block at the given position.
+
+        Raises:
+            IndexError: If the position is outside of the schematic.
+        """
+        if not (0 <= x < self.width and 0 <= y < self.height and 0 <= z < self.length):
+            raise IndexError(f"Position {(x, y, z)} is outside of the schematic.")
+
+        block = self.palette[self.block_data[self._flat_index(x, y, z)]]
+        block_entity = self.block_entity_at(x, y, z)
+        if block_entity is not None:
+            return Block(block.raw, block_entity)
+        return block
+
+    def block_entity_at(self, x: int, y: int, z: int) -> Optional[dict]:
+        """Get the block entity at a position, in constant time using ``block_entity_index``.
+
+        Args:
+            x (int): The x coordinate, relative to the schematic.
+            y (int): The y coordinate, relative to the schematic.
+            z (int): The z coordinate, relative to the schematic.
+
+        Returns:
+            Optional[dict]: The block entity, as returned by ``block_entities``, or None if there is none at that position.
+        """
+        i = self.block_entity_index.find(x, y, z)
+        return None if i is None else self.block_entities[i]
+
+    def block_entities_at(self, positions: np.ndarray) -> np.ndarray:
+        """Get the block entities at many positions at once.
+
+        Args:
+            positions (np.ndarray): An (N, 3) array of (x, y, z) positions.
+
+        Returns:
+            np.ndarray: An object array with the block entity at each position, or None where there is none.
+        """
+        found = self.block_entity_index.find_many(positions)
+        result = np.full(len(found), None, dtype=object)
+        hit = found >= 0
+        result[hit] = self.block_entities[found[hit]]
+        return result
+
+    def block_entities_in(
+        self, start: Tuple[int, int, int], end: Tuple[int, int, int]
+    ) -> np.ndarray:
+        """Get the block entities inside a box.
+
+        Args:
+            start (Tuple[int, int, int]): The (x, y, z) position of a corner of the box, inclusive.
+            end (Tuple[int, int, int]): The (x, y, z) position of the opposite corner, inclusive.
+
+        Returns:
+            np.ndarray: An object array with the block entities inside the box, in BlockData order.
+        """
+        return self.block_entities[self.block_entity_index.in_box(start, end)]
+
+    @property
+    @cached("BlockData", "Width", "Height", "Length")
+    def block_data_offsets(self) -> np.ndarray:
+        """The byte offset in BlockData of the start of every row of blocks.
+
+        A row is a run of ``width`` blocks along x at a given y and z. Entry ``z + y * length``
+        is the offset of the row at (y, z) and the last entry is the size of BlockData. This index
+        lets ``region`` decode only the rows it needs.
+
+        Returns:
+            np.ndarray: An ``int64`` array of ``height * length + 1`` byte offsets.
+        """
+        offsets = varint_offsets(self.raw["BlockData"], int(self.width))
+        offsets.flags.writeable = False
+        return offsets
+
+    def region(self, start: Tuple[int, int, int], end: Tuple[int, int, int]):
+        """Extract the blocks between two corners as a new schematic.
+
+        Only the rows of BlockData overlapping the region are decoded, using the checkpoints of
+        ``block_data_offsets``, so the cost grows with the size of the region rather than the
+        size of the schematic. If BlockData has already been decoded, the cached indices are
+        sliced instead. The new schematic keeps the whole palette, the block entities and entities
+        inside the region, moved to its origin, and an offset moved to the first corner. Biomes
+        are not included.
+
+        Args:
+            start (Tuple[int, int, int]): The (x, y, z) position of a corner of the region, inclusive.
+            end (Tuple[int, int, int]): The (x, y, z) position of the opposite corner, inclusive.
+
+        Returns:
+            SchematicV2: A schematic containing the region.
+
+        Raises:
+            IndexError: If the region is not entirely inside the schematic.
+        """
+        (x0, y0, z0), (x1, y1, z1) = np.minimum(start, end), np.maximum(start, end)
+        if (
+            min(x0, y0, z0) < 0
+            or x1 >= self.width
+            or y1 >= self.height
+            or z1 >= self.length
+        ):
+            raise IndexError(
+                f"Region {tuple(start)} to {tuple(end)} is outside of the schematic."
+            )
+
+        if self._get_cached("block_indices") is not None:
+            indices = self.block_indices[y0 : y1 + 1, z0 : z1 + 1, x0 : x1 + 1]
+        else:
+            length = int(self.length)
+            offsets = self.block_data_offsets
+            data = np.asarray(self.raw["BlockData"])
+            rows = np.concatenate(
+                [
+                    data[offsets[y * length + z0] : offsets[y * length + z1 + 1]]
+                    for y in range(y0, y1 + 1)
+                ]
+            )
+            indices = decode_varints(rows).reshape(
+                y1 - y0 + 1, z1 - z0 + 1, int(self.width)
+            )
+            indices = indices[:, :, x0 : x1 + 1]
+
+        low, high = np.array((x0, y0, z0)), np.array((x1, y1, z1))
+        block_entities = []
+        index = self.block_entity_index
+        for i in index.in_box(low, high).tolist():
+            block_entity = nbt.Compound(self.raw["BlockEntities"][i])
+            block_entity["Pos"] = nbt.IntArray(index.positions[i] - low)
+            block_entities.append(block_entity)
+
+        entities = []
+        for entity in self.raw.get("Entities", ()):
+            position = np.array(entity["Pos"], dtype=np.float64)
+            if np.all(position >= low) and np.all(position < high + 1):
+                entity = nbt.Compound(entity)
+                entity["Pos"] = nbt.List[nbt.Double](position - low)
+                entities.append(entity)
+
+        return SchematicV2.from_arrays(
+            indices,
+            self._palette_states(),
+            block_entities,
+            entities,
+            offset=tuple(int(i) for i in np.array(self.offset) + low),
+            metadata=copy.deepcopy(self.raw.get("Metadata")),
+            data_version=int(self.raw["DataVersion"]),
+        )
+
+    def crop(
+        self, start: Tuple[int, int, int] = None, end: Tuple[int, int, int] = None
+    ):
+        """Crop the schematic to a region, or to the blocks which are not air.
+
+        Args:
+            start (Tuple[int, int, int], optional): The (x, y, z) position of a corner of the region, inclusive. Defaults to None.
+            end (Tuple[int, int, int], optional): The (x, y, z) position of the opposite corner, inclusive. Defaults to None.
+
+        Returns:
+            SchematicV2: The cropped schematic. Without corners, it is cropped to the bounding box of the blocks that are not air, or to a single block if there are none.
+        """
+        if start is None or end is None:
+            bounding_box = self.select(
+                predicate=lambda block: block.type not in AIR_TYPES
+            ).bounding_box
+            start, end = bounding_box or ((0, 0, 0), (0, 0, 0))
+        return self.region(start, end)
+
+    def rotate(self, turns: int = 1):
+        """Rotate the schematic clockwise around the y axis, seen from above.
+
+        The index grid is rotated with ``np.rot90`` and the orientation properties of the block
+        states (``facing``, ``axis``, ``rotation``, connections, rail shapes...) are rewritten
+        once per palette entry. Block entity and entity positions, entity yaw and the offsets
+        are rotated to match.
+
+        Args:
+            turns (int, optional): The number of quarter turns, negative for counterclockwise. Defaults to 1.
+
+        Returns:
+            SchematicV2: The rotated schematic.
+        """
+        turns %= 4
+        palette, table = remap_palette(
+            self._palette_states(),
+            lambda blockdata: rotate_block_state(blockdata, turns),
+        )
+        indices = np.rot90(self._remapped_indices(table), -turns, axes=(1, 2))
+        size = np.array(self.size, dtype=np.int64)
+
+        def transform_offset(offset):
+            corners = np.array((offset, offset + size - 1))
+            for _ in range(turns):
+                corners[:, 0], corners[:, 2] = -corners[:, 2], corners[:, 0].copy()
+            return corners.min(axis=0)
+
+        return self._transformed(
+            indices,
+            palette,
+            lambda positions: rotate_positions(positions, size - 1, turns),
+            lambda positions: rotate_positions(positions, size, turns),
+            lambda yaw: yaw + 90 * turns,
+            transform_offset,
+        )
+
+    def mirror(self, axis: str = "x"):
+        """Mirror the schematic along the x or z axis.
+
+        The index grid is flipped with ``np.flip`` and the block states are mirrored once per
+        palette entry. Block entity and entity positions, entity yaw and the offsets are
+        mirrored to match.
+
+        Args:
+            axis (str, optional): The axis along which the schematic is mirrored, "x" (east becomes west) or "z" (north becomes south). Defaults to "x".
+
+        Returns:
+            SchematicV2: The mirrored schematic.
+
+        Raises:
+            ValueError: If the axis is not "x" or "z".
+        """
+        if axis not in ("x", "z"):
+            raise ValueError(
+                f"Schematics can only be mirrored along x or z, not {axis!r}."
+            )
+
+        palette, table = remap_palette(
+            self._palette_states(),
+            lambda blockdata: mirror_block_state(blockdata, axis),
+        )
+        indices = np.flip(self._remapped_indices(table), axis=2 if axis == "x" else 1)
+        size = np.array(self.size, dtype=np.int64)
+        column = 0 if axis == "x" else 2
+
+        def transform_offset(offset):
+            offset = offset.copy()
+            offset[column] = -(offset[column] + size[column] - 1)
+            return offset
+
+        return self._transformed(
+            indices,
+            palette,
+            lambda positions: mirror_positions(positions, size - 1, axis),
+            lambda positions: mirror_positions(positions, size, axis),
+            lambda yaw: -yaw if axis == "x" else 180 - yaw,
+            transform_offset,
+        )
+
+    def paste(
+        self,
+        other: "SchematicV2",
+        position: Tuple[int, int, int],
+        skip_air: bool = True,
+    ):
+        """Paste another schematic into this one.
+
+        The palette of the other schematic is merged into this one with an index remap table,
+        then the blocks are written with a single vectorized assignment. Blocks falling outside
+        of this schematic are cut off. Block entities of overwritten blocks are replaced by the
+        ones of the other schematic, moved to their new position.
+
+        Args:
+            other (SchematicV2): The schematic to paste.
+            position (Tuple[int, int, int]): The (x, y, z) position in this schematic where the first corner of the other schematic goes.
+            skip_air (bool, optional): Keep the blocks of this schematic where the other schematic has air. Defaults to True.
+
+        Returns:
+            SchematicV2: A new schematic with the other schematic pasted in.
+        """
+        indices, palette, block_entities, entities = compose_blocks(
+            [self, other],
+            [(0, 0, 0), position],
+            policy="skip_air" if skip_air else "overwrite",
+            origin=(0, 0, 0),
+            size=self.size,
+        )
+        result = self._transformed(indices, palette)
+        result.raw["BlockEntities"] = nbt.List[nbt.Compound](block_entities)
+        if entities:
+            result.raw["Entities"] = nbt.List[nbt.Compound](entities)
+        return result
+
+    @staticmethod
+    def compose(
+        schematics: Sequence["SchematicV2"],
+        positions: Sequence[Tuple[int, int, int]] = None,
+        policy: str = "skip_air",
+    ):
+        """Combine several schematics into one, under a unified palette.
+
+        The palettes are merged once, then every schematic is written into a single output grid
+        with one ``np.take`` through its remap table, so no intermediate schematic is built.
+        Block entities and entities are moved to their position in the output; the block
+        entities of overwritten blocks are dropped.
+
+        Args:
+            schematics (Sequence[SchematicV2]): The schematics to combine, later ones are written over earlier ones.
+            positions (Sequence[Tuple[int, int, int]], optional): The (x, y, z) position of the first corner of each schematic. Defaults to None (the offset of each schematic).
+            policy (str, optional): How overlapping blocks are resolved: "overwrite" writes every block, "skip_air" every block that is not air and "keep" only fills blocks that are still air. Defaults to "skip_air".
+
+        Returns:
+            SchematicV2: The combined schematic, covering all the schematics, with its offset at their minimum corner.
+
+        Raises:
+            ValueError: If there are no schematics, the number of positions does not match or the policy is unknown.
+        """
+        if not len(schematics):
+            raise ValueError("Expected at least one schematic to compose.")
+        if positions is None:
+            positions = [schematic.offset for schematic in schematics]
+
+        origin = np.array(positions, dtype=np.int64).reshape(-1, 3).min(axis=0)
+        indices, palette, block_entities, entities = compose_blocks(
+            schematics, positions, policy, origin=origin
+        )
+        return SchematicV2.from_arrays(
+            indices,
+            palette,
+            block_entities,
+            entities,
+            offset=tuple(int(i) for i in origin),
+            data_version=max(int(s.raw["DataVersion"]) for s in schematics),
+        )
+
+    @property
+    @cached("BlockData", "Palette", "BlockEntities", "Width", "Height", "Length")
+    def fingerprint(self) -> str:
+        """str: A hash of the content of the schematic, the same for identical builds.
+
+        The palette is sorted and the index grid remapped to it while hashing, so the palette
+        order, unused palette entries, the offset and the metadata do not change the result.
+        The size, blocks and block entities do. No Block objects are created.
+        """
+        return fingerprint(
+            self.block_indices,
+            palette_states(self.raw["Palette"]),
+            self.block_counts,
+            self.raw.get("BlockEntities", ()),
+        )
+
+    def sketch(self, size: int = 64) -> np.ndarray:
+        """Compute a locality-sensitive sketch to find near-duplicate schematics.
+
+        Compare sketches with ``sketch_similarity``, which estimates the fraction of
+        (4x4x4 cell, block state) pairs two schematics have in common. Like the fingerprint, the
+        sketch does not depend on the palette order.
+
+        Args:
+            size (int, optional): The number of values in the sketch, more values give a more precise similarity. Defaults to 64.
+
+        Returns:
+            np.ndarray: The sorted ``uint64`` bottom-k MinHash sketch.
+        """
+        return sketch(self.block_indices, palette_states(self.raw["Palette"]), size)
+
+    def diff(self, other: "SchematicV2") -> SchematicDiff:
+        """Find what changed between this schematic and another one of the same size.
+
+        The palette of the other schematic is aligned to this one with a remap table, then the
+        index grids are compared with vectorized operations, a chunk of layers at a time.
+        Block entities are compared by position. Entities and biomes are not compared.
+
+        Args:
+            other (SchematicV2): The schematic after the changes.
+
+        Returns:
+            SchematicDiff: The changed blocks and block entities, which ``patch`` can apply to this schematic.
+
+        Raises:
+            ValueError: If the schematics do not have the same size.
+        """
+        if tuple(self.size) != tuple(other.size):
+            raise ValueError(
+                f"Cannot diff schematics of different sizes: {tuple(self.size)} and {tuple(other.size)}."
+            )
+
+        palette, table = self._merged_palette(other._palette_states())
+
+        positions, old, new = diff_indices(
+            self.block_indices, other.block_indices, table
+        )
+        added, removed, modified = diff_block_entities(
+            self.raw.get("BlockEntities", ()), other.raw.get("BlockEntities", ())
+        )
+        return SchematicDiff(positions, old, new, palette, added, removed, modified)
+
+    def patch(self, diff: SchematicDiff, check: bool = True):
+        """Apply the changes found by ``diff`` to this schematic.
+
+        Args:
+            diff (SchematicDiff): The changes to apply.
+            check (bool, optional): Check that the changed blocks are the ones the diff was made from. Defaults to True.
+
+        Returns:
+            SchematicV2: A new schematic with the changes applied.
+
+        Raises:
+            ValueError: If check is True and a changed block does not match the old block of the diff.
+            IndexError: If a changed position is outside of the schematic.
+        """
+        palette, table = self._merged_palette(diff.palette)
+
+        x, y, z = diff.positions.T
+        if len(x) and (
+            x.min() < 0
+            or y.min() < 0
+            or z.min() < 0
+            or x.max() >= self.width
+            or y.max() >= self.height
+            or z.max() >= self.length
+        ):
+            raise IndexError("The diff changes blocks outside of the schematic.")
+
+        result = np.array(self.block_indices, dtype=np.int32)
+        if check and not np.array_equal(result[y, z, x], table[diff.old]):
+            raise ValueError("The schematic does not match the blocks of the diff.")
+        result[y, z, x] = table[diff.new]
+
+        patched = self._transformed(result, palette)
+        patched.raw["BlockEntities"] = nbt.List[nbt.Compound](
+            patch_block_entities(self.raw.get("BlockEntities", ()), diff)
+        )
+        return patched
+
+    def visible_faces(
+        self, merge: bool = False, opaque: Callable[[Block], bool] = None
+    ) -> Union[Faces, Quads]:
+        """Find the block faces that are not hidden by a neighbour, e.g. to render a preview.
+
+        The palette is classified once as opaque or transparent, then the faces of each
+        direction are found with vectorized comparisons over ``block_indices``. A face is
+        visible when its neighbour is not opaque and not the same block; faces on the border of
+        the schematic are visible.
+
+        Args:
+            merge (bool, optional): Greedily merge adjacent coplanar faces of the same block into quads. Defaults to False.
+            opaque (Callable[[Block], bool], optional): A function telling whether a block is a full opaque cube. Defaults to None (a guess from the block type, see ``surface.is_opaque``).
+
+        Returns:
+            Union[Faces, Quads]: The visible faces, or the merged quads if merge is True. Directions are indices into ``surface.FACES`` and blocks are palette indices.
+        """
+        palette = self.palette
+        opaque = (
+            opaque_mask(palette)
+            if opaque is None
+            else np.array([bool(opaque(block)) for block in palette], dtype=bool)
+        )
+        rendered = np.array([block.type not in AIR_TYPES for block in palette])
+        faces = visible_faces(self.block_indices, opaque & rendered, rendered)
+        return merge_faces(faces) if merge else faces
+
+    @cached("BlockData", "Palette", "Width", "Height", "Length")
+    def lod(self, level: int) -> np.ndarray:
+        """Get a level of detail of the palette indices, for overviews of large builds.
+
+        Level 0 is ``block_indices``, and each level halves the resolution of the one below:
+        every cell of 2x2x2 cells of the previous level gets its most frequent non-air index,
+        see ``lod.downsample``. Levels are built on first use and cached, so the levels below
+        the requested one are only built once.
+
+        Args:
+            level (int): The level of detail, each cell covers ``2 ** level`` blocks along each axis.
+
+        Returns:
+            np.ndarray: The palette indices of the level, indexed as ``[y, z, x]``.
+
+        Raises:
+            ValueError: If level is negative.
+        """
+        if level < 0:
+            raise ValueError(f"The level of detail must be non-negative, got {level}.")
+        if level == 0:
+            return self.block_indices
+        result = downsample(self.lod(level - 1), 2, self._air_mask())
+        result.flags.writeable = False
+        return result
+
+    @cached("BlockData", "Palette", "Width", "Height", "Length")
+    def top_view(self, level: int = 0) -> TopView:
+        """Find the highest non-air block of every column, e.g. for a heightmap and a map of colors.
+
+        Args:
+            level (int, optional): The level of detail to use, see ``lod``. Heights are then in cells of that level. Defaults to 0.
+
+        Returns:
+            TopView: The height and palette index of the highest block of each column, indexed as ``[z, x]``.
+        """
+        return top_view(self.lod(level), self._air_mask())
+
+    @property
+    @cached("BlockData", "Palette", "Width", "Height", "Length")
+    def bill_of_materials(self) -> BillOfMaterials:
+        """The number of blocks of each block state and type, overall and per layer, e.g. for material lists.
+
+        The counts come from one pass of ``np.bincount`` over ``block_indices``, grouped by type
+        through the palette, see ``materials.bill_of_materials``. Use
+        ``BillOfMaterials.combine`` to add up the bills of several schematics.
+
+        Returns:
+            BillOfMaterials: The counts and the bounding box of the non-air blocks.
+        """
+        palette = self.palette
+        return bill_of_materials(
+            self.block_indices,
+            [block.raw for block in palette],
+            [block.type for block in palette],
+            self._air_mask(),
+        )
+
+    def _air_mask(self) -> np.ndarray:
+        """Get a boolean array, True for the palette indices of air."""
+        return np.array([block.type in AIR_TYPES for block in self.palette], dtype=bool)
+
+    def _palette_states(self) -> list:
+        """Get the raw block state of every palette entry."""
+        return [block.raw for block in self.palette]
+
+    def _merged_palette(self, states: Sequence[str]) -> Tuple[list, np.ndarray]:
+        """Append the block states missing from the palette, with the index of each state in the result."""
+        palette = self._palette_states()
+        indices = {blockdata: i for i, blockdata in enumerate(palette)}
+        table = np.empty(len(states), dtype=np.int32)
+        for i, blockdata in enumerate(states):
+            table[i] = indices.setdefault(blockdata, len(palette))
+            if table[i] == len(palette):
+                palette.append(blockdata)
+        return palette, table
+
+    def _remapped_indices(self, table: np.ndarray) -> np.ndarray:
+        """Get block_indices with each palette index replaced by its entry in the table."""
+        if np.array_equal(table, np.arange(len(table))):
+            return self.block_indices
+        return table[self.block_indices]
+
+    def _transformed(
+        self,
+        indices: np.ndarray,
+        palette: Sequence[str],
+        transform_block_positions=None,
+        transform_entity_positions=None,
+        transform_yaw=None,
+        transform_offset=None,
+    ):
+        """Create a schematic with new blocks, moving the block entities, entities and offsets with the given functions."""
+        block_entities = list(self.raw.get("BlockEntities", ()))
+        if transform_block_positions is not None and block_entities:
+            positions = np.array(
+                [block_entity["Pos"] for block_entity in block_entities]
+            )
+            for i, position in enumerate(transform_block_positions(positions)):
+                block_entities[i] = nbt.Compound(block_entities[i])
+                block_entities[i]["Pos"] = nbt.IntArray(position)
+
+        entities = list(self.raw.get("Entities", ()))
+        if transform_entity_positions is not None and entities:
+            positions = np.array(
+                [entity["Pos"] for entity in entities], dtype=np.float64
+            )
+            for i, position in enumerate(transform_entity_positions(positions)):
+                entities[i] = nbt.Compound(entities[i])
+                entities[i]["Pos"] = nbt.List[nbt.Double](position)
+                if "Rotation" in entities[i]:
+                    yaw, pitch = entities[i]["Rotation"]
+                    yaw = transform_yaw(float(yaw)) % 360
+                    entities[i]["Rotation"] = nbt.List[nbt.Float]((yaw, float(pitch)))
+
+        offset = np.array(self.offset, dtype=np.int64)
+        metadata = nbt.Compound(self.raw.get("Metadata", {}))
+        if transform_offset is not None:
+            offset = transform_offset(offset)
+            keys = ("WEOffsetX", "WEOffsetY", "WEOffsetZ")
+            if all(key in metadata for key in keys):
+                worldedit_offset = transform_offset(
+                    np.array([metadata[key] for key in keys], dtype=np.int64)
+                )
+                for key, value in zip(keys, worldedit_offset):
+                    metadata[key] = nbt.Int(value)
+
+        return SchematicV2.from_arrays(
+            indices,
+            palette,
+            block_entities,
+            entities,
+            offset=tuple(int(i) for i in offset),
+            metadata=metadata,
+            data_version=int(self.raw["DataVersion"]),
+        )
+
+    @property
+    @cached("BlockData", "Palette", "Width", "Height", "Length")
+    def block_counts(self) -> np.ndarray:
+        """The number of blocks of each palette entry in the schematic.
+
+        Returns:
+            np.ndarray: An array with the number of occurrences of each palette index.
+        """
+        block_counts = np.bincount(
+            self.block_indices.ravel(), minlength=len(self.raw["Palette"])
+        )
+        block_counts.flags.writeable = False
+        return block_counts
+
+    def select(
+        self,
+        type: str = None,
+        tag: Iterable[str] = None,
+        properties: dict = None,
+        pattern: Union[str, Pattern] = None,
+        predicate: Callable[[Block], bool] = None,
+    ) -> BlockSelection:
+        """Select the blocks matching some criteria.
+
+        The criteria are evaluated once per palette entry instead of once per block, counts,
+        positions, masks and bounding boxes are then computed with numpy over ``block_indices``.
+
+        Args:
+            type (str, optional): The block type, e.g. ``minecraft:chest``. Defaults to None.
+            tag (Iterable[str], optional): A set of block types, e.g. the content of a block tag such as ``#minecraft:logs``. Defaults to None.
+            properties (dict, optional): Properties the block must have, e.g. ``{"facing": "north"}``. Defaults to None.
+            pattern (Union[str, Pattern], optional): A regular expression searched in the raw block state. Defaults to None.
+            predicate (Callable[[Block], bool], optional): A function returning True for matching blocks. Defaults to None.
+
+        Returns:
+            BlockSelection: The selected blocks.
+
+        Example:
+            >>> schematic.select(type="minecraft:chest").count
+            2
+            >>> schematic.select(pattern="redstone|repeater|comparator").positions
+            array([[0, 1, 0], ...])
+        """
+        return BlockSelection(
+            self, palette_mask(self.palette, type, tag, properties, pattern, predicate)
+        )
+
+    def _flat_index(self, x: int, y: int, z: int) -> int:
+        """Get the index of a position in BlockData."""
+        return x + z * int(self.width) + y * int(self.width) * int(self.length)
+
+    @property
+    def block_data(self) -> np.ndarray:
+        """The palette index of every block in the schematic.
+
+        BlockData is stored as a varint[], so it is decoded before use. The entries are indexed
+        by ``x + z * width + y * width * length``. This is a flat view of ``block_indices``, so
+        the decoded indices are only held once.
+
+        Returns:
+            np.ndarray: A read-only 1D array with ``width * height * length`` palette indices, of the dtype of ``block_indices``.
+        """
+        return self.block_indices.ravel()
 
     @property
+    @cached("BiomeData", "Width", "Length")
+    def biome_data(self) -> np.ndarray:
+        """The biome palette index of every column in the schematic, or None if the schematic has no biomes.
+
+        BiomeData is stored as a varint[], so it is decoded before use. The entries are indexed
+        by ``x + z * width``.
+
+        Returns:
+            np.ndarray: A 1D ``int32`` array with ``width * length`` biome palette indices.
+        """
+        if "BiomeData" not in self.raw:
+            return None
+        biome_data = decode_varints(
+            self.raw["BiomeData"], int(self.width) * int(self.length)
+        )
+        biome_data.flags.writeable = False
+        return biome_data
+
+    @property
+    @cached("Palette")
     def palette(self) -> np.array:
         """A 1D numpy array containing all unique blocks in the schematic.
 
@@ -99,16 +1002,18 @@ class SchematicV2(SchematicSchema):
         Note: It is generally recommended to use the 'blocks' property to access individual blocks with their properties instead of using the palette.
 
         Returns:
-            np.array: An array containing the unique blocks in the schematic.
+            np.array: A read-only array containing the unique blocks in the schematic. It is cached and shared between calls, edit ``raw["Palette"]`` to change the palette.
         """
 
         result = np.array([None] * len(self.raw["Palette"]))
         for blockdata in self.raw["Palette"]:
             result[self.raw["Palette"][blockdata]] = Block(blockdata)
 
+        result.flags.writeable = False
         return result
 
     @property
+    @cached("PaletteMax", "Palette")
     def palette_max(self) -> np.int8:
         """The maximum index value for the block palette in the schematic.
 
@@ -119,25 +1024,54 @@ class SchematicV2(SchematicSchema):
         """
 
         # If the palette max is not set, we can infer it from the length of the palette
-        return self.raw["PaletteMax"] or len(self.palette)
+        return self.raw.get("PaletteMax") or len(self.raw["Palette"])
 
     @property
+    @cached("BlockEntities")
     def block_entities(self) -> np.array:
         """Get a list of all block entities in the schematic.
 
         Returns:
-            np.array: A numpy array containing dictionaries representing each block entity in the schematic.
+            np.array: A read-only numpy array containing dictionaries representing each block entity in the schematic.
 
         Notes:
             Each block entity is represented as a dictionary containing the key-value pairs of its attributes.
             The dictionary is converted from the nbtlib Compound object to a dictionary with numpy data types
-            using the nbt_to_numpy() method.
+            using the nbt_to_numpy() method. Arrays such as Pos are read-only views of the raw nbt data.
+            The array and its dictionaries are cached and shared between calls, and by ``blocks`` and
+            ``block_at``, so they should not be edited; edit ``raw["BlockEntities"]`` instead.
         """
-        result = np.array([None] * len(self.raw["BlockEntities"]))
-        for i, block_entity in enumerate(self.raw["BlockEntities"]):
-            result[i] = nbt_to_numpy(block_entity)
+        result = nbt_to_numpy_many(self.raw["BlockEntities"])
+        result.flags.writeable = False
         return result
 
+    @property
+    @cached("Entities")
+    def entities(self) -> EntityTable:
+        """The entities of the schematic, such as armor stands, item frames, minecarts or mobs.
+
+        Positions and ids are decoded into columns for vectorized box, radius and type queries;
+        the rest of each entity is only converted when it is accessed, see ``EntityTable``.
+
+        Returns:
+            EntityTable: The entities, empty if the schematic has none.
+        """
+        return EntityTable(self.raw.get("Entities", ()))
+
+    @property
+    @cached("BlockEntities", "Width", "Height", "Length")
+    def block_entity_index(self) -> BlockEntityIndex:
+        """BlockEntityIndex: An index of the block entities by position, built once from their Pos tags.
+
+        It is used by ``block_entity_at``, ``block_entities_at`` and ``block_entities_in``. The
+        indices it returns refer to ``block_entities`` and ``raw["BlockEntities"]``.
+        """
+        positions = np.array(
+            [block_entity["Pos"] for block_entity in self.raw.get("BlockEntities", ())],
+            dtype=np.int64,
+        )
+        return BlockEntityIndex(positions, self.size)
+
     @property
     def offset_x(self) -> np.int8:
         """np.short: The offset of the schematic in the x direction."""
@@ -159,6 +1093,7 @@ class SchematicV2(SchematicSchema):
         return self.offset_x, self.offset_y, self.offset_z
 
     @property
+    @cached("Metadata")
     def metadata(self) -> dict:
         """dict: A dictionary containing the metadata of the schematic."""
         return self.raw["Metadata"]
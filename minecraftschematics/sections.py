@@ -0,0 +1,345 @@
+from typing import Iterable, Iterator, Tuple
+import numpy as np
+
+# Edge length of a section, as in the chunk sections of Minecraft
+SECTION_SIZE = 16
+SECTION_VOLUME = SECTION_SIZE**3
+
+
+class SectionedIndices:
+    def __init__(self, size: Tuple[int, int, int], dtype=np.uint16, fill: int = 0):
+        """Palette indices stored in sections of 16x16x16 blocks, like Minecraft's paletted containers.
+
+        A section where every block has the same index, e.g. a section of air, is stored as that
+        single index. Other sections store a local palette of the indices they use and one
+        local index per block, bit-packed into 64-bit words with 1, 2, 4, 8 or 16 bits per block.
+        Blocks in a section are ordered like BlockData, ``x + z * 16 + y * 256``. Mostly uniform
+        schematics take a small fraction of the memory of a dense array.
+
+        Args:
+            size (Tuple[int, int, int]): The (width, height, length) of the schematic.
+            dtype (np.dtype, optional): The type of the dense arrays returned. Defaults to np.uint16.
+            fill (int, optional): The index of every block of the new storage. Defaults to 0.
+        """
+        self.size = tuple(int(i) for i in size)
+        self.dtype = np.dtype(dtype)
+        width, height, length = self.size
+        self.sections_shape = tuple(
+            -(-i // SECTION_SIZE) for i in (height, length, width)
+        )
+
+        # The index of each uniform section, or -1 for the sections in palettes and data
+        self.uniform = np.full(self.sections_shape, fill, dtype=np.int64)
+        self.palettes = {}
+        self.data = {}
+
+    @classmethod
+    def from_dense(cls, indices: np.ndarray) -> "SectionedIndices":
+        """Create the sectioned storage of a dense array of indices.
+
+        Args:
+            indices (np.ndarray): The palette indices, indexed as ``[y, z, x]`` like ``block_indices``.
+
+        Returns:
+            SectionedIndices: The sectioned storage.
+        """
+        indices = np.asarray(indices)
+        height, length, width = indices.shape
+        slabs = (indices[y : y + SECTION_SIZE] for y in range(0, height, SECTION_SIZE))
+        return cls.from_slabs(slabs, (width, height, length), indices.dtype)
+
+    @classmethod
+    def from_slabs(
+        cls, slabs: Iterable[np.ndarray], size: Tuple[int, int, int], dtype=np.uint16
+    ) -> "SectionedIndices":
+        """Create the sectioned storage from slabs of 16 layers, so the dense array is never needed.
+
+        Uniform sections are found with one comparison over each slab, then only the other
+        sections are packed one by one.
+
+        Args:
+            slabs (Iterable[np.ndarray]): Arrays of indices of 16 layers each, from the bottom, indexed as ``[y, z, x]``. The last one may be thinner.
+            size (Tuple[int, int, int]): The (width, height, length) of the schematic.
+            dtype (np.dtype, optional): The type of the dense arrays returned. Defaults to np.uint16.
+
+        Returns:
+            SectionedIndices: The sectioned storage.
+
+        Raises:
+            ValueError: If the slabs do not match the size.
+        """
+        result = cls(size, dtype)
+        _, count_z, count_x = result.sections_shape
+        width, height, length = result.size
+
+        section_y = -1
+        for section_y, slab in enumerate(slabs):
+            slab = np.asarray(slab)
+            expected = min(SECTION_SIZE, height - section_y * SECTION_SIZE)
+            if slab.shape != (expected, length, width):
+                raise ValueError(
+                    f"Expected a slab of shape {(expected, length, width)}, got {slab.shape}."
+                )
+
+            # Repeating the last blocks fills partial sections without adding indices to them
+            padded = np.pad(
+                slab,
+                (
+                    (0, SECTION_SIZE - slab.shape[0]),
+                    (0, count_z * SECTION_SIZE - length),
+                    (0, count_x * SECTION_SIZE - width),
+                ),
+                mode="edge",
+            )
+            blocks = padded.reshape(
+                SECTION_SIZE, count_z, SECTION_SIZE, count_x, SECTION_SIZE
+            ).transpose(1, 3, 0, 2, 4)
+            blocks = blocks.reshape(count_z * count_x, SECTION_VOLUME)
+
+            first = blocks[:, 0]
+            uniform = (blocks == first[:, None]).all(axis=1)
+            result.uniform[section_y] = np.where(uniform, first, -1).reshape(
+                count_z, count_x
+            )
+            for i in np.flatnonzero(~uniform).tolist():
+                result._pack(section_y * count_z * count_x + i, blocks[i])
+
+        if section_y + 1 != result.sections_shape[0]:
+            raise ValueError(
+                f"Expected {result.sections_shape[0]} slabs, got {section_y + 1}."
+            )
+        return result
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        """Tuple[int, int, int]: The (height, length, width) shape of the dense array."""
+        width, height, length = self.size
+        return height, length, width
+
+    @property
+    def nbytes(self) -> int:
+        """int: The number of bytes used by the arrays of the storage."""
+        return (
+            self.uniform.nbytes
+            + sum(palette.nbytes for palette in self.palettes.values())
+            + sum(data.nbytes for data in self.data.values())
+        )
+
+    def get(self, x: int, y: int, z: int) -> int:
+        """Get the index of the block at a position.
+
+        Args:
+            x (int): The x coordinate.
+            y (int): The y coordinate.
+            z (int): The z coordinate.
+
+        Returns:
+            int: The palette index.
+
+        Raises:
+            IndexError: If the position is outside of the schematic.
+        """
+        section, i = self._locate(x, y, z)
+        index = self.uniform.flat[section]
+        if index >= 0:
+            return int(index)
+
+        palette = self.palettes[section]
+        bits = _bits(len(palette))
+        per_word = 64 // bits
+        word = int(self.data[section][i // per_word])
+        return int(palette[(word >> (i % per_word * bits)) & ((1 << bits) - 1)])
+
+    def set(self, x: int, y: int, z: int, index: int):
+        """Set the index of the block at a position.
+
+        Indices already in the local palette of the section are written in place. A new index
+        is appended to the palette, and the section is only repacked when the palette outgrows
+        its number of bits. Palettes are not shrunk when indices stop being used.
+
+        Args:
+            x (int): The x coordinate.
+            y (int): The y coordinate.
+            z (int): The z coordinate.
+            index (int): The palette index.
+
+        Raises:
+            IndexError: If the position is outside of the schematic.
+        """
+        section, i = self._locate(x, y, z)
+        index = int(index)
+        uniform = int(self.uniform.flat[section])
+        if uniform == index:
+            return
+        if uniform >= 0:
+            self.palettes[section] = np.array([uniform, index], dtype=self.dtype)
+            self.data[section] = np.zeros(SECTION_VOLUME // 64, dtype=np.uint64)
+            self.uniform.flat[section] = -1
+
+        palette = self.palettes[section]
+        found = np.flatnonzero(palette == index)
+        if len(found):
+            local = int(found[0])
+        elif len(palette) < 1 << _bits(len(palette)):
+            local = len(palette)
+            self.palettes[section] = np.append(palette, palette.dtype.type(index))
+        else:
+            blocks = self._unpack(section)
+            blocks[i] = index
+            self._pack(section, blocks)
+            return
+
+        bits = _bits(len(self.palettes[section]))
+        per_word = 64 // bits
+        shift = np.uint64(i % per_word * bits)
+        mask = np.uint64((1 << bits) - 1) << shift
+        data = self.data[section]
+        data[i // per_word] = (data[i // per_word] & ~mask) | (
+            np.uint64(local) << shift
+        )
+
+    def region(
+        self, start: Tuple[int, int, int], end: Tuple[int, int, int]
+    ) -> np.ndarray:
+        """Get the indices of the blocks between two corners as a dense array.
+
+        Only the sections overlapping the region are read. Uniform sections are broadcast
+        without unpacking anything.
+
+        Args:
+            start (Tuple[int, int, int]): The (x, y, z) position of a corner of the region, inclusive.
+            end (Tuple[int, int, int]): The (x, y, z) position of the opposite corner, inclusive.
+
+        Returns:
+            np.ndarray: The indices, indexed as ``[y, z, x]``.
+
+        Raises:
+            IndexError: If the region is not entirely inside the schematic.
+        """
+        low, high = np.minimum(start, end), np.maximum(start, end)
+        if np.any(low < 0) or np.any(high >= self.size):
+            raise IndexError(
+                f"Region {tuple(start)} to {tuple(end)} is outside of the schematic."
+            )
+        (x0, y0, z0), (x1, y1, z1) = low.tolist(), (high + 1).tolist()
+        result = np.empty((y1 - y0, z1 - z0, x1 - x0), dtype=self.dtype)
+
+        _, count_z, count_x = self.sections_shape
+        sx0, sx1 = x0 // SECTION_SIZE, -(-x1 // SECTION_SIZE)
+        sz0, sz1 = z0 // SECTION_SIZE, -(-z1 // SECTION_SIZE)
+        for sy in range(y0 // SECTION_SIZE, -(-y1 // SECTION_SIZE)):
+            # The sections of one layer of sections overlapping the region, filled with the
+            # uniform indices, then with the packed sections
+            uniform = self.uniform[sy, sz0:sz1, sx0:sx1]
+            slab = np.empty(
+                (SECTION_SIZE, uniform.shape[0], SECTION_SIZE, uniform.shape[1])
+                + (SECTION_SIZE,),
+                dtype=self.dtype,
+            )
+            slab[...] = np.maximum(uniform, 0)[None, :, None, :, None]
+            for z, x in zip(*np.nonzero(uniform < 0)):
+                section = (sy * count_z + sz0 + z) * count_x + sx0 + x
+                slab[:, z, :, x, :] = self._unpack(section).reshape((SECTION_SIZE,) * 3)
+            slab = slab.reshape(
+                SECTION_SIZE,
+                uniform.shape[0] * SECTION_SIZE,
+                uniform.shape[1] * SECTION_SIZE,
+            )
+
+            base = sy * SECTION_SIZE
+            top, bottom = max(y0, base), min(y1, base + SECTION_SIZE)
+            result[top - y0 : bottom - y0] = slab[
+                top - base : bottom - base,
+                z0 - sz0 * SECTION_SIZE : z1 - sz0 * SECTION_SIZE,
+                x0 - sx0 * SECTION_SIZE : x1 - sx0 * SECTION_SIZE,
+            ]
+        return result
+
+    def to_dense(self) -> np.ndarray:
+        """Get the indices of every block as a dense array, like ``block_indices``.
+
+        Returns:
+            np.ndarray: The indices, of shape (height, length, width).
+        """
+        if not all(self.size):
+            return np.zeros(self.shape, dtype=self.dtype)
+        return self.region((0, 0, 0), np.array(self.size) - 1)
+
+    def slabs(self) -> Iterator[np.ndarray]:
+        """Get the indices 16 layers at a time, from the bottom, the inverse of ``from_slabs``.
+
+        Yields:
+            np.ndarray: The indices of the layers, indexed as ``[y, z, x]``.
+        """
+        width, height, length = self.size
+        if not width or not length:
+            for y in range(0, height, SECTION_SIZE):
+                yield np.zeros(
+                    (min(SECTION_SIZE, height - y), length, width), self.dtype
+                )
+            return
+        for y in range(0, height, SECTION_SIZE):
+            top = min(y + SECTION_SIZE, height) - 1
+            yield self.region((0, y, 0), (width - 1, top, length - 1))
+
+    def min(self) -> int:
+        """int: The smallest index in the storage."""
+        return min(self._used())
+
+    def max(self) -> int:
+        """int: The largest index in the storage."""
+        return max(self._used())
+
+    def _used(self) -> list:
+        """Get the indices of the uniform sections and of the local palettes."""
+        uniform = self.uniform[self.uniform >= 0]
+        return [
+            int(i)
+            for values in [uniform, *self.palettes.values()]
+            if len(values)
+            for i in (values.min(), values.max())
+        ]
+
+    def _locate(self, x: int, y: int, z: int) -> Tuple[int, int]:
+        """Get the section of a position and the index of the position in the section."""
+        x, y, z = int(x), int(y), int(z)
+        width, height, length = self.size
+        if not (0 <= x < width and 0 <= y < height and 0 <= z < length):
+            raise IndexError(f"Position {(x, y, z)} is outside of the schematic.")
+        _, count_z, count_x = self.sections_shape
+        section = (
+            (y // SECTION_SIZE * count_z) + z // SECTION_SIZE
+        ) * count_x + x // SECTION_SIZE
+        x, y, z = x % SECTION_SIZE, y % SECTION_SIZE, z % SECTION_SIZE
+        return section, x + z * SECTION_SIZE + y * SECTION_SIZE**2
+
+    def _pack(self, section: int, blocks: np.ndarray):
+        """Store the indices of the blocks of a section."""
+        palette, local = np.unique(blocks, return_inverse=True)
+        if len(palette) == 1:
+            self.uniform.flat[section] = palette[0]
+            self.palettes.pop(section, None)
+            self.data.pop(section, None)
+            return
+
+        bits = _bits(len(palette))
+        per_word = 64 // bits
+        shifts = np.arange(0, 64, bits, dtype=np.uint64)
+        words = local.astype(np.uint64).reshape(-1, per_word) << shifts
+        self.uniform.flat[section] = -1
+        self.palettes[section] = palette.astype(self.dtype)
+        self.data[section] = np.bitwise_or.reduce(words, axis=1)
+
+    def _unpack(self, section: int) -> np.ndarray:
+        """Get the indices of the blocks of a packed section, in section order."""
+        palette = self.palettes[section]
+        bits = _bits(len(palette))
+        shifts = np.arange(0, 64, bits, dtype=np.uint64)
+        local = (self.data[section][:, None] >> shifts) & np.uint64((1 << bits) - 1)
+        return palette[local.ravel()]
+
+
+def _bits(count: int) -> int:
+    """Get the number of bits per block of a local palette, a power of two so words are filled."""
+    bits = max(int(count - 1).bit_length(), 1)
+    return 1 << (bits - 1).bit_length()
@@ -0,0 +1,108 @@
+from typing import Optional, Tuple
+import numpy as np
+
+
+class BlockEntityIndex:
+    def __init__(self, positions: np.ndarray, size: Tuple[int, int, int]):
+        """An index of block entities by position.
+
+        Positions are turned into flat indices in the order of BlockData (``x + z * width +
+        y * width * length``). A dictionary gives single lookups in constant time, and a sorted
+        array of the flat indices serves vectorized lookups and box queries.
+
+        Args:
+            positions (np.ndarray): An (N, 3) array with the (x, y, z) position of each block entity.
+            size (Tuple[int, int, int]): The (width, height, length) of the schematic.
+        """
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 3)
+        self.size = tuple(int(i) for i in size)
+        self.positions = positions
+
+        # Block entities outside of the schematic cannot be found by position
+        inside = np.all((positions >= 0) & (positions < self.size), axis=1)
+        flat = np.where(inside, self._flatten(positions), -1)
+        order = np.argsort(flat, kind="stable")
+        order = order[flat[order] >= 0]
+
+        self.sorted_flat = flat[order]
+        self.sorted_order = order
+
+        # The first block entity wins when several share a position
+        self._lookup = {}
+        for key, value in zip(self.sorted_flat.tolist(), order.tolist()):
+            self._lookup.setdefault(key, value)
+
+    def find(self, x: int, y: int, z: int) -> Optional[int]:
+        """Find the block entity at a position.
+
+        Args:
+            x (int): The x coordinate.
+            y (int): The y coordinate.
+            z (int): The z coordinate.
+
+        Returns:
+            Optional[int]: The index of the block entity in BlockEntities, or None if there is none at that position.
+        """
+        width, height, length = self.size
+        if not (0 <= x < width and 0 <= y < height and 0 <= z < length):
+            return None
+        return self._lookup.get(x + z * width + y * width * length)
+
+    def find_many(self, positions: np.ndarray) -> np.ndarray:
+        """Find the block entities at many positions at once.
+
+        Args:
+            positions (np.ndarray): An (M, 3) array of (x, y, z) positions.
+
+        Returns:
+            np.ndarray: The index in BlockEntities of the block entity at each position, or -1 where there is none.
+        """
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 3)
+        result = np.full(len(positions), -1, dtype=np.int64)
+        if not len(self.sorted_flat):
+            return result
+
+        inside = np.all((positions >= 0) & (positions < self.size), axis=1)
+        flat = self._flatten(positions[inside])
+        found = np.searchsorted(self.sorted_flat, flat)
+        found = np.minimum(found, len(self.sorted_flat) - 1)
+        hit = self.sorted_flat[found] == flat
+        result[np.flatnonzero(inside)[hit]] = self.sorted_order[found[hit]]
+        return result
+
+    def in_box(
+        self, start: Tuple[int, int, int], end: Tuple[int, int, int]
+    ) -> np.ndarray:
+        """Find the block entities inside a box.
+
+        The layers of the box are found with a binary search on the sorted flat indices, then
+        only the block entities of these layers are checked.
+
+        Args:
+            start (Tuple[int, int, int]): The (x, y, z) position of a corner of the box, inclusive.
+            end (Tuple[int, int, int]): The (x, y, z) position of the opposite corner, inclusive.
+
+        Returns:
+            np.ndarray: The indices in BlockEntities of the block entities inside the box, in BlockData order.
+        """
+        low, high = np.minimum(start, end), np.maximum(start, end)
+        width, height, length = self.size
+        layer = width * length
+        first, last = np.searchsorted(
+            self.sorted_flat,
+            (max(int(low[1]), 0) * layer, (min(int(high[1]), height - 1) + 1) * layer),
+        )
+        candidates = self.sorted_order[first:last]
+        positions = self.positions[candidates]
+        inside = np.all((positions >= low) & (positions <= high), axis=1)
+        return candidates[inside]
+
+    def __len__(self) -> int:
+        return len(self.sorted_flat)
+
+    def _flatten(self, positions: np.ndarray) -> np.ndarray:
+        """Get the flat BlockData index of (x, y, z) positions."""
+        width, _, length = self.size
+        return (
+            positions[:, 0] + positions[:, 2] * width + positions[:, 1] * width * length
+        )
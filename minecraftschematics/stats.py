@@ -0,0 +1,287 @@
+import contextvars
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable, List, NamedTuple, Optional
+
+# The LoadStats recording in the current thread or task, None when instrumentation is off
+_current = contextvars.ContextVar("minecraftschematics_stats", default=None)
+
+
+class PhaseEvent(NamedTuple):
+    """A measured phase of loading a schematic or computing one of its properties."""
+
+    name: str
+    category: str
+    start: float
+    duration: float
+    bytes: Optional[int]
+    block_delta: Optional[int]
+    """The net change in the number of memory blocks held by Python (``sys.getallocatedblocks``), negative when the phase freed more than it allocated, or None for phases measured piecewise."""
+    memory: Optional[int]
+    thread: int
+    args: dict
+
+
+class LoadStats:
+    def __init__(
+        self,
+        trace_memory: bool = False,
+        callback: Callable[[PhaseEvent], None] = None,
+    ):
+        """Records the time spent in each phase of loading schematics and computing their properties.
+
+        Instrumentation is off by default. It is turned on for the code running inside a
+        ``with`` block of a LoadStats, which then records a PhaseEvent for every phase: reading,
+        inflating and parsing the file, decoding lazily loaded tags, computing each derived
+        property, and saving.
+
+        Args:
+            trace_memory (bool, optional): Also record the peak memory allocated by each phase with ``tracemalloc``, which slows the phases down noticeably. Defaults to False.
+            callback (Callable[[PhaseEvent], None], optional): A function called with each event when its phase ends. Defaults to None.
+        """
+        self.trace_memory = trace_memory
+        self.callback = callback
+        self.events: List[PhaseEvent] = []
+        self._origin = time.perf_counter()
+        self._tokens = []
+        self._started_tracemalloc = False
+        self._local = threading.local()
+
+    def __enter__(self) -> "LoadStats":
+        self._tokens.append(_current.set(self))
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        return self
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._tokens.pop())
+        if self._started_tracemalloc and not self._tokens:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def phase(self, name: str, category: str = "load", **args) -> "_Phase":
+        """Measure a phase.
+
+        Args:
+            name (str): The name of the phase.
+            category (str, optional): The kind of phase, e.g. "load", "decode" or "property". Defaults to "load".
+            **args: Additional information stored with the event, such as the path of the file.
+
+        Returns:
+            _Phase: A context manager measuring the code it wraps. The number of bytes processed can be set on its ``bytes`` attribute.
+        """
+        return _Phase(self, name, category, args)
+
+    def add(
+        self,
+        name: str,
+        start: float,
+        duration: float,
+        category: str = "load",
+        bytes: int = None,
+        **args,
+    ):
+        """Record a phase measured by the caller, such as the total time of many interleaved calls.
+
+        Args:
+            name (str): The name of the phase.
+            start (float): The ``time.perf_counter()`` at which the phase starts.
+            duration (float): The duration of the phase in seconds.
+            category (str, optional): The kind of phase. Defaults to "load".
+            bytes (int, optional): The number of bytes processed. Defaults to None.
+            **args: Additional information stored with the event.
+        """
+        self._record(
+            PhaseEvent(
+                name,
+                category,
+                start - self._origin,
+                duration,
+                bytes,
+                None,
+                None,
+                threading.get_ident(),
+                args,
+            )
+        )
+
+    def totals(self) -> dict:
+        """Sum up the events by phase name.
+
+        Returns:
+            dict: The number of calls, the total time in seconds, bytes and block delta of each phase.
+        """
+        totals = {}
+        for event in self.events:
+            total = totals.setdefault(
+                event.name, {"count": 0, "time": 0.0, "bytes": 0, "block_delta": 0}
+            )
+            total["count"] += 1
+            total["time"] += event.duration
+            total["bytes"] += event.bytes or 0
+            total["block_delta"] += event.block_delta or 0
+        return totals
+
+    def to_dict(self) -> dict:
+        """Export the events and their totals as plain Python types.
+
+        Returns:
+            dict: The list of events, with times in seconds since the LoadStats was created, and the totals by phase.
+        """
+        return {
+            "events": [event._asdict() for event in self.events],
+            "totals": self.totals(),
+        }
+
+    def to_chrome_trace(self) -> dict:
+        """Export the events in the Chrome trace event format.
+
+        The result can be written with ``json.dump`` and opened in ``chrome://tracing`` or
+        Perfetto, where nested phases are shown as a flame graph.
+
+        Returns:
+            dict: The trace, with one complete event per phase.
+        """
+        pid = os.getpid()
+        events = []
+        for event in self.events:
+            args = dict(event.args)
+            if event.block_delta is not None:
+                args["block_delta"] = event.block_delta
+            if event.bytes is not None:
+                args["bytes"] = event.bytes
+            if event.memory is not None:
+                args["memory"] = event.memory
+            events.append(
+                {
+                    "name": event.name,
+                    "cat": event.category,
+                    "ph": "X",
+                    "ts": event.start * 1e6,
+                    "dur": event.duration * 1e6,
+                    "pid": pid,
+                    "tid": event.thread,
+                    "args": args,
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def _record(self, event: PhaseEvent):
+        """Store an event and pass it to the callback."""
+        self.events.append(event)
+        if self.callback is not None:
+            self.callback(event)
+
+
+class _Phase:
+    __slots__ = (
+        "stats",
+        "name",
+        "category",
+        "args",
+        "bytes",
+        "skipped",
+        "start",
+        "_blocks",
+    )
+
+    def __init__(self, stats: LoadStats, name: str, category: str, args: dict):
+        """A phase being measured, see ``LoadStats.phase``.
+
+        ``start`` is the ``time.perf_counter()`` at which the phase started. ``skipped`` can be
+        set to the seconds at the start of the phase which are recorded by other events with
+        ``LoadStats.add``; the event then starts after them.
+        """
+        self.stats = stats
+        self.name = name
+        self.category = category
+        self.args = args
+        self.bytes = None
+        self.skipped = 0.0
+
+    def __enter__(self) -> "_Phase":
+        if self.stats.trace_memory and tracemalloc.is_tracing():
+            # Each phase measures its own peak, the peak of the enclosing phase is kept aside
+            stack = self.stats._local.__dict__.setdefault("memory", [])
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+            stack.append([current, current])
+            tracemalloc.reset_peak()
+        self._blocks = sys.getallocatedblocks()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        block_delta = sys.getallocatedblocks() - self._blocks
+
+        memory = None
+        stack = self.stats._local.__dict__.get("memory")
+        if stack:
+            _, peak = tracemalloc.get_traced_memory()
+            start, inner_peak = stack.pop()
+            memory = max(peak, inner_peak) - start
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak, inner_peak)
+
+        self.stats._record(
+            PhaseEvent(
+                self.name,
+                self.category,
+                self.start + self.skipped - self.stats._origin,
+                end - self.start - self.skipped,
+                self.bytes,
+                block_delta,
+                memory,
+                threading.get_ident(),
+                self.args,
+            )
+        )
+
+
+class _NoPhase:
+    """Stands in for a phase when instrumentation is off."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoPhase":
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+def current_stats() -> Optional[LoadStats]:
+    """Get the LoadStats recording in the current thread or task, or None if instrumentation is off."""
+    return _current.get()
+
+
+def phase(name: str, category: str = "load", **args):
+    """Measure a phase if instrumentation is on.
+
+    When no LoadStats is recording, this returns a shared no-op context manager, so
+    instrumented code costs a single context variable lookup.
+
+    Args:
+        name (str): The name of the phase.
+        category (str, optional): The kind of phase. Defaults to "load".
+        **args: Additional information stored with the event.
+
+    Returns:
+        A context manager measuring the code it wraps.
+    """
+    stats = _current.get()
+    if stats is None:
+        return _NO_PHASE
+    return stats.phase(name, category, **args)
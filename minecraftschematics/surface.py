@@ -0,0 +1,244 @@
+from typing import NamedTuple, Sequence
+import numpy as np
+from .block import AIR_TYPES, Block
+
+# Face directions, with the (x, y, z) normal of each face
+FACES = ("down", "up", "north", "south", "west", "east")
+FACE_NORMALS = np.array(
+    [(0, -1, 0), (0, 1, 0), (0, 0, -1), (0, 0, 1), (-1, 0, 0), (1, 0, 0)],
+    dtype=np.int8,
+)
+
+# Axis of the [y, z, x] index grid along the normal of each face, and its sign
+_FACE_AXES = ((0, -1), (0, 1), (1, -1), (1, 1), (2, -1), (2, 1))
+
+# Blocks which do not hide the faces behind them, by type or by the end of the type
+TRANSPARENT_TYPES = frozenset(
+    f"minecraft:{name}"
+    for name in (
+        "water lava ice frosted_ice glass tinted_glass slime_block honey_block "
+        "grass short_grass tall_grass fern large_fern dead_bush seagrass tall_seagrass kelp "
+        "kelp_plant sugar_cane bamboo cactus vine ladder lever redstone_wire repeater "
+        "comparator snow cobweb scaffolding barrier light structure_void hopper lantern "
+        "soul_lantern chain iron_bars flower_pot cake anvil chipped_anvil damaged_anvil bell "
+        "brewing_stand cauldron enchanting_table end_rod lectern campfire soul_campfire "
+        "chest trapped_chest ender_chest spawner beacon conduit dragon_egg farmland "
+        "dirt_path tripwire tripwire_hook sea_pickle turtle_egg lily_pad poppy dandelion "
+        "blue_orchid allium azure_bluet oxeye_daisy cornflower lily_of_the_valley "
+        "wither_rose sunflower lilac rose_bush peony torchflower pitcher_plant"
+    ).split()
+)
+TRANSPARENT_SUFFIXES = (
+    "glass",
+    "_pane",
+    "_leaves",
+    "_slab",
+    "_stairs",
+    "_fence",
+    "_fence_gate",
+    "_wall",
+    "_door",
+    "_trapdoor",
+    "_sign",
+    "_banner",
+    "_button",
+    "_pressure_plate",
+    "_carpet",
+    "torch",
+    "_sapling",
+    "rail",
+    "_bed",
+    "candle",
+    "_coral",
+    "_coral_fan",
+    "_mushroom",
+    "_tulip",
+    "_head",
+    "_skull",
+    "_shulker_box",
+    "_crops",
+    "_stem",
+    "_roots",
+    "_fungus",
+    "_plant",
+    "_vines",
+)
+
+
+class Faces(NamedTuple):
+    """Visible block faces, one entry per face."""
+
+    positions: np.ndarray
+    """An (N, 3) array with the (x, y, z) position of the block of each face."""
+    directions: np.ndarray
+    """The direction of each face, as an index into ``FACES``."""
+    blocks: np.ndarray
+    """The palette index of the block of each face."""
+
+
+class Quads(NamedTuple):
+    """Visible block faces merged into rectangles of identical faces."""
+
+    start: np.ndarray
+    """An (N, 3) array with the (x, y, z) position of the first block of each quad."""
+    end: np.ndarray
+    """An (N, 3) array with the (x, y, z) position of the last block of each quad, inclusive."""
+    directions: np.ndarray
+    """The direction of each quad, as an index into ``FACES``."""
+    blocks: np.ndarray
+    """The palette index of the blocks of each quad."""
+
+
+def is_opaque(block: Block) -> bool:
+    """Guess whether a block is a full opaque cube, which hides the faces of its neighbours.
+
+    Args:
+        block (Block): The block.
+
+    Returns:
+        bool: False for air, and for blocks which are see-through or not full cubes.
+    """
+    block_type = block.type
+    if block_type in AIR_TYPES or block_type in TRANSPARENT_TYPES:
+        return False
+    return not block_type.endswith(TRANSPARENT_SUFFIXES)
+
+
+def visible_faces(
+    indices: np.ndarray, opaque: np.ndarray, rendered: np.ndarray
+) -> Faces:
+    """Find the faces of blocks which are not hidden by a neighbour.
+
+    A face is visible when its block is rendered and the neighbouring block is neither opaque
+    nor the same block, so the faces between two blocks of glass or water are hidden too. Faces
+    on the border of the grid are visible. Each direction is computed with comparisons of
+    shifted views of the grid, without copying it.
+
+    Args:
+        indices (np.ndarray): The palette indices of the blocks, indexed as ``[y, z, x]``.
+        opaque (np.ndarray): A boolean array, True for the palette indices of opaque blocks.
+        rendered (np.ndarray): A boolean array, True for the palette indices of blocks which have faces, i.e. not air.
+
+    Returns:
+        Faces: The visible faces, grouped by direction and in BlockData order within a direction.
+    """
+    opaque_grid = opaque[indices]
+    rendered_grid = rendered[indices]
+
+    positions, directions, blocks = [], [], []
+    for direction, (axis, sign) in enumerate(_FACE_AXES):
+        exposed = rendered_grid.copy()
+        cells, neighbours = _shifted(axis, sign)
+        exposed[cells] &= ~opaque_grid[neighbours]
+        exposed[cells] &= indices[cells] != indices[neighbours]
+
+        y, z, x = np.nonzero(exposed)
+        positions.append(np.stack((x, y, z), axis=1).astype(np.int32))
+        directions.append(np.full(len(x), direction, dtype=np.uint8))
+        blocks.append(indices[y, z, x])
+
+    return Faces(
+        np.concatenate(positions),
+        np.concatenate(directions),
+        np.concatenate(blocks),
+    )
+
+
+def merge_faces(faces: Faces) -> Quads:
+    """Greedily merge adjacent coplanar faces of the same block into quads.
+
+    Faces are first joined into strips along one axis of their plane, then strips with the same
+    extent and block in consecutive rows are stacked into rectangles. Both passes are done with
+    sorting and run detection over whole arrays.
+
+    Args:
+        faces (Faces): The faces to merge, e.g. the result of ``visible_faces``.
+
+    Returns:
+        Quads: The merged faces.
+    """
+    starts, ends, directions, blocks = [], [], [], []
+    for direction, (axis, _) in enumerate(_FACE_AXES):
+        selected = faces.directions == direction
+        positions = faces.positions[selected].astype(np.int64)
+        face_blocks = faces.blocks[selected]
+        if not len(positions):
+            continue
+
+        # Columns of positions: the normal axis, then the rows (v) and the strips (u)
+        normal = (1, 2, 0)[axis]
+        u, v = (0, 2) if normal == 1 else ((0, 1) if normal == 2 else (2, 1))
+
+        # Strips along u: consecutive faces in the same row with the same block
+        order = np.lexsort((positions[:, u], positions[:, v], positions[:, normal]))
+        positions, face_blocks = positions[order], face_blocks[order]
+        new_strip = np.ones(len(positions), dtype=bool)
+        new_strip[1:] = (
+            (positions[1:, u] != positions[:-1, u] + 1)
+            | (positions[1:, v] != positions[:-1, v])
+            | (positions[1:, normal] != positions[:-1, normal])
+            | (face_blocks[1:] != face_blocks[:-1])
+        )
+        first = np.flatnonzero(new_strip)
+        last = np.append(first[1:], len(positions)) - 1
+        strip_start, strip_end = positions[first], positions[last]
+        strip_blocks = face_blocks[first]
+
+        # Rectangles along v: strips in consecutive rows with the same extent and block
+        order = np.lexsort(
+            (
+                strip_start[:, v],
+                strip_blocks,
+                strip_end[:, u],
+                strip_start[:, u],
+                strip_start[:, normal],
+            )
+        )
+        strip_start, strip_end = strip_start[order], strip_end[order]
+        strip_blocks = strip_blocks[order]
+        new_quad = np.ones(len(strip_start), dtype=bool)
+        new_quad[1:] = (
+            (strip_start[1:, v] != strip_start[:-1, v] + 1)
+            | (strip_start[1:, u] != strip_start[:-1, u])
+            | (strip_end[1:, u] != strip_end[:-1, u])
+            | (strip_start[1:, normal] != strip_start[:-1, normal])
+            | (strip_blocks[1:] != strip_blocks[:-1])
+        )
+        first = np.flatnonzero(new_quad)
+        last = np.append(first[1:], len(strip_start)) - 1
+
+        starts.append(strip_start[first])
+        ends.append(strip_end[last])
+        directions.append(np.full(len(first), direction, dtype=np.uint8))
+        blocks.append(strip_blocks[first])
+
+    if not starts:
+        empty = np.zeros((0, 3), dtype=np.int32)
+        return Quads(empty, empty, faces.directions[:0], faces.blocks[:0])
+    return Quads(
+        np.concatenate(starts).astype(np.int32),
+        np.concatenate(ends).astype(np.int32),
+        np.concatenate(directions),
+        np.concatenate(blocks),
+    )
+
+
+def opaque_mask(palette: Sequence[Block]) -> np.ndarray:
+    """Classify every entry of a palette with ``is_opaque``.
+
+    Args:
+        palette (Sequence[Block]): The palette.
+
+    Returns:
+        np.ndarray: A boolean array, True for the palette indices of opaque blocks.
+    """
+    return np.array([is_opaque(block) for block in palette], dtype=bool)
+
+
+def _shifted(axis: int, sign: int):
+    """Get the slices of the cells that have a neighbour in a direction, and of these neighbours."""
+    cells = [slice(None)] * 3
+    neighbours = [slice(None)] * 3
+    cells[axis] = slice(None, -1) if sign > 0 else slice(1, None)
+    neighbours[axis] = slice(1, None) if sign > 0 else slice(None, -1)
+    return tuple(cells), tuple(neighbours)
@@ -0,0 +1,199 @@
+from typing import Sequence, Tuple
+import numpy as np
+from .block import Block
+
+# Horizontal directions in clockwise order, seen from above
+DIRECTIONS = ("north", "east", "south", "west")
+
+_MIRRORED_DIRECTIONS = {
+    "x": {"east": "west", "west": "east"},
+    "z": {"north": "south", "south": "north"},
+}
+
+# Rail shapes joining two directions, keyed by the directions they join
+_RAIL_SHAPES = {
+    frozenset(("north", "south")): "north_south",
+    frozenset(("east", "west")): "east_west",
+    frozenset(("north", "east")): "north_east",
+    frozenset(("north", "west")): "north_west",
+    frozenset(("south", "east")): "south_east",
+    frozenset(("south", "west")): "south_west",
+}
+
+_HANDEDNESS = {"left": "right", "right": "left"}
+
+
+def rotate_block_state(blockdata: str, turns: int = 1) -> str:
+    """Rotate a block state clockwise around the y axis, seen from above.
+
+    Rewrites the properties that depend on the orientation of the block: ``facing``,
+    ``axis``, ``rotation``, the ``north``/``east``/``south``/``west`` connections, rail
+    ``shape`` and ``orientation``.
+
+    Args:
+        blockdata (str): The raw block state, e.g. ``minecraft:oak_stairs[facing=north,half=bottom]``.
+        turns (int, optional): The number of quarter turns. Defaults to 1.
+
+    Returns:
+        str: The rotated raw block state.
+    """
+    turns %= 4
+    block = Block(blockdata)
+    if turns == 0 or not block.raw_properties:
+        return blockdata
+
+    rotation = {
+        direction: DIRECTIONS[(i + turns) % 4] for i, direction in enumerate(DIRECTIONS)
+    }
+    properties = {}
+    for key, value in block.properties.items():
+        if key in rotation:
+            key = rotation[key]
+        elif key == "axis" and turns % 2:
+            value = {"x": "z", "z": "x"}.get(value, value)
+        elif key == "rotation" and value.isdigit():
+            value = str((int(value) + 4 * turns) % 16)
+        else:
+            value = _map_directions(key, value, rotation)
+        properties[key] = value
+
+    return _format_block_state(block.type, block.properties, properties)
+
+
+def mirror_block_state(blockdata: str, axis: str) -> str:
+    """Mirror a block state along the x or z axis.
+
+    Mirroring along x swaps east and west, mirroring along z swaps north and south. Besides
+    the properties handled by ``rotate_block_state``, the handedness of stair shapes, door
+    hinges and double chests is swapped.
+
+    Args:
+        blockdata (str): The raw block state.
+        axis (str): The axis along which the block is mirrored, "x" or "z".
+
+    Returns:
+        str: The mirrored raw block state.
+
+    Raises:
+        ValueError: If the axis is not "x" or "z".
+    """
+    if axis not in _MIRRORED_DIRECTIONS:
+        raise ValueError(f"Blocks can only be mirrored along x or z, not {axis!r}.")
+
+    block = Block(blockdata)
+    if not block.raw_properties:
+        return blockdata
+
+    mirror = {direction: direction for direction in DIRECTIONS}
+    mirror.update(_MIRRORED_DIRECTIONS[axis])
+    properties = {}
+    for key, value in block.properties.items():
+        if key in mirror:
+            key = mirror[key]
+        elif key == "rotation" and value.isdigit():
+            value = str(((16 if axis == "x" else 8) - int(value)) % 16)
+        elif (
+            key in ("shape", "hinge", "type")
+            and value.rpartition("_")[2] in _HANDEDNESS
+        ):
+            prefix, _, side = value.rpartition("_")
+            value = f"{prefix}_{_HANDEDNESS[side]}" if prefix else _HANDEDNESS[side]
+        else:
+            value = _map_directions(key, value, mirror)
+        properties[key] = value
+
+    return _format_block_state(block.type, block.properties, properties)
+
+
+def rotate_positions(
+    positions: np.ndarray, size: Tuple[float, float, float], turns: int = 1
+):
+    """Rotate (x, y, z) positions clockwise around the y axis, inside a box of the given size.
+
+    Block positions should be given with the size of the box minus one on each axis, so that
+    the last block maps onto the first one; continuous entity positions with the size of the box.
+
+    Args:
+        positions (np.ndarray): An (N, 3) array of positions.
+        size (Tuple[float, float, float]): The size of the box in (width, height, length).
+        turns (int, optional): The number of quarter turns. Defaults to 1.
+
+    Returns:
+        np.ndarray: The rotated positions.
+    """
+    result = np.array(positions, copy=True)
+    width, _, length = size
+    for _ in range(turns % 4):
+        result[:, 0], result[:, 2] = length - result[:, 2], result[:, 0].copy()
+        width, length = length, width
+    return result
+
+
+def mirror_positions(
+    positions: np.ndarray, size: Tuple[float, float, float], axis: str
+):
+    """Mirror (x, y, z) positions along the x or z axis, inside a box of the given size.
+
+    Args:
+        positions (np.ndarray): An (N, 3) array of positions.
+        size (Tuple[float, float, float]): The size of the box in (width, height, length), see ``rotate_positions``.
+        axis (str): The axis along which the positions are mirrored, "x" or "z".
+
+    Returns:
+        np.ndarray: The mirrored positions.
+    """
+    result = np.array(positions, copy=True)
+    column = 0 if axis == "x" else 2
+    result[:, column] = size[column] - result[:, column]
+    return result
+
+
+def remap_palette(palette: Sequence[str], transform) -> Tuple[list, np.ndarray]:
+    """Apply a block state transformation to every entry of a palette.
+
+    Args:
+        palette (Sequence[str]): The raw block states of the palette.
+        transform (Callable[[str], str]): The transformation of a single block state.
+
+    Returns:
+        Tuple[list, np.ndarray]: The new palette, without duplicates, and the table mapping each old palette index to its new index.
+    """
+    new_palette = []
+    indices = {}
+    table = np.empty(len(palette), dtype=np.int32)
+    for i, blockdata in enumerate(palette):
+        blockdata = transform(blockdata)
+        if blockdata not in indices:
+            indices[blockdata] = len(new_palette)
+            new_palette.append(blockdata)
+        table[i] = indices[blockdata]
+    return new_palette, table
+
+
+def _map_directions(key: str, value: str, mapping: dict) -> str:
+    """Map the directions of a facing, rail shape or orientation value."""
+    if key == "facing":
+        return mapping.get(value, value)
+    if key == "orientation":
+        return "_".join(mapping.get(word, word) for word in value.split("_"))
+    if key == "shape":
+        words = value.split("_")
+        if words[0] == "ascending" and len(words) == 2:
+            return f"ascending_{mapping.get(words[1], words[1])}"
+        directions = frozenset(mapping.get(word, word) for word in words)
+        if len(words) == 2 and directions in _RAIL_SHAPES:
+            return _RAIL_SHAPES[directions]
+    return value
+
+
+def _format_block_state(block_type: str, old_properties: dict, properties: dict) -> str:
+    """Build a raw block state, keeping the order of the original properties.
+
+    Every transformed property is kept. Properties are built in the order of the original
+    ones, so a key that was renamed, e.g. ``north`` to ``east``, takes the place of its
+    original key unless it was already present.
+    """
+    positions = {key: i for i, key in enumerate(old_properties)}
+    slots = {key: positions.get(key, slot) for slot, key in enumerate(properties)}
+    ordered = sorted(properties, key=slots.get)
+    return f"{block_type}[{','.join(f'{key}={properties[key]}' for key in ordered)}]"
@@ -1,16 +1,93 @@
+import functools
 import nbtlib as nbt
 import numpy as np
+from .stats import phase
 
+# Number of cells scanned at once by layer_chunks, so the temporaries of a scan stay small
+_CHUNK_CELLS = 1 << 20
 
-def nbt_to_numpy(compound) -> dict:
+
+def cached(*keys):
+    """Caches the value of a schematic property until the raw tags it is derived from change.
+
+    The cache lives in the ``_cache`` dictionary of the schematic. An entry is reused as long as
+    each of the given top-level tags of ``raw`` is still the same object as when the value was
+    computed, so replacing ``raw`` or assigning a new tag to one of these keys invalidates it.
+    In-place edits of a tag (e.g. changing a single byte of BlockData) cannot be detected;
+    call ``clear_cache()`` after making them.
+
+    Args:
+        *keys (str): The top-level tags of ``raw`` the property is derived from.
+
+    Returns:
+        Callable: A decorator for the property getter.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            cache_key = (func.__name__, *args, *sorted(kwargs.items()))
+            entry = self._cache.get(cache_key)
+            if entry is not None and is_fresh(self.raw, *entry[1:]):
+                return entry[0]
+
+            with phase(func.__name__, "property") as event:
+                value = func(self, *args, **kwargs)
+                event.bytes = getattr(value, "nbytes", None)
+            self._cache[cache_key] = (
+                value,
+                keys,
+                tuple(dict.get(self.raw, key) for key in keys),
+            )
+            return value
+
+        wrapper.cache_keys = keys
+        return wrapper
+
+    return decorator
+
+
+def is_fresh(raw, keys, tags) -> bool:
+    """Check whether the given top-level tags of raw are still the objects a cached value was derived from."""
+    return all(dict.get(raw, key) is tag for key, tag in zip(keys, tags))
+
+
+def index_dtype(palette_size: int) -> np.dtype:
+    """Get the smallest integer type of the palette indices, ``uint16`` or ``int32``, for a palette size."""
+    return np.dtype(
+        np.uint16 if palette_size <= np.iinfo(np.uint16).max + 1 else np.int32
+    )
+
+
+def layer_chunks(indices: np.ndarray):
+    """Iterate over a grid of palette indices a chunk of layers at a time.
+
+    Each chunk holds about a million cells, and at least one layer, so the temporaries of a
+    vectorized scan do not grow with the size of the schematic.
+
+    Args:
+        indices (np.ndarray): The palette indices, indexed as ``[y, z, x]``.
+
+    Yields:
+        Tuple[int, np.ndarray]: The y of the first layer of the chunk, and a view of its layers.
+    """
+    height, length, width = indices.shape
+    layers = max(_CHUNK_CELLS // max(length * width, 1), 1)
+    for y in range(0, height, layers):
+        yield y, indices[y : y + layers]
+
+
+def nbt_to_numpy(compound, lazy: bool = False) -> dict:
     """Converts an nbtlib Compound to a dictionary with numpy data types.
 
     This method recursively converts an nbtlib Compound object into a dictionary, replacing
     certain nbtlib types with their corresponding numpy data types to facilitate compatibility
-    and easy data manipulation.
+    and easy data manipulation. The converter of each tag type is looked up in a table, and
+    array tags are returned as read-only views of the tag data instead of copies.
 
     Args:
         nbt_obj (nbtlib.Compound or nbtlib.List): The nbtlib object to convert.
+        lazy (bool, optional): Only convert nested values when they are first accessed, see ``LazyNumpyDict``. Defaults to False.
 
     Returns:
         dict: The converted dictionary.
@@ -29,43 +106,225 @@ def nbt_to_numpy(compound) -> dict:
         +-------------------+---------------------------------------------------------+
         | ``numpy.ndarray`` | :class:`ByteArray` :class:`IntArray` :class:`LongArray` |
         +-------------------+---------------------------------------------------------+
-        | ``list``          | :class:`List`                                           |
+        | ``ListDict``      | :class:`List`                                           |
         +-------------------+---------------------------------------------------------+
         | ``dict``          | :class:`Compound`                                       |
         +-------------------+---------------------------------------------------------+
     """
+    if lazy:
+        return (LazyListDict if isinstance(compound, nbt.List) else LazyNumpyDict)(
+            compound
+        )
+    return _convert_container(compound)
 
-    iterator = (
-        compound.items() if isinstance(compound, nbt.Compound) else enumerate(compound)
-    )
 
-    result = {}
-    for key, value in iterator:
-        if isinstance(value, nbt.Byte):
-            result[key] = np.int8(value)
-        elif isinstance(value, nbt.Short):
-            result[key] = np.int16(value)
-        elif isinstance(value, nbt.Int):
-            result[key] = np.int32(value)
-        elif isinstance(value, nbt.Long):
-            result[key] = np.int64(value)
-        elif isinstance(value, nbt.Float):
-            result[key] = np.float32(value)
-        elif isinstance(value, nbt.Double):
-            result[key] = np.float64(value)
-        elif isinstance(value, nbt.String):
-            result[key] = str(value)
-        elif isinstance(value, nbt.ByteArray):
-            result[key] = np.array(value, dtype=np.int8)
-        elif isinstance(value, nbt.IntArray):
-            result[key] = np.array(value, dtype=np.int32)
-        elif isinstance(value, nbt.LongArray):
-            result[key] = np.array(value, dtype=np.int64)
-        elif isinstance(value, nbt.List):
-            result[key] = nbt_to_numpy(value)
-        elif isinstance(value, nbt.Compound):
-            result[key] = nbt_to_numpy(value)
-        else:
-            result[key] = value
+def nbt_to_numpy_many(compounds, lazy: bool = False) -> np.ndarray:
+    """Converts a sequence of nbtlib Compounds, e.g. the BlockEntities of a schematic, at once.
+
+    Args:
+        compounds (Iterable[nbtlib.Compound]): The compounds to convert.
+        lazy (bool, optional): Only convert nested values when they are first accessed. Defaults to False.
+
+    Returns:
+        np.ndarray: An object array with the converted dictionary of each compound.
+    """
+    convert = LazyNumpyDict if lazy else _convert_container
+    compounds = list(compounds)
+    result = np.empty(len(compounds), dtype=object)
+    for i, compound in enumerate(compounds):
+        result[i] = convert(compound)
+    return result
+
+
+class ListDict(dict):
+    """A dictionary keyed by index, returned by ``nbt_to_numpy`` for List tags.
+
+    ``numpy_to_nbt`` turns it back into a List, even when it is empty.
+    """
+
+
+class LazyNumpyDict(dict):
+    """A dictionary returned by ``nbt_to_numpy(..., lazy=True)``.
+
+    Values are kept as nbtlib tags and converted on first access, so reading a few fields of a
+    large compound only converts those fields. Nested compounds and lists become lazy
+    dictionaries too. ``dict(lazy)``, ``{**lazy}`` and ``copy`` convert every value.
+    """
+
+    # The type of the plain dictionaries made by copy() and pickling
+    _plain = dict
+
+    def __init__(self, tag):
+        super().__init__(tag.items() if isinstance(tag, dict) else enumerate(tag))
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if isinstance(value, nbt.Base):
+            value = _lazy_converter(value.__class__)(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def __iter__(self):
+        # Not inheriting dict.__iter__ keeps dict() and ** from copying the unconverted tags
+        return iter(self.keys())
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def copy(self) -> dict:
+        """Get a plain dictionary with every value converted."""
+        return self._plain(self.items())
+
+    def values(self):
+        self.convert_all()
+        return super().values()
+
+    def items(self):
+        self.convert_all()
+        return super().items()
+
+    def convert_all(self):
+        """Convert every value which has not been accessed yet."""
+        for key in self:
+            self[key]
+
+    def __eq__(self, other) -> bool:
+        self.convert_all()
+        return super().__eq__(other)
 
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        self.convert_all()
+        return super().__repr__()
+
+    def __reduce__(self):
+        # nbtlib List tags cannot be pickled, so the values are converted first
+        return self._plain, (dict(self.items()),)
+
+
+class LazyListDict(LazyNumpyDict, ListDict):
+    """A ``LazyNumpyDict`` of a List tag, keyed by index."""
+
+    _plain = ListDict
+
+
+def _convert_container(tag) -> dict:
+    """Convert the values of a Compound or List tag, keyed by name or index."""
+    items = tag.items() if isinstance(tag, dict) else enumerate(tag)
+    converters = _CONVERTERS
+    result = {} if isinstance(tag, dict) else ListDict()
+    for key, value in items:
+        converter = converters.get(value.__class__)
+        if converter is None:
+            converter = _resolve_converter(value.__class__)
+        result[key] = converter(value)
     return result
+
+
+def _array_view(tag: nbt.Array) -> np.ndarray:
+    """Get a read-only numpy view of an array tag, without copying its data."""
+    view = tag.view(np.ndarray)
+    view.flags.writeable = False
+    return view
+
+
+def _resolve_converter(tag_type: type):
+    """Find the converter of a tag type from its base classes and add it to the table."""
+    for base in tag_type.__mro__:
+        if base in _BASE_CONVERTERS:
+            converter = _BASE_CONVERTERS[base]
+            break
+    else:
+        converter = _identity
+    _CONVERTERS[tag_type] = converter
+    return converter
+
+
+def _lazy_converter(tag_type: type):
+    """Get the converter of a tag type, with compounds and lists converted lazily."""
+    converter = _CONVERTERS.get(tag_type) or _resolve_converter(tag_type)
+    if converter is _convert_container:
+        return LazyListDict if issubclass(tag_type, nbt.List) else LazyNumpyDict
+    return converter
+
+
+def _identity(value):
+    return value
+
+
+_BASE_CONVERTERS = {
+    nbt.Byte: np.int8,
+    nbt.Short: np.int16,
+    nbt.Int: np.int32,
+    nbt.Long: np.int64,
+    nbt.Float: np.float32,
+    nbt.Double: np.float64,
+    nbt.String: str,
+    nbt.Array: _array_view,
+    nbt.List: _convert_container,
+    nbt.Compound: _convert_container,
+}
+
+# Converter of each tag type, including parametrized List types as they are encountered
+_CONVERTERS = dict(_BASE_CONVERTERS)
+
+
+def numpy_to_nbt(value) -> nbt.Base:
+    """Converts a value with numpy data types back to an nbtlib tag.
+
+    This is the inverse of nbt_to_numpy(). ListDicts, and other dictionaries whose keys are all
+    integers, are turned into Lists, as that is how nbt_to_numpy() represents them. Plain Python ints become Int (or Long if
+    they do not fit) and floats become Double. Values which already are nbtlib tags are returned
+    unchanged.
+
+    Args:
+        value: The value to convert, e.g. a block entity returned by SchematicV2.block_entities.
+
+    Returns:
+        nbt.Base: The converted nbtlib tag.
+
+    Raises:
+        TypeError: If the value has no nbt equivalent.
+    """
+    if isinstance(value, nbt.Base):
+        return value
+    if isinstance(value, dict):
+        if (
+            isinstance(value, ListDict)
+            or value
+            and all(isinstance(key, (int, np.integer)) for key in value)
+        ):
+            return nbt.List([numpy_to_nbt(value[key]) for key in sorted(value)])
+        return nbt.Compound(
+            {str(key): numpy_to_nbt(item) for key, item in value.items()}
+        )
+    if isinstance(value, (list, tuple)):
+        return nbt.List([numpy_to_nbt(item) for item in value])
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind != "i" or value.dtype.itemsize not in _ARRAY_TAGS:
+            raise TypeError(f"Cannot convert an array of {value.dtype} to nbt.")
+        return _ARRAY_TAGS[value.dtype.itemsize](value)
+    if isinstance(value, str):
+        return nbt.String(value)
+    if isinstance(value, (bool, np.bool_)):
+        return nbt.Byte(value)
+    if isinstance(value, np.generic) and value.dtype in _NUMPY_TAGS:
+        return _NUMPY_TAGS[value.dtype](value)
+    if isinstance(value, (int, np.integer)):
+        return nbt.Int(value) if -(2**31) <= value < 2**31 else nbt.Long(value)
+    if isinstance(value, (float, np.floating)):
+        return nbt.Double(value)
+    raise TypeError(f"Cannot convert {type(value).__name__} to nbt.")
+
+
+_ARRAY_TAGS = {1: nbt.ByteArray, 4: nbt.IntArray, 8: nbt.LongArray}
+
+_NUMPY_TAGS = {
+    np.dtype(np.int8): nbt.Byte,
+    np.dtype(np.int16): nbt.Short,
+    np.dtype(np.int32): nbt.Int,
+    np.dtype(np.int64): nbt.Long,
+    np.dtype(np.float32): nbt.Float,
+    np.dtype(np.float64): nbt.Double,
+}
@@ -0,0 +1,135 @@
+import numpy as np
+
+# A varint holding a 32 bit number never needs more than 5 bytes.
+MAX_VARINT_LENGTH = 5
+
+# Number of bytes scanned at once when indexing varints, to bound temporary memory
+_CHUNK_SIZE = 1 << 24
+
+
+def decode_varints(data, count: int = None, dtype=np.int32) -> np.ndarray:
+    """Decodes a varint[] byte array into a flat array of integers.
+
+    The decoding is fully vectorized: the end of every varint is found with a single
+    comparison over the whole buffer, then the 7 bit groups are gathered one byte position at
+    a time, only for the varints that are still continuing. A 32 bit varint has at most 5
+    bytes, so there are at most 5 vectorized passes. When every byte is smaller than 128,
+    which is the case for palettes with up to 128 entries, the bytes are the values.
+
+    Args:
+        data (array-like): The raw bytes, e.g. the ``BlockData`` or ``BiomeData`` nbtlib ByteArray.
+        count (int, optional): The expected number of values. Defaults to None (not checked).
+        dtype (np.dtype, optional): The integer type of the result, e.g. ``uint16`` for the indices of small palettes. Defaults to ``int32``.
+
+    Returns:
+        np.ndarray: A 1D array of dtype with one entry per decoded varint.
+
+    Raises:
+        ValueError: If the data is truncated, contains a varint longer than 5 bytes or does not hold ``count`` values.
+    """
+    data = _as_uint8(data)
+
+    if data.size == 0 or data.max() < 0x80:
+        values = data.astype(dtype)
+    else:
+        continues = data >= 0x80
+        if continues[-1]:
+            raise ValueError("Truncated varint data: the last varint is incomplete.")
+
+        # A byte without the continuation bit terminates its varint
+        starts = np.flatnonzero(~continues)
+        starts[1:] = starts[:-1] + 1
+        starts[0] = 0
+
+        values = (data[starts] & 0x7F).astype(np.uint32)
+        pending = np.flatnonzero(continues[starts])
+        for i in range(1, MAX_VARINT_LENGTH + 1):
+            if pending.size == 0:
+                break
+            if i == MAX_VARINT_LENGTH:
+                raise ValueError(
+                    f"Malformed varint data: found a varint longer than {MAX_VARINT_LENGTH} bytes."
+                )
+            group = data[starts[pending] + i]
+            values[pending] |= (group & 0x7F).astype(np.uint32) << np.uint32(7 * i)
+            pending = pending[group >= 0x80]
+
+        values = values.view(np.int32).astype(dtype, copy=False)
+
+    if count is not None and values.size != count:
+        raise ValueError(f"Expected {count} varints but decoded {values.size}.")
+
+    return values
+
+
+def encode_varints(values) -> np.ndarray:
+    """Encodes integers into a varint[] byte array.
+
+    This is the inverse of :func:`decode_varints`. Negative numbers are encoded as their
+    unsigned 32 bit representation, which always takes 5 bytes.
+
+    Args:
+        values (array-like): The integers to encode.
+
+    Returns:
+        np.ndarray: A 1D ``int8`` array with the encoded bytes, ready to be stored in an nbtlib ByteArray.
+    """
+    values = np.asarray(values).ravel()
+    if values.size == 0:
+        return np.empty(0, dtype=np.int8)
+
+    values = values.astype(np.int64).astype(np.uint32)
+    length = max(1, (int(values.max()).bit_length() + 6) // 7)
+    if length == 1:
+        return values.astype(np.int8)
+
+    # Lay out the 7 bit groups of every value in a row, then keep the ones each value needs
+    groups = np.empty((values.size, length), dtype=np.uint8)
+    lengths = np.ones(values.size, dtype=np.uint8)
+    for i in range(length):
+        groups[:, i] = (values >> np.uint32(7 * i)) & np.uint32(0x7F)
+        if i:
+            lengths += values >= np.uint32(1 << (7 * i))
+
+    needed = np.arange(length, dtype=np.uint8) < lengths[:, None]
+    groups[:, :-1] |= needed[:, 1:].view(np.uint8) << 7
+    return groups[needed].view(np.int8)
+
+
+def varint_offsets(data, stride: int) -> np.ndarray:
+    """Finds the byte offset of every ``stride``-th varint in a varint[] byte array.
+
+    Varints have a variable width, so the position of a value cannot be computed from its
+    index. These offsets act as checkpoints from which the data can be decoded partially, e.g.
+    one checkpoint per row of BlockData. The data is scanned in chunks to bound memory use.
+
+    Args:
+        data (array-like): The raw bytes, e.g. the ``BlockData`` nbtlib ByteArray.
+        stride (int): The number of values between two checkpoints.
+
+    Returns:
+        np.ndarray: An ``int64`` array where entry ``k`` is the byte offset of value ``k * stride``. When the number of values is a multiple of stride, the last entry is the length of the data.
+    """
+    data = _as_uint8(data)
+    if data.size == 0 or data.max() < 0x80:
+        return np.arange(0, data.size + 1, stride, dtype=np.int64)
+
+    offsets = [np.zeros(1, dtype=np.int64)]
+    seen = 0
+    for start in range(0, data.size, _CHUNK_SIZE):
+        ends = np.flatnonzero(data[start : start + _CHUNK_SIZE] < 0x80)
+        # The varint after the one ending at global index i starts a checkpoint if (i + 1) % stride == 0
+        first = -(seen + 1) % stride
+        offsets.append(ends[first::stride] + start + 1)
+        seen += ends.size
+    return np.concatenate(offsets)
+
+
+def _as_uint8(data) -> np.ndarray:
+    """Returns a flat unsigned byte view of the given data without copying when possible."""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return np.frombuffer(data, dtype=np.uint8)
+    data = np.asarray(data).ravel()
+    if data.dtype.itemsize != 1:
+        raise TypeError(f"Expected a byte array, got an array of {data.dtype}.")
+    return data.view(np.uint8)
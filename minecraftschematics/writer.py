@@ -0,0 +1,67 @@
+import gzip
+import io
+import struct
+import nbtlib as nbt
+import numpy as np
+from .lazy import LazyTag
+from .stats import phase
+
+_BYTE = struct.Struct(">b")
+_USHORT = struct.Struct(">H")
+_INT = struct.Struct(">i")
+
+# Size of the buffer in front of the gzip stream, so small tags are not compressed one by one
+_BUFFER_SIZE = 1 << 16
+
+
+def save_nbt(path: str, tags: dict, root_name: str = "", compresslevel: int = 9):
+    """Write a compound of tags to a gzipped nbt file as a stream.
+
+    Each top-level tag is serialized straight into the gzip stream. Array tags are written
+    from their numpy buffer and tags of a lazily loaded file that were never decoded are
+    written back from their raw payload, so no intermediate copy of the file is built.
+
+    Args:
+        path (str): The path of the file to write.
+        tags (dict): The top-level tags, nbtlib tags or undecoded LazyTags.
+        root_name (str, optional): The name of the root compound. Defaults to "".
+        compresslevel (int, optional): The gzip compression level, from 0 to 9. Defaults to 9.
+    """
+    with phase("save", "save", path=path):
+        with gzip.open(path, "wb", compresslevel=compresslevel) as gzip_file:
+            with io.BufferedWriter(gzip_file, _BUFFER_SIZE) as f:
+                write_nbt(f, tags, root_name)
+
+
+def write_nbt(fileobj, tags: dict, root_name: str = ""):
+    """Write a compound of tags as uncompressed big-endian nbt.
+
+    Args:
+        fileobj: A writable binary file-like object.
+        tags (dict): The top-level tags, nbtlib tags or undecoded LazyTags.
+        root_name (str, optional): The name of the root compound. Defaults to "".
+    """
+    fileobj.write(_BYTE.pack(nbt.Compound.tag_id))
+    _write_string(fileobj, root_name)
+
+    # dict.items does not decode the tags of a LazyFile
+    for name, tag in dict.items(tags):
+        fileobj.write(_BYTE.pack(tag.tag_id))
+        _write_string(fileobj, name)
+        if isinstance(tag, LazyTag):
+            fileobj.write(tag.payload)
+        elif isinstance(tag, nbt.Array):
+            array = np.ascontiguousarray(tag, dtype=tag.item_type["big"])
+            fileobj.write(_INT.pack(array.size))
+            fileobj.write(array.view(np.uint8))
+        else:
+            tag.write(fileobj, "big")
+
+    fileobj.write(nbt.Compound.end_tag)
+
+
+def _write_string(fileobj, value: str):
+    """Write an nbt string."""
+    data = value.encode("utf-8")
+    fileobj.write(_USHORT.pack(len(data)))
+    fileobj.write(data)
@@ -1,10 +1,33 @@
 # tests/test_minecraft_schematic.py
 
 from os import path
+import asyncio
+import io
 import json
+import pickle
 import nbtlib as nbt
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
 
-from minecraftschematics import Block, Schematic
+from minecraftschematics import aio
+from minecraftschematics import entities as entities_module
+from minecraftschematics.transform import mirror_block_state, rotate_block_state
+from minecraftschematics import (
+    BillOfMaterials,
+    Block,
+    LazyNumpyDict,
+    ListDict,
+    LoadStats,
+    Schematic,
+    SchematicV2,
+    SectionedIndices,
+    decode_varints,
+    encode_varints,
+    nbt_to_numpy,
+    nbt_to_numpy_many,
+    sketch_similarity,
+)
 
 # Test data
 all_blocks = "v2_newblocks.schem"
@@ -52,6 +75,46 @@ def test_block_raw_properties():
     assert block.raw_properties == "east=none,north=side,power=0,south=side,west=none"
 
 
+# Varint tests
+
+
+def test_decode_varints():
+    data = np.array([0x05, 0xAC, 0x02, 0xFF, 0xFF, 0xFF, 0xFF, 0x07], dtype=np.uint8)
+    assert decode_varints(data.view(np.int8)).tolist() == [5, 300, 2147483647]
+
+
+def test_varints_round_trip():
+    values = np.array([0, 1, 127, 128, 16383, 16384, 2**21, 2**28, 2**31 - 1])
+    encoded = encode_varints(values)
+    assert encoded.dtype == np.int8
+    assert decode_varints(encoded).tolist() == values.tolist()
+
+
+def test_decode_truncated_varints():
+    with pytest.raises(ValueError):
+        decode_varints(np.array([0x05, 0xAC], dtype=np.uint8).view(np.int8))
+
+
+def test_block_without_properties():
+    block = Block("minecraft:packed_ice")
+    assert block.type == "minecraft:packed_ice"
+    assert block.properties == {}
+    assert block.raw_properties == ""
+
+
+def test_block_interning():
+    block = Block("minecraft:oak_log[axis=x]")
+    assert Block("minecraft:oak_log[axis=x]") is block
+    assert {block: 1}[Block("minecraft:oak_log[axis=x]")] == 1
+    with pytest.raises(AttributeError):
+        block.raw = "minecraft:stone"
+
+    with_block_entity = block.with_block_entity({"Id": "minecraft:chest"})
+    assert with_block_entity is not block
+    assert with_block_entity == block
+    assert block.block_entity is None
+
+
 # Schematic class tests V2
 
 
@@ -103,3 +166,709 @@ def test_block_entities():
         json.loads(schematic.block_entities[0]["front_text"]["messages"][1])["text"]
         == "Hello world"
     )
+
+
+def test_block_data():
+    schematic = Schematic.load(house_directory)
+    block_data = schematic.block_data
+    assert block_data.dtype == np.uint16
+    assert np.shares_memory(block_data, schematic.block_indices)
+    assert block_data.shape == (14 * 21 * 18,)
+    assert block_data.max() < schematic.palette_max
+
+
+def test_block_indices():
+    schematic = Schematic.load(house_directory)
+    block_indices = schematic.block_indices
+    assert block_indices.shape == (21, 18, 14)
+    assert block_indices.dtype == np.uint16
+    assert block_indices[2, 3, 4] == schematic.block_data[4 + 3 * 14 + 2 * 14 * 18]
+
+
+def test_block_at():
+    schematic = Schematic.load(block_entities_directory)
+    block_entity = schematic.block_entities[0]
+    x, y, z = (int(i) for i in block_entity["Pos"])
+    block = schematic.block_at(x, y, z)
+    assert block == schematic.palette[schematic.block_indices[y, z, x]]
+    assert block.block_entity["Id"] == block_entity["Id"]
+    assert schematic.palette[schematic.block_indices[y, z, x]].block_entity is None
+
+
+def test_cached_properties():
+    schematic = Schematic.load(house_directory)
+    assert schematic.palette is schematic.palette
+    assert schematic.block_indices is schematic.block_indices
+    for shared in (schematic.palette, schematic.blocks, schematic.block_entities):
+        with pytest.raises(ValueError):
+            shared.flat[0] = Block("minecraft:gold_block")
+
+    palette = schematic.palette
+    schematic.raw["Palette"] = nbt.Compound(
+        {"minecraft:stone": nbt.Int(0), "minecraft:dirt": nbt.Int(1)}
+    )
+    assert schematic.palette is not palette
+    assert schematic.palette[1] == Block("minecraft:dirt")
+
+    block_data = schematic.block_data
+    schematic.raw = nbt.load(house_directory)
+    assert schematic.block_data is not block_data
+
+    block_data = schematic.block_data
+    schematic.clear_cache()
+    assert schematic.block_data is not block_data
+
+
+def test_lazy_load():
+    schematic = Schematic.load(house_directory, lazy=True)
+    assert schematic.size == (14, 21, 18)
+    assert schematic.offset == (-6, 36, 24)
+    assert not schematic.raw.is_decoded("BlockData")
+    assert not schematic.raw.is_decoded("BlockEntities")
+
+    eager = Schematic.load(house_directory)
+    assert np.array_equal(schematic.block_data, eager.block_data)
+    assert schematic.raw.is_decoded("BlockData")
+    assert schematic.raw == eager.raw
+
+    # Decoded tags can be edited in place like the tags of an eager load
+    schematic.raw["BlockData"][0] = 1
+    schematic.clear_cache()
+    assert schematic.block_data[0] == 1
+
+
+def test_load_many():
+    paths = [house_directory, "missing.schem", all_blocks_directory]
+    results = list(Schematic.load_many(paths, workers=2, fields=["block_indices"]))
+
+    assert [result.path for result in results] == paths
+    assert isinstance(results[1].error, FileNotFoundError)
+    assert results[0].error is None
+    house = results[0].schematic
+    assert house.block_indices is house.block_indices
+    assert np.array_equal(
+        house.block_indices, Schematic.load(house_directory).block_indices
+    )
+    # Only the requested arrays are sent back, not the BlockData they were decoded from
+    assert "BlockData" not in house.raw and house.size == (14, 21, 18)
+    assert len(pickle.dumps(house)) < house.block_indices.nbytes + 8192
+
+
+def test_load_many_unordered():
+    paths = [house_directory, all_blocks_directory, block_entities_directory]
+    results = list(Schematic.load_many(paths, workers=2, ordered=False))
+    assert sorted(result.path for result in results) == sorted(paths)
+    assert all(result.error is None for result in results)
+
+
+def test_save(tmp_path):
+    path = str(tmp_path / "house.schem")
+    Schematic.load(house_directory).save(path)
+    assert nbt.load(path) == nbt.load(house_directory)
+
+    lazy_path = str(tmp_path / "lazy_house.schem")
+    Schematic.load(house_directory, lazy=True).save(lazy_path, compresslevel=1)
+    assert nbt.load(lazy_path) == nbt.load(house_directory)
+
+
+def test_from_arrays(tmp_path):
+    palette = [f"minecraft:wool_{i}" for i in range(300)]
+    indices = np.arange(2 * 3 * 100).reshape(2, 3, 100) % 300
+    block_entities = Schematic.load(block_entities_directory).block_entities
+    schematic = SchematicV2.from_arrays(
+        indices, palette, block_entities, offset=(1, 2, 3), metadata={"Name": "wool"}
+    )
+
+    path = str(tmp_path / "wool.schem")
+    schematic.save(path)
+    loaded = Schematic.load(path)
+    assert loaded.size == (100, 2, 3)
+    assert loaded.offset == (1, 2, 3)
+    assert loaded.metadata["Name"] == "wool"
+    assert np.array_equal(loaded.block_indices, indices)
+    assert loaded.palette[299] == Block("minecraft:wool_299")
+    assert (
+        loaded.raw["BlockEntities"]
+        == Schematic.load(block_entities_directory).raw["BlockEntities"]
+    )
+
+
+def test_from_arrays_empty_list():
+    chest = nbt.Compound(
+        {
+            "Id": nbt.String("minecraft:chest"),
+            "Pos": nbt.IntArray([0, 0, 0]),
+            "Items": nbt.List[nbt.Compound](),
+        }
+    )
+    converted = nbt_to_numpy(chest)
+    assert isinstance(converted["Items"], ListDict) and converted["Items"] == {}
+    assert isinstance(nbt_to_numpy(chest, lazy=True)["Items"], ListDict)
+
+    schematic = SchematicV2.from_arrays(
+        np.zeros((1, 1, 1), dtype=int), ["minecraft:chest"], [converted]
+    )
+    items = schematic.raw["BlockEntities"][0]["Items"]
+    assert isinstance(items, nbt.List) and len(items) == 0
+    assert pickle.loads(pickle.dumps(schematic.block_entities[0]))["Items"] == {}
+
+
+def test_select():
+    schematic = Schematic.load(house_directory)
+    blocks = schematic.blocks.ravel()
+
+    stairs = schematic.select(pattern="_stairs")
+    assert stairs.count == sum("_stairs" in block.raw for block in blocks)
+    assert len(stairs.positions) == stairs.count
+
+    north = schematic.select(
+        tag={"spruce_stairs", "cobblestone_stairs"}, properties={"facing": "north"}
+    )
+    for x, y, z in north.positions:
+        block = schematic.block_at(x, y, z)
+        assert block.properties["facing"] == "north"
+        assert block.type in ("minecraft:spruce_stairs", "minecraft:cobblestone_stairs")
+
+    not_air = schematic.select(predicate=lambda block: block.type != "minecraft:air")
+    (x0, y0, z0), (x1, y1, z1) = not_air.bounding_box
+    assert not_air.mask[y0 : y1 + 1, z0 : z1 + 1, x0 : x1 + 1].sum() == not_air.count
+    assert schematic.select(type="minecraft:bedrock").bounding_box is None
+
+
+def test_region():
+    expected = Schematic.load(house_directory).block_indices[2:6, 3:10, 1:5]
+    lazy = Schematic.load(house_directory, lazy=True)
+    region = lazy.region((1, 2, 3), (4, 5, 9))
+    assert region.size == (4, 4, 7)
+    assert region.offset == (-5, 38, 27)
+    assert np.array_equal(region.block_indices, expected)
+
+    schematic = Schematic.load(house_directory)
+    schematic.block_data
+    assert np.array_equal(
+        schematic.region((4, 5, 9), (1, 2, 3)).block_indices, expected
+    )
+
+    region.raw["Metadata"]["Name"] = nbt.String("region")
+    assert "Name" not in lazy.raw["Metadata"]
+
+
+def test_region_multibyte_varints():
+    indices = np.arange(4 * 5 * 6).reshape(4, 5, 6)
+    palette = [f"minecraft:wool_{i}" for i in range(indices.size)]
+    schematic = SchematicV2.from_arrays(indices, palette)
+    schematic.clear_cache()
+    assert np.array_equal(
+        schematic.region((1, 1, 1), (4, 3, 2)).block_indices, indices[1:4, 1:3, 1:5]
+    )
+
+
+def test_region_block_entities():
+    schematic = Schematic.load(block_entities_directory)
+    region = schematic.region((0, 0, 1), (1, 0, 1))
+    assert len(region.block_entities) == 1
+    assert region.block_entities[0]["Id"] == "minecraft:chest"
+    assert region.block_entities[0]["Pos"].tolist() == [0, 0, 0]
+
+
+def test_rotate_block_state():
+    assert (
+        rotate_block_state(
+            "minecraft:oak_stairs[facing=north,half=top,shape=inner_left]"
+        )
+        == "minecraft:oak_stairs[facing=east,half=top,shape=inner_left]"
+    )
+    assert (
+        rotate_block_state("minecraft:oak_log[axis=x]") == "minecraft:oak_log[axis=z]"
+    )
+    assert (
+        rotate_block_state("minecraft:oak_sign[rotation=14]", 2)
+        == "minecraft:oak_sign[rotation=6]"
+    )
+    assert (
+        rotate_block_state("minecraft:rail[shape=north_east]")
+        == "minecraft:rail[shape=south_east]"
+    )
+    assert (
+        rotate_block_state(
+            "minecraft:oak_fence[east=true,north=false,south=false,west=true]"
+        )
+        == "minecraft:oak_fence[east=false,north=true,south=true,west=false]"
+    )
+    assert (
+        rotate_block_state("minecraft:glass_pane[north=true,waterlogged=false]")
+        == "minecraft:glass_pane[east=true,waterlogged=false]"
+    )
+    assert (
+        rotate_block_state("minecraft:vine[north=true]", 2)
+        == "minecraft:vine[south=true]"
+    )
+    assert rotate_block_state("minecraft:stone") == "minecraft:stone"
+
+
+def test_mirror_block_state():
+    assert (
+        mirror_block_state("minecraft:oak_stairs[facing=east,shape=outer_left]", "x")
+        == "minecraft:oak_stairs[facing=west,shape=outer_right]"
+    )
+    assert (
+        mirror_block_state("minecraft:chest[facing=north,type=left]", "z")
+        == "minecraft:chest[facing=south,type=right]"
+    )
+    assert (
+        mirror_block_state("minecraft:oak_sign[rotation=0]", "z")
+        == "minecraft:oak_sign[rotation=8]"
+    )
+    assert (
+        mirror_block_state("minecraft:oak_fence[east=true,waterlogged=false]", "x")
+        == "minecraft:oak_fence[west=true,waterlogged=false]"
+    )
+    with pytest.raises(ValueError):
+        mirror_block_state("minecraft:stone", "y")
+
+
+def test_rotate():
+    schematic = Schematic.load(house_directory)
+    rotated = schematic.rotate()
+    assert rotated.size == (18, 21, 14)
+    x, y, z = 3, 5, 7
+    assert rotated.block_at(18 - 1 - z, y, x).raw == rotate_block_state(
+        schematic.block_at(x, y, z).raw
+    )
+
+    block_entity = schematic.block_entities[0]
+    x, y, z = (int(i) for i in block_entity["Pos"])
+    assert rotated.block_at(18 - 1 - z, y, x).block_entity["Id"] == block_entity["Id"]
+
+    back = rotated.rotate(3)
+    assert np.array_equal(back.block_indices, schematic.block_indices)
+    assert back.offset == schematic.offset
+    assert back.worldedit_offset == schematic.worldedit_offset
+    assert back.palette.tolist() == schematic.palette.tolist()
+
+    # Entities built from plain floats have Double rotations
+    pig = {"Id": "minecraft:pig", "Pos": [0.5, 0.0, 0.5], "Rotation": [90.0, 10.0]}
+    pigs = SchematicV2.from_arrays(
+        np.zeros((1, 1, 1), dtype=int), ["minecraft:air"], entities=[pig]
+    )
+    for transformed in (pigs.rotate(), pigs.mirror("x")):
+        rotation = transformed.raw["Entities"][0]["Rotation"]
+        assert rotation.subtype is nbt.Float and float(rotation[1]) == 10.0
+
+
+def test_mirror():
+    schematic = Schematic.load(house_directory)
+    mirrored = schematic.mirror("z")
+    assert mirrored.block_at(3, 5, 18 - 1 - 7).raw == mirror_block_state(
+        schematic.block_at(3, 5, 7).raw, "z"
+    )
+    assert np.array_equal(mirrored.mirror("z").block_indices, schematic.block_indices)
+
+
+def test_crop():
+    schematic = Schematic.load(block_entities_directory)
+    cropped = schematic.crop()
+    assert cropped.size == (2, 1, 2)
+    assert schematic.crop((0, 0, 0), (0, 0, 1)).size == (1, 1, 2)
+
+
+def test_paste():
+    house = Schematic.load(house_directory)
+    chest = Schematic.load(block_entities_directory)
+    pasted = house.paste(chest, (12, 20, 0))
+
+    assert pasted.size == house.size
+    assert pasted.block_at(13, 20, 0).raw == chest.block_at(1, 0, 0).raw
+    assert pasted.block_at(13, 20, 1) == house.block_at(13, 20, 1)
+    assert pasted.block_at(12, 20, 1).block_entity["Id"] == "minecraft:chest"
+    assert len(pasted.block_entities) == len(house.block_entities) + 2
+
+
+def test_compose():
+    house = Schematic.load(house_directory)
+    chest = Schematic.load(block_entities_directory)
+    composed = SchematicV2.compose([house, chest], [(0, 0, 0), (14, 0, 0)])
+
+    assert composed.size == (16, 21, 18)
+    assert composed.offset == (0, 0, 0)
+    assert composed.block_at(3, 5, 7).raw == house.block_at(3, 5, 7).raw
+    assert composed.block_at(15, 0, 0).block_entity["Id"] == "minecraft:sign"
+    assert composed.block_at(15, 5, 5).raw == "minecraft:air"
+    assert len(composed.block_entities) == len(house.block_entities) + 2
+
+    keep = SchematicV2.compose([house, chest], [(0, 0, 0), (0, 0, 0)], "keep")
+    overwrite = SchematicV2.compose([house, chest], [(0, 0, 0), (0, 0, 0)], "overwrite")
+    assert keep.size == overwrite.size == house.size
+    assert keep.block_at(1, 0, 0).raw == house.block_at(1, 0, 0).raw
+    assert overwrite.block_at(1, 0, 0).raw == chest.block_at(1, 0, 0).raw
+    assert overwrite.block_at(1, 0, 0).block_entity["Id"] == "minecraft:sign"
+
+    with pytest.raises(ValueError):
+        SchematicV2.compose([house, chest], [(0, 0, 0), (0, 0, 0)], "merge")
+
+    entities = [
+        nbt.Compound(
+            {"Id": nbt.String("minecraft:pig"), "Pos": nbt.List[nbt.Double](pos)}
+        )
+        for pos in ([0.5, 0.5, 0.5], [2.0, 0.5, 0.5])
+    ]
+    pigs = SchematicV2.from_arrays(
+        np.zeros((1, 1, 2), dtype=int), ["minecraft:air"], entities=entities
+    )
+    composed = SchematicV2.compose([pigs], [(0, 0, 0)])
+    assert [list(entity["Pos"]) for entity in composed.raw["Entities"]] == [
+        [0.5, 0.5, 0.5]
+    ]
+
+
+def test_load_stats():
+    events = []
+    with LoadStats(callback=events.append) as stats:
+        schematic = Schematic.load(house_directory)
+        schematic.blocks
+    schematic.clear_cache()
+    schematic.blocks
+
+    names = [event.name for event in stats.events]
+    assert names[:4] == ["read", "inflate", "parse", "load"]
+    assert names.count("blocks") == 1 and "palette" in names
+    assert events == stats.events
+    assert stats.events[0].bytes == path.getsize(house_directory)
+    assert stats.events[1].bytes == stats.events[2].bytes > stats.events[0].bytes
+    assert stats.events[1].start + stats.events[1].duration <= stats.events[2].start
+    assert stats.totals()["blocks"]["count"] == 1
+
+    trace = json.loads(json.dumps(stats.to_chrome_trace()))
+    assert len(trace["traceEvents"]) == len(stats.events)
+    assert trace["traceEvents"][3]["args"]["path"] == house_directory
+    assert stats.to_dict()["events"][0]["name"] == "read"
+
+    with LoadStats() as stats:
+        Schematic.load(house_directory, lazy=True)
+    assert [event.name for event in stats.events][:3] == ["read", "inflate", "scan"]
+
+
+def test_nbt_to_numpy():
+    tags = Schematic.load(block_entities_directory).raw["BlockEntities"]
+    sign = nbt_to_numpy(tags[0])
+
+    assert sign["Id"] == "minecraft:sign"
+    assert sign["is_waxed"] == 0 and sign["is_waxed"].dtype == np.int8
+    assert json.loads(sign["front_text"]["messages"][1])["text"] == "Hello world"
+    assert np.shares_memory(sign["Pos"], tags[0]["Pos"])
+    assert not sign["Pos"].flags.writeable
+
+    lazy = nbt_to_numpy(tags[0], lazy=True)
+    assert isinstance(lazy, LazyNumpyDict)
+    assert isinstance(dict.get(lazy, "front_text"), nbt.Compound)
+    assert isinstance(lazy["front_text"], LazyNumpyDict)
+    assert set(lazy) == set(sign) and lazy["Pos"].tolist() == sign["Pos"].tolist()
+    for copy in (
+        dict(nbt_to_numpy(tags[0], lazy=True)),
+        {**nbt_to_numpy(tags[0], lazy=True)},
+        nbt_to_numpy(tags[0], lazy=True).copy(),
+    ):
+        assert type(copy) is dict and copy.keys() == sign.keys()
+        assert not any(isinstance(value, nbt.Base) for value in copy.values())
+
+    many = nbt_to_numpy_many(tags)
+    assert many.dtype == object and len(many) == len(tags)
+    assert many[1]["Id"] == "minecraft:chest"
+
+
+def test_block_entity_index():
+    schematic = Schematic.load(block_entities_directory)
+
+    assert schematic.block_entity_at(1, 0, 0)["Id"] == "minecraft:sign"
+    assert schematic.block_entity_at(0, 0, 1)["Id"] == "minecraft:chest"
+    assert schematic.block_entity_at(0, 0, 0) is None
+    assert schematic.block_entity_at(5, 0, 0) is None
+    assert schematic.block_entity_index is schematic.block_entity_index
+
+    found = schematic.block_entities_at([(0, 0, 1), (1, 1, 1), (1, 0, 0), (-1, 0, 0)])
+    assert [None if b is None else b["Id"] for b in found] == [
+        "minecraft:chest",
+        None,
+        "minecraft:sign",
+        None,
+    ]
+
+    assert len(schematic.block_entities_in((0, 0, 0), (1, 0, 1))) == 2
+    inside = schematic.block_entities_in((0, 0, 1), (1, 0, 1))
+    assert [b["Id"] for b in inside] == ["minecraft:chest"]
+
+
+def test_aload():
+    with open(block_entities_directory, "rb") as f:
+        data = f.read()
+
+    class Upload:
+        async def read(self):
+            return data
+
+    async def main():
+        from_path = await Schematic.aload(house_directory)
+        from_bytes = await Schematic.aload(data)
+        from_file = await Schematic.aload(io.BytesIO(data), lazy=True)
+        from_upload = await Schematic.aload(Upload())
+        blocks, block_entities = await from_bytes.aget("blocks", "block_entities")
+        return from_path, from_bytes, from_file, from_upload, blocks, block_entities
+
+    with ThreadPoolExecutor(2) as executor:
+        aio.configure(executor, max_concurrency=1)
+        try:
+            house, chest, lazy, upload, blocks, block_entities = asyncio.run(main())
+        finally:
+            aio.configure()
+
+    assert house.size == (14, 21, 18)
+    assert chest.size == lazy.size == upload.size == (2, 1, 2)
+    assert blocks is chest.blocks and block_entities is chest.block_entities
+    assert sum(block.block_entity is not None for block in blocks.flat) == 2
+
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(Schematic.aload("missing.schem"))
+    with pytest.raises(ValueError):
+        asyncio.run(Schematic.aload(data[:100]))
+    with pytest.raises(ValueError):
+        asyncio.run(chest.aget("not_a_field"))
+
+
+def test_load_errors():
+    with open(block_entities_directory, "rb") as f:
+        data = f.read()
+
+    with pytest.raises(ValueError):
+        Schematic.load(b"not an nbt file")
+    with pytest.raises(ValueError):
+        Schematic.load(data[:100])
+    assert Schematic.load(data, force=True).size == (2, 1, 2)
+
+
+def test_visible_faces():
+    indices = np.zeros((4, 4, 4), dtype=np.uint16)
+    indices[1:3, 1:3, 1:3] = 1
+    indices[1, 1, 1] = 2
+    schematic = SchematicV2.from_arrays(
+        indices, ["minecraft:air", "minecraft:stone", "minecraft:glass"]
+    )
+
+    faces = schematic.visible_faces()
+    # The 24 outer faces of the cube, plus the 3 stone faces behind the glass block
+    assert len(faces.positions) == 27
+    assert faces.positions.shape == (27, 3)
+    at_stone = np.all(faces.positions == (2, 1, 1), axis=1)
+    assert sorted(faces.directions[at_stone].tolist()) == [0, 2, 4, 5]
+
+    quads = schematic.visible_faces(merge=True)
+    areas = np.prod(quads.end - quads.start + 1, axis=1)
+    assert areas.sum() == len(faces.positions)
+    assert len(quads.start) < len(faces.positions)
+
+    everything_opaque = schematic.visible_faces(opaque=lambda block: True)
+    assert len(everything_opaque.positions) == 24
+
+
+def test_diff():
+    house = Schematic.load(house_directory)
+    indices = np.array(house.block_indices, dtype=np.int32)
+    palette = [block.raw for block in house.palette] + ["minecraft:gold_block"]
+    indices[0, 0, 0:3] = len(palette) - 1
+    block_entities = [
+        nbt.Compound(
+            {"Id": nbt.String("minecraft:chest"), "Pos": nbt.IntArray((5, 5, 5))}
+        )
+    ]
+    changed = SchematicV2.from_arrays(indices, palette, block_entities)
+
+    diff = house.diff(changed)
+    assert diff.count == 3
+    assert diff.positions.tolist() == [[0, 0, 0], [1, 0, 0], [2, 0, 0]]
+    assert {diff.palette[i] for i in diff.new} == {"minecraft:gold_block"}
+    assert [diff.palette[i] for i in diff.old] == [
+        house.block_at(x, 0, 0).raw for x in range(3)
+    ]
+    assert len(diff.added_block_entities) == 1
+    assert len(diff.removed_block_entities) == len(house.block_entities)
+    assert house.diff(house).is_empty
+
+    patched = house.patch(diff)
+    assert patched.diff(changed).is_empty
+    assert patched.block_entity_at(5, 5, 5)["Id"] == "minecraft:chest"
+    with pytest.raises(ValueError):
+        patched.patch(diff)
+    with pytest.raises(ValueError):
+        house.diff(Schematic.load(block_entities_directory))
+
+
+def test_fingerprint(tmp_path):
+    house = Schematic.load(house_directory)
+    palette = [block.raw for block in house.palette]
+
+    # The same build with a reversed palette, an unused palette entry and another offset
+    order = np.arange(len(palette))[::-1]
+    table = np.argsort(order)
+    reordered = SchematicV2.from_arrays(
+        table[house.block_indices],
+        [palette[i] for i in order] + ["minecraft:gold_block"],
+        list(house.raw["BlockEntities"]),
+        offset=(10, 20, 30),
+    )
+    assert reordered.fingerprint == house.fingerprint
+
+    indices = np.array(house.block_indices, dtype=np.int32)
+    indices[0, 0, 0] = (indices[0, 0, 0] + 1) % len(palette)
+    changed = SchematicV2.from_arrays(
+        indices, palette, list(house.raw["BlockEntities"])
+    )
+    assert changed.fingerprint != house.fingerprint
+    assert sketch_similarity(house.sketch(), reordered.sketch()) == 1.0
+    assert sketch_similarity(house.sketch(), changed.sketch()) > 0.8
+    other = Schematic.load(all_blocks_directory)
+    assert sketch_similarity(house.sketch(), other.sketch()) < 0.5
+    assert len(house.sketch()) == 64
+
+    # Uniform and mostly-air builds still have size distinct hashes
+    indices = np.zeros((32, 32, 32), dtype=np.uint16)
+    uniform = SchematicV2.from_arrays(indices, ["minecraft:stone"])
+    indices[:4] = 1
+    floor = SchematicV2.from_arrays(indices, ["minecraft:air", "minecraft:stone"])
+    assert len(uniform.sketch()) == len(floor.sketch()) == 64
+    assert sketch_similarity(uniform.sketch(), floor.sketch()) < 1.0
+
+    path = str(tmp_path / "reordered.schem")
+    reordered.save(path)
+    paths = [house_directory, path, "missing.schem"]
+    results = list(Schematic.fingerprint_many(paths, workers=2, sketch_size=32))
+    assert results[0].fingerprint == results[1].fingerprint == house.fingerprint
+    assert np.array_equal(results[0].sketch, house.sketch(32))
+    assert isinstance(results[2].error, FileNotFoundError)
+
+
+def test_sections():
+    rng = np.random.default_rng(0)
+    indices = np.zeros((40, 37, 50), dtype=np.uint16)
+    indices[:5] = rng.integers(0, 300, (5, 37, 50))
+    indices[10:20, 3:7, 8:30] = 7
+    sections = SectionedIndices.from_dense(indices)
+    assert np.array_equal(sections.to_dense(), indices)
+    assert np.array_equal(
+        sections.region((3, 2, 4), (40, 33, 30)), indices[2:34, 4:31, 3:41]
+    )
+    assert sections.nbytes < indices.nbytes
+    assert sections.uniform[2, 0, 0] == 0
+
+    for _ in range(2000):
+        x, y, z = rng.integers(0, 50), rng.integers(0, 40), rng.integers(0, 37)
+        index = rng.integers(0, 400)
+        sections.set(x, y, z, index)
+        indices[y, z, x] = index
+        assert sections.get(x, y, z) == index
+    assert np.array_equal(sections.to_dense(), indices)
+    with pytest.raises(IndexError):
+        sections.get(50, 0, 0)
+
+    house = Schematic.load(house_directory, lazy=True)
+    assert np.array_equal(
+        house.sections.to_dense(), Schematic.load(house_directory).block_indices
+    )
+    rebuilt = SchematicV2.from_arrays(house.sections, house.palette)
+    assert rebuilt.diff(house).count == 0
+
+    edited = house.sections
+    edited.set(0, 0, 0, house.block_indices[0, 0, 0] + 1)
+    assert house.sections.get(0, 0, 0) == house.block_indices[0, 0, 0]
+    assert SchematicV2.from_arrays(edited, house.palette).diff(house).count == 1
+
+
+def test_lod():
+    palette = ["minecraft:air", "minecraft:stone", "minecraft:dirt", "minecraft:glass"]
+    indices = np.zeros((3, 3, 3), dtype=np.uint16)
+    indices[0, 0, 0:2] = 2
+    indices[1, 1, 1] = 3
+    indices[2, 2, 2] = 1
+    schematic = SchematicV2.from_arrays(indices, palette)
+
+    assert schematic.lod(0) is schematic.block_indices
+    assert schematic.lod(1) is schematic.lod(1)
+    assert schematic.lod(1).tolist() == [[[2, 0], [0, 0]], [[0, 0], [0, 1]]]
+    assert schematic.lod(2).tolist() == [[[1]]]  # a tie between 2 and 1
+    with pytest.raises(ValueError):
+        schematic.lod(-1)
+
+    top = schematic.top_view()
+    assert top.heights.tolist() == [[0, 0, -1], [-1, 1, -1], [-1, -1, 2]]
+    assert top.blocks.tolist() == [[2, 2, 0], [0, 3, 0], [0, 0, 1]]
+    assert schematic.top_view(level=1).heights.tolist() == [[0, -1], [-1, 1]]
+
+
+def test_entities(monkeypatch):
+    rng = np.random.default_rng(0)
+    positions = rng.uniform(0, 100, (500, 3))
+    types = ["minecraft:armor_stand", "minecraft:item_frame", "minecraft:minecart"]
+    entities = [
+        {"Id": nbt.String(types[i % 3]), "Pos": nbt.List[nbt.Double](position)}
+        for i, position in enumerate(positions.tolist())
+    ]
+    schematic = SchematicV2.from_arrays(
+        np.zeros((100, 100, 100), dtype=np.uint16), ["minecraft:air"], [], entities
+    )
+    table = schematic.entities
+    assert len(table) == 500 and schematic.entities is table
+    assert table.counts() == {types[0]: 167, types[1]: 167, types[2]: 166}
+    assert table.of_type("minecraft:minecart").tolist() == list(range(2, 500, 3))
+    assert table[3]["Id"] == types[0]
+    assert list(table[3]["Pos"].values()) == positions[3].tolist()
+
+    low, high = np.array((10, 20, 30)), np.array((60, 50, 90))
+    in_box = np.flatnonzero(np.all((positions >= low) & (positions < high + 1), axis=1))
+    in_radius = np.flatnonzero(np.sum((positions - 50) ** 2, axis=1) <= 30**2)
+    assert np.array_equal(table.in_box(high, low), in_box)
+    assert np.array_equal(table.in_radius((50, 50, 50), 30), in_radius)
+
+    # The same queries through the uniform grid
+    monkeypatch.setattr(entities_module, "GRID_THRESHOLD", 0)
+    grid_table = pickle.loads(pickle.dumps(schematic)).entities
+    assert np.array_equal(grid_table.in_box(low, high), in_box)
+    assert np.array_equal(grid_table.in_radius((50, 50, 50), 30), in_radius)
+    assert grid_table.take(in_box).ids.tolist() == table.ids[in_box].tolist()
+    assert len(Schematic.load(house_directory).entities) == 0
+
+
+def test_bill_of_materials():
+    palette = [
+        "minecraft:air",
+        "minecraft:oak_log[axis=y]",
+        "minecraft:oak_log[axis=x]",
+        "minecraft:stone",
+        "minecraft:dirt",
+    ]
+    indices = np.zeros((4, 5, 6), dtype=np.uint16)
+    indices[1, 1:3, 2] = 1
+    indices[2, 2, 2:5] = 2
+    indices[1, 3, 1] = 3
+    schematic = SchematicV2.from_arrays(indices, palette)
+
+    bill = schematic.bill_of_materials
+    assert bill.counts == {
+        "minecraft:air": 114,
+        "minecraft:oak_log[axis=x]": 3,
+        "minecraft:oak_log[axis=y]": 2,
+        "minecraft:stone": 1,
+    }
+    assert bill.type_counts == {
+        "minecraft:air": 114,
+        "minecraft:oak_log": 5,
+        "minecraft:stone": 1,
+    }
+    assert bill.types == ["minecraft:air", "minecraft:oak_log", "minecraft:stone"]
+    assert bill.layers.tolist() == [[30, 0, 0], [27, 2, 1], [27, 3, 0], [30, 0, 0]]
+    assert bill.bounding_box == ((1, 1, 1), (4, 2, 3))
+
+    house = Schematic.load(house_directory).bill_of_materials
+    total = BillOfMaterials.combine([bill, house])
+    assert total.type_counts["minecraft:oak_log"] == (
+        house.type_counts["minecraft:oak_log"] + 5
+    )
+    assert total.layers.sum() == bill.layers.sum() + house.layers.sum()
+    assert total.bounding_box == house.bounding_box